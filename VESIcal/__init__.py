@@ -9,6 +9,7 @@ __version__ = "1.1.1"
 __author__ = "Kayla Iacovino, Simon Matthews, and Penny Wieser"
 
 # ----------------- IMPORTS ----------------- #
+import importlib
 import warnings as w
 import pandas as pd
 
@@ -16,17 +17,31 @@ import VESIcal.core
 from VESIcal.core import oxides, anhydrous_oxides, volatiles  # noqa F401
 from VESIcal.core import fluid_molfrac_to_wt, fluid_wt_to_molfrac  # noqa F401
 import VESIcal.activity_models
+import VESIcal.aio
 import VESIcal.batchfile
 import VESIcal.batchmodel
 import VESIcal.calculate_classes
 import VESIcal.calibration_checks
-import VESIcal.calibrations
 import VESIcal.fugacity_models
 import VESIcal.models
 import VESIcal.sample_class
-import VESIcal.vplot
 import VESIcal.thermo
 
+# Submodules that are slow to import, and are only imported when first used: vplot imports
+# matplotlib, and calibrations builds the calibration datasets.
+_lazy_submodules = ["calibrations", "vplot"]
+
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        return importlib.import_module("VESIcal." + name)
+    raise AttributeError("module 'VESIcal' has no attribute '" + name + "'")
+
+
+def __dir__():
+    return sorted(list(globals()) + _lazy_submodules)
+
+
 # -------------- TURN OFF WARNINGS ------------- #
 w.filterwarnings("ignore", message="rubicon.objc.ctypes_patch has only been tested ")
 w.filterwarnings("ignore", message="The handle")
@@ -0,0 +1,332 @@
+"""
+Asyncio interface to VESIcal calculations, for services that calculate for many users at
+once, e.g., a web server. Each function is a coroutine that runs the calculation of the same
+name in an executor, so that the event loop, and every other request it serves, is not blocked
+while it runs::
+
+    import VESIcal as v
+
+    satP = await v.aio.calculate_saturation_pressure(sample, temperature=1200)
+    results = await v.aio.calculate_saturation_pressure(batch, temperature=1200)
+
+A Sample is calculated with the calculation class of the same name, which is returned. A
+BatchFile is split into chunks of rows, calculated one chunk per executor job, and the
+DataFrame of the batch method of the same name is returned. Jobs from every caller share the
+executor, so that chunking lets a service interleave the batches of many users rather than
+calculating them one after the other. The MagmaSat diagnostics of the chunks are gathered onto
+the BatchFile, and are returned by its get_magmasat_diagnostics method as usual.
+
+Calculations run in a pool of threads by default. Use configure to run them in a pool of
+processes, in an executor of your own, or to limit the number of calculations running at once.
+MagmaSat shares one MELTS instance between the threads of a process, and changes the warning
+filters of the process while it calculates, so a MagmaSat calculation in a thread pool runs
+while no other calculation does; run them in a process pool to calculate several at once.
+
+Cancelling a coroutine, e.g., with asyncio.wait_for or Task.cancel, cancels every job of the
+calculation that has not started yet. Jobs that have started cannot be interrupted, and their
+results are discarded.
+"""
+
+from VESIcal import batchfile
+from VESIcal import calculate_classes
+from VESIcal import core
+from VESIcal.models import magmasat
+
+import asyncio
+import concurrent.futures
+import contextlib
+import copy
+import threading
+import weakref
+
+import pandas as pd
+
+# The executor created by get_executor to run calculations in
+_executor = None
+
+# The configuration set by configure: 'thread', 'process' or an executor passed by the caller
+_executor_type = "thread"
+_max_workers = None
+_max_concurrency = None
+
+# The semaphore limiting the number of jobs running at once in each event loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+class _JobLock(object):
+    """
+    A lock held by every calculation run in the executor: shared by most calculations, but
+    held exclusively by MagmaSat calculations. The threads of a process share one MELTS
+    instance, and MagmaSat calculations change the warning filters of the process, which would
+    capture or hide the warnings of calculations running in other threads. Calculations
+    waiting for the exclusive lock are let in before new ones waiting to share it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._sharing = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive and self._waiting == 0)
+            self._sharing += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._sharing -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            self._condition.wait_for(lambda: not self._exclusive and self._sharing == 0)
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+_job_lock = _JobLock()
+
+_lock = threading.Lock()
+
+
+def configure(executor="thread", max_workers=None, max_concurrency=None):
+    """
+    Sets the executor calculations are run in. The previous executor is shut down once the
+    jobs submitted to it are done, unless it was passed in by the caller.
+
+    Parameters
+    ----------
+    executor: str or concurrent.futures.Executor
+        OPTIONAL: Default is 'thread', which runs calculations in a pool of threads. Pass
+        'process' to run them in a pool of processes, each with its own MELTS instance of the
+        MagmaSat backend set when the pool is created, or an executor of your own.
+        Calculations run in processes must be passed arguments that can be pickled.
+
+    max_workers: int
+        OPTIONAL: Number of threads or processes in the pool. Default is None, in which case
+        the default of concurrent.futures is used. Ignored if an executor is passed.
+
+    max_concurrency: int
+        OPTIONAL: Maximum number of jobs submitted to the executor at once by the coroutines
+        of an event loop. Others wait their turn without taking a place in the queue of the
+        executor, so that they can be cancelled cheaply. Default is None, in which case jobs
+        are only limited by the executor.
+    """
+    global _executor_type, _max_workers, _max_concurrency
+    if not (isinstance(executor, concurrent.futures.Executor) or
+            executor in ["thread", "process"]):
+        raise core.InputError("executor must be 'thread', 'process', or a "
+                              "concurrent.futures.Executor.")
+    if max_workers is not None and (not isinstance(max_workers, int) or max_workers < 1):
+        raise core.InputError("max_workers must be None or a positive integer.")
+    if max_concurrency is not None and (not isinstance(max_concurrency, int) or
+                                        max_concurrency < 1):
+        raise core.InputError("max_concurrency must be None or a positive integer.")
+
+    shutdown(wait=False)
+    with _lock:
+        _executor_type = executor
+        _max_workers = max_workers
+        _max_concurrency = max_concurrency
+        _semaphores.clear()
+
+
+def get_executor():
+    """Returns the executor calculations are run in, creating it the first time it is
+    needed."""
+    global _executor
+    with _lock:
+        if isinstance(_executor_type, concurrent.futures.Executor):
+            return _executor_type
+        if _executor is None:
+            if _executor_type == "process":
+                _executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=_max_workers, initializer=magmasat._initialize_worker,
+                    initargs=magmasat._worker_initargs())
+            else:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=_max_workers, thread_name_prefix="VESIcal")
+        return _executor
+
+
+def shutdown(wait=True):
+    """
+    Shuts down the executor created by this module, if there is one, once the jobs submitted
+    to it are done. A new one is created the next time a calculation is run. Executors passed
+    to configure are left to the caller.
+
+    Parameters
+    ----------
+    wait: bool
+        OPTIONAL: Default is True. If True, waits for the running jobs to finish.
+    """
+    global _executor
+    with _lock:
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _get_semaphore():
+    """Returns the semaphore of the running event loop, or None if the number of jobs is not
+    limited."""
+    if _max_concurrency is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if loop not in _semaphores:
+            _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+        return _semaphores[loop]
+
+
+async def run(function, *args, **kwargs):
+    """
+    Runs function(*args, **kwargs) in the executor, and returns its result. If the coroutine
+    is cancelled before the function has started, the function is not run.
+
+    Parameters
+    ----------
+    function: callable
+        The function. It must be picklable, e.g., defined at the top level of a module, if the
+        executor runs it in another process.
+    """
+    semaphore = _get_semaphore()
+    if semaphore is not None:
+        async with semaphore:
+            return await asyncio.wrap_future(get_executor().submit(function, *args, **kwargs))
+    return await asyncio.wrap_future(get_executor().submit(function, *args, **kwargs))
+
+
+def _uses_magmasat(model):
+    return getattr(model, "model_type", model) in ["MagmaSat", "MagmaSatFast"]
+
+
+def _hold_job_lock(model):
+    """Returns the context manager of the lock held by a calculation with model."""
+    if _uses_magmasat(model):
+        return _job_lock.exclusive()
+    return _job_lock.shared()
+
+
+def _calculate_sample(calculation, kwargs):
+    """Runs a calculation class on a sample. Run in the executor."""
+    with _hold_job_lock(kwargs.get("model", "MagmaSat")):
+        return getattr(calculate_classes, calculation)(**kwargs)
+
+
+def _calculate_batch(calculation, batch, kwargs):
+    """Runs a calculation method on a batch, and returns its results and the MagmaSat
+    diagnostics of the batch, or None if MagmaSat was not used. Run in the executor."""
+    with _hold_job_lock(kwargs.get("model", "MagmaSat")):
+        result = getattr(batch, calculation)(**kwargs)
+    return result, getattr(batch, "_magmasat_diagnostics", None)
+
+
+async def _calculate(calculation, sample, chunksize, kwargs):
+    """Runs a calculation on a Sample, or on a BatchFile in chunks of chunksize rows."""
+    if not isinstance(sample, batchfile.BatchFile):
+        return await run(_calculate_sample, calculation, dict(kwargs, sample=sample))
+
+    if chunksize is not None and (not isinstance(chunksize, int) or chunksize < 1):
+        raise core.InputError("chunksize must be None or a positive integer.")
+    kwargs = dict(kwargs)
+    kwargs.setdefault("print_status", False)
+    data = sample.get_data()
+    if chunksize is None:
+        chunksize = max(len(data), 1)
+    chunks = []
+    for start in range(0, max(len(data), 1), chunksize):
+        chunk = copy.copy(sample)
+        chunk.data = data.iloc[start:start + chunksize]
+        chunk._magmasat_diagnostics = None
+        chunks.append(chunk)
+
+    tasks = [asyncio.ensure_future(run(_calculate_batch, calculation, chunk, kwargs))
+             for chunk in chunks]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        # e.g., the calculation of a chunk failed, or the coroutine was cancelled
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # The chunks are copies, so their MagmaSat diagnostics are gathered onto the batch
+    diagnostics = [chunk_diagnostics for result, chunk_diagnostics in results
+                   if chunk_diagnostics is not None]
+    if len(diagnostics) > 0:
+        sample._magmasat_diagnostics = pd.concat(diagnostics)
+    return pd.concat([result for result, chunk_diagnostics in results])
+
+
+async def calculate_saturation_pressure(sample, chunksize=10, **kwargs):
+    """
+    Calculates the saturation pressure of a Sample or the samples of a BatchFile, as
+    calculate_saturation_pressure and BatchFile.calculate_saturation_pressure do.
+
+    Parameters
+    ----------
+    sample: Sample class or BatchFile class
+        The sample or samples.
+
+    chunksize: int
+        OPTIONAL: Number of rows of a BatchFile calculated per job. Default is 10. If None,
+        the whole batch is one job.
+
+    Any other arguments, e.g., temperature and model, are passed to the calculation. The
+    status of batch calculations is not printed unless print_status is set to True.
+
+    Returns
+    -------
+    calculate_saturation_pressure or pandas DataFrame
+        The calculation of a Sample, or the results of a BatchFile.
+    """
+    return await _calculate("calculate_saturation_pressure", sample, chunksize, kwargs)
+
+
+async def calculate_dissolved_volatiles(sample, chunksize=10, **kwargs):
+    """
+    Calculates the dissolved volatile concentrations of a Sample or the samples of a
+    BatchFile, as calculate_dissolved_volatiles and BatchFile.calculate_dissolved_volatiles
+    do. Arguments and results are as for calculate_saturation_pressure.
+    """
+    return await _calculate("calculate_dissolved_volatiles", sample, chunksize, kwargs)
+
+
+async def calculate_equilibrium_fluid_comp(sample, chunksize=10, **kwargs):
+    """
+    Calculates the equilibrium fluid composition of a Sample or the samples of a BatchFile,
+    as calculate_equilibrium_fluid_comp and BatchFile.calculate_equilibrium_fluid_comp do.
+    Arguments and results are as for calculate_saturation_pressure.
+    """
+    return await _calculate("calculate_equilibrium_fluid_comp", sample, chunksize, kwargs)
+
+
+async def calculate_isobars_and_isopleths(sample, **kwargs):
+    """
+    Calculates isobars and isopleths for a Sample, as calculate_isobars_and_isopleths does,
+    and returns the calculation. Arguments are passed to the calculation.
+    """
+    return await run(_calculate_sample, "calculate_isobars_and_isopleths",
+                     dict(kwargs, sample=sample))
+
+
+async def calculate_degassing_path(sample, **kwargs):
+    """
+    Calculates the degassing path of a Sample, as calculate_degassing_path does, and returns
+    the calculation. Arguments are passed to the calculation.
+    """
+    return await run(_calculate_sample, "calculate_degassing_path",
+                     dict(kwargs, sample=sample))
@@ -2,27 +2,110 @@ from VESIcal import core
 from VESIcal import models
 from VESIcal import calculate_classes
 from VESIcal import batchfile
+from VESIcal import sample_class
+from VESIcal.models import magmasat
+from VESIcal.models import magmasatfast
 
 from VESIcal.thermo import thermo_calculate_classes
 
+import concurrent.futures
+import hashlib
+import numbers
 import numpy as np
+import pandas as pd
+import os
 import warnings as w
 import sys
 
-from thermoengine import equilibrate
-
 w.filterwarnings("ignore", message="rubicon.objc.ctypes_patch has only been "
                                    "tested ")
 
-# -------------- MELTS preamble --------------- #
-# instantiate thermoengine equilibrate MELTS instance
-melts = equilibrate.MELTSmodel('1.2.0')
 
-# Suppress phases not required in the melts simulation
-phases = melts.get_phase_names()
-for phase in phases:
-    melts.set_phase_inclusion_status({phase: False})
-melts.set_phase_inclusion_status({'Fluid': True, 'Liquid': True})
+# -------------- PARALLEL MAGMASAT ------------ #
+def _calculate_magmasat_sample(calculation, keys, calc_kwargs):
+    """Runs a MagmaSat calculation on one sample. Used both in serial and in
+    the worker processes of a parallel batch calculation.
+
+    Parameters
+    ----------
+    calculation: str
+        Name of the calculation class in calculate_classes, e.g.,
+        'calculate_saturation_pressure'.
+
+    keys: list
+        Keys of the calculation result to be returned.
+
+    calc_kwargs: dict
+        Arguments passed to the calculation, including the sample.
+
+    Returns
+    -------
+    tuple
+        The list of result values for keys, the calibration check string,
+        the exception type if the calculation failed (otherwise None), a
+        list of (message, category) tuples for any warnings raised, and the
+        MELTS statistics of the calculation, as returned by
+        magmasat.MeltsStats.summary.
+    """
+    with w.catch_warnings(record=True) as caught, \
+            magmasat.MeltsStats() as stats:
+        w.simplefilter('always')
+        try:
+            calc = getattr(calculate_classes, calculation)(
+                                model='MagmaSat', silence_warnings=True,
+                                **calc_kwargs)
+            values = [calc.result[key] for key in keys]
+            calib_check = calc.calib_check
+            error = None
+        except Exception:
+            values = None
+            calib_check = None
+            error = sys.exc_info()[0]
+    return (values, calib_check, error,
+            [(str(warning.message), warning.category) for warning in caught],
+            stats.summary())
+
+
+def _magmasat_job_key(calculation, keys, calc_kwargs, significant_figures=12):
+    """Returns a hash identifying a MagmaSat calculation on one sample, used
+    to find rows of a batch that would repeat the same calculation. Numbers,
+    including the sample composition, are rounded to significant_figures, so
+    that values differing only by rounding error in normalization are
+    treated as the same.
+
+    Parameters
+    ----------
+    calculation: str
+        Name of the calculation class in calculate_classes.
+
+    keys: list
+        Keys of the calculation result to be returned.
+
+    calc_kwargs: dict
+        Arguments passed to the calculation, including the sample.
+
+    Returns
+    -------
+    str
+    """
+    def _round(value):
+        return float('{:.{}g}'.format(float(value), significant_figures))
+
+    items = []
+    for name, value in sorted(calc_kwargs.items()):
+        if isinstance(value, sample_class.Sample):
+            composition = value.get_composition(units='wtpt_oxides',
+                                                normalization='none')
+            value = (tuple((oxide, _round(concentration)) for
+                           oxide, concentration in
+                           sorted(composition.items())),
+                     value.default_units, value.default_normalization)
+        elif (isinstance(value, numbers.Number) and
+              not isinstance(value, (bool, complex))):
+            value = _round(value)
+        items.append((name, value))
+    key = repr((calculation, tuple(keys), tuple(items)))
+    return hashlib.sha1(key.encode()).hexdigest()
 # --------------------------------------------- #
 
 
@@ -32,6 +115,29 @@ class BatchFile(batchfile.BatchFile):
     """
     pass
 
+    def get_magmasat_diagnostics(self):
+        """Returns the MELTS statistics of the most recent MagmaSat
+        calculation on this batch, one row per sample calculated.
+
+        Returns
+        -------
+        pandas DataFrame
+            Indexed by sample name, with the name of the calculation, the
+            exception type if the calculation failed, the name of the sample
+            whose result was used for samples that repeat its calculation,
+            which are not calculated again, and the statistics of
+            magmasat.MeltsStats.summary: the number of MELTS paths, the
+            number of equilibrations, warm starts, fallbacks, cache hits and
+            failed equilibrations, the failed statuses, the wall time of the
+            equilibrations, the time spent in equilibrate_tp in total and per
+            call, and the number of phase queries and the time spent
+            answering them. Empty if no MagmaSat calculation has been run.
+        """
+        diagnostics = getattr(self, '_magmasat_diagnostics', None)
+        if diagnostics is None:
+            return pd.DataFrame()
+        return diagnostics.copy()
+
     def get_XH2O_fluid(self, sample, temperature, pressure, H2O, CO2):
         """An internally used function to calculate fluid composition.
 
@@ -63,13 +169,11 @@ class BatchFile(batchfile.BatchFile):
         bulk_comp = {oxide:  sample[oxide] for oxide in core.magmasat_oxides}
         bulk_comp["H2O"] = H2O
         bulk_comp["CO2"] = CO2
-        melts.set_bulk_composition(bulk_comp)
-
-        output = melts.equilibrate_tp(temperature, pressureMPa,
-                                      initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_comp = melts.get_composition_of_phase(xmlout, phase_name='Fluid',
-                                                    mode='component')
+        path = magmasat.MeltsPath('get_XH2O_fluid')
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa, bulk_comp)
+        fluid_comp = path.get_composition_of_phase(xmlout, phase_name='Fluid',
+                                                   mode='component')
         # NOTE mode='component' returns endmember component keys with values
         # in mol fraction.
 
@@ -80,9 +184,127 @@ class BatchFile(batchfile.BatchFile):
 
         return H2O_fl
 
+    def _run_magmasat(self, calculation, keys, jobs, workers=None,
+                      print_status=False):
+        """An internally used function to run MagmaSat calculations on a list
+        of samples, either serially or in a pool of worker processes.
+
+        Parameters
+        ----------
+        calculation: str
+            Name of the calculation class in calculate_classes.
+
+        keys: list
+            Keys of the calculation result to be returned.
+
+        jobs: list
+            List of (sample name, calc_kwargs) tuples, where calc_kwargs is a
+            dict of arguments passed to the calculation. Jobs that repeat the
+            calculation of an earlier job, e.g., replicate analyses at the
+            same conditions, are not calculated again, but given the result
+            of the earlier job.
+
+        workers: int or None
+            OPTIONAL: Number of worker processes. None or 1 runs the
+            calculations serially in this process, -1 uses one process per
+            CPU.
+
+        print_status: bool
+            OPTIONAL: If True, the progress of the calculation is printed.
+
+        Returns
+        -------
+        list
+            One tuple of the result values, calibration check, error and
+            warnings, as returned by _calculate_magmasat_sample, per job and
+            in the same order as jobs. Warnings raised in the calculations are
+            re-raised here. The MELTS statistics of the calculations are
+            returned by get_magmasat_diagnostics, where jobs given the result
+            of an earlier job have the name of its sample as DuplicateOf.
+        """
+        if workers == -1:
+            workers = os.cpu_count()
+        if workers is not None and (not isinstance(workers, int) or
+                                    workers < 1):
+            raise core.InputError("workers must be None, -1, or a positive "
+                                  "integer.")
+
+        # Each distinct calculation is only made once, by the first job
+        # that asks for it
+        unique_jobs = []
+        unique_positions = {}
+        positions = []
+        for j, (name, calc_kwargs) in enumerate(jobs):
+            key = _magmasat_job_key(calculation, keys, calc_kwargs)
+            if key not in unique_positions:
+                unique_positions[key] = len(unique_jobs)
+                unique_jobs.append((name, calc_kwargs, j))
+            positions.append(unique_positions[key])
+        duplicates = len(jobs) - len(unique_jobs)
+        if print_status and duplicates > 0:
+            print(str(duplicates) + " of " + str(len(jobs)) + " samples "
+                  "repeat an earlier calculation and are not recalculated.")
+
+        results = [None] * len(unique_jobs)
+        if workers is None or workers == 1 or len(unique_jobs) <= 1:
+            for i, (name, calc_kwargs, j) in enumerate(unique_jobs):
+                if print_status:
+                    batchfile.status_bar.status_bar((i+1)/len(unique_jobs),
+                                                    name)
+                results[i] = _calculate_magmasat_sample(calculation, keys,
+                                                        calc_kwargs)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=min(workers, len(unique_jobs)),
+                    initializer=magmasat._initialize_worker,
+                    initargs=magmasat._worker_initargs()) as executor:
+                futures = {executor.submit(_calculate_magmasat_sample,
+                                           calculation, keys, calc_kwargs): i
+                           for i, (name, calc_kwargs, j) in
+                           enumerate(unique_jobs)}
+                for done, future in enumerate(
+                        concurrent.futures.as_completed(futures)):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception:
+                        # e.g., the worker process died
+                        results[i] = (None, None, sys.exc_info()[0], [], {})
+                    if print_status:
+                        batchfile.status_bar.status_bar(
+                                            (done+1)/len(unique_jobs),
+                                            unique_jobs[i][0])
+
+        for values, calib_check, error, caught, stats in results:
+            for message, category in caught:
+                w.warn(message, category, stacklevel=3)
+        diagnostics = []
+        for j, i in enumerate(positions):
+            values, calib_check, error, caught, stats = results[i]
+            name, calc_kwargs, first = unique_jobs[i]
+            if j == first:
+                diagnostics.append(dict(stats, Calculation=calculation,
+                                        Error=error, DuplicateOf=np.nan))
+            else:
+                diagnostics.append(dict(Calculation=calculation, Error=error,
+                                        DuplicateOf=name, Calculations=0,
+                                        Equilibrations=0))
+        self._magmasat_diagnostics = pd.DataFrame(
+                        diagnostics,
+                        index=[name for name, calc_kwargs in jobs],
+                        columns=['Calculation', 'Error', 'DuplicateOf',
+                                 'Calculations', 'Equilibrations',
+                                 'WarmStarts', 'Fallbacks', 'CacheHits',
+                                 'Failures', 'FailedStatuses', 'WallTime_s',
+                                 'MeltsTime_s', 'TimePerCall_s', 'Queries',
+                                 'QueryTime_s'])
+
+        return [results[i][:4] for i in positions]
+
     def calculate_dissolved_volatiles(self, temperature, pressure, X_fluid=1,
                                       print_status=True, model='MagmaSat',
-                                      record_errors=False, **kwargs):
+                                      record_errors=False, workers=None,
+                                      **kwargs):
         """
         Calculates the amount of H2O and CO2 dissolved in a magma at the given
         P/T conditions and fluid composition. Fluid composition will be
@@ -128,10 +350,19 @@ class BatchFile(batchfile.BatchFile):
             OPTIONAL: If True, any errors arising during the calculation will
             be recorded as a column.
 
+        workers: int
+            OPTIONAL: Only used for MagmaSat. The number of worker processes
+            the samples are shared between, each with its own MELTS instance.
+            Default is None, in which case the samples are calculated one
+            after the other in this process. Pass -1 to use one process per
+            CPU. Results are returned in the order of the samples.
+
         Returns
         -------
         pandas DataFrame
             Original data passed plus newly calculated values are returned.
+            For MagmaSat, the number of MELTS equilibrations each sample took
+            is also returned.
         """
         dissolved_data = self.get_data().copy()
 
@@ -229,13 +460,10 @@ class BatchFile(batchfile.BatchFile):
             XH2Ovals = []
             XCO2vals = []
             FluidProportionvals = []
-            iterno = 0
+            equilibrations = []
+            jobs = []
+            positions = []
             for index, row in dissolved_data.iterrows():
-                iterno += 1
-                if print_status:
-                    percent = iterno/len(dissolved_data.index)
-                    batchfile.status_bar.status_bar(percent, index)
-
                 if file_has_temp:
                     temperature = row[temp_name]
                 if temperature <= 0:
@@ -244,6 +472,7 @@ class BatchFile(batchfile.BatchFile):
                     XH2Ovals.append(np.nan)
                     XCO2vals.append(np.nan)
                     FluidProportionvals.append(np.nan)
+                    equilibrations.append(np.nan)
                     warnings.append("Sample skipped. Bad temperature.")
                     errors.append(sys.exc_info()[0])
                     w.warn("Temperature for sample " + str(index) +
@@ -257,6 +486,7 @@ class BatchFile(batchfile.BatchFile):
                     XH2Ovals.append(np.nan)
                     XCO2vals.append(np.nan)
                     FluidProportionvals.append(np.nan)
+                    equilibrations.append(np.nan)
                     warnings.append("Sample skipped. Bad pressure.")
                     errors.append(sys.exc_info()[0])
                     w.warn("Pressure for sample " + str(index) +
@@ -270,6 +500,7 @@ class BatchFile(batchfile.BatchFile):
                     XH2Ovals.append(np.nan)
                     XCO2vals.append(np.nan)
                     FluidProportionvals.append(np.nan)
+                    equilibrations.append(np.nan)
                     warnings.append("Sample skipped. Bad X_fluid.")
                     errors.append(sys.exc_info()[0])
                     w.warn("X_fluid for sample " + str(index) +
@@ -281,6 +512,7 @@ class BatchFile(batchfile.BatchFile):
                     XH2Ovals.append(np.nan)
                     XCO2vals.append(np.nan)
                     FluidProportionvals.append(np.nan)
+                    equilibrations.append(np.nan)
                     warnings.append("Sample skipped. Bad X_fluid.")
                     errors.append(sys.exc_info()[0])
                     w.warn("X_fluid for sample " + str(index) +
@@ -288,6 +520,15 @@ class BatchFile(batchfile.BatchFile):
 
                 if (temperature > 0 and pressure > 0 and
                    X_fluid >= 0 and X_fluid <= 1):
+                    # Filled in once the calculations have been run
+                    H2Ovals.append(np.nan)
+                    CO2vals.append(np.nan)
+                    XH2Ovals.append(np.nan)
+                    XCO2vals.append(np.nan)
+                    FluidProportionvals.append(np.nan)
+                    equilibrations.append(np.nan)
+                    warnings.append('Calculation Failed.')
+                    errors.append('')
                     try:
                         # Get sample comp as Sample class with defaults
                         bulk_comp = self.get_sample_composition(
@@ -298,27 +539,28 @@ class BatchFile(batchfile.BatchFile):
                         bulk_comp.set_default_units(self.default_units)
                         bulk_comp.set_default_normalization(
                                                     self.default_normalization)
-                        calc = calculate_classes.calculate_dissolved_volatiles(
-                                           sample=bulk_comp, pressure=pressure,
-                                           temperature=temperature,
-                                           X_fluid=X_fluid, model=model,
-                                           silence_warnings=True, verbose=True)
-                        H2Ovals.append(calc.result['H2O_liq'])
-                        CO2vals.append(calc.result['CO2_liq'])
-                        XH2Ovals.append(calc.result['XH2O_fl'])
-                        XCO2vals.append(calc.result['XCO2_fl'])
-                        FluidProportionvals.append(
-                                             calc.result['FluidProportion_wt'])
-                        warnings.append(calc.calib_check)
-                        errors.append('')
+                        jobs.append((index, dict(kwargs, sample=bulk_comp,
+                                                 pressure=pressure,
+                                                 temperature=temperature,
+                                                 X_fluid=X_fluid,
+                                                 verbose=True)))
+                        positions.append(len(H2Ovals) - 1)
                     except Exception:
-                        H2Ovals.append(np.nan)
-                        CO2vals.append(np.nan)
-                        XH2Ovals.append(np.nan)
-                        XCO2vals.append(np.nan)
-                        FluidProportionvals.append(np.nan)
-                        warnings.append('Calculation Failed.')
-                        errors.append(sys.exc_info()[0])
+                        errors[-1] = sys.exc_info()[0]
+
+            results = self._run_magmasat(
+                            'calculate_dissolved_volatiles',
+                            ['H2O_liq', 'CO2_liq', 'XH2O_fl', 'XCO2_fl',
+                             'FluidProportion_wt', 'Equilibrations'],
+                            jobs, workers=workers, print_status=print_status)
+            for i, (values, calib_check, error, caught) in zip(positions,
+                                                               results):
+                if error is None:
+                    (H2Ovals[i], CO2vals[i], XH2Ovals[i], XCO2vals[i],
+                     FluidProportionvals[i], equilibrations[i]) = values
+                    warnings[i] = calib_check
+                else:
+                    errors[i] = error
             dissolved_data["H2O_liq_VESIcal"] = H2Ovals
             dissolved_data["CO2_liq_VESIcal"] = CO2vals
 
@@ -328,6 +570,7 @@ class BatchFile(batchfile.BatchFile):
                 dissolved_data["Pressure_bars_VESIcal"] = pressure
             if file_has_X is False:
                 dissolved_data["X_fluid_input_VESIcal"] = X_fluid
+            dissolved_data["Equilibrations_VESIcal"] = equilibrations
             dissolved_data["Model"] = model
             dissolved_data["Warnings"] = warnings
             if record_errors:
@@ -396,7 +639,7 @@ class BatchFile(batchfile.BatchFile):
 
     def calculate_equilibrium_fluid_comp(self, temperature, pressure=None,
                                          print_status=False, model='MagmaSat',
-                                         **kwargs):
+                                         workers=None, **kwargs):
         """
         Returns H2O and CO2 concentrations in wt% or mole fraction in a fluid
         in equilibrium with the given sample(s) at the given P/T condition.
@@ -425,6 +668,13 @@ class BatchFile(batchfile.BatchFile):
             OPTIONAL: Default is 'MagmaSat'. Any other model name can be
             passed here.
 
+        workers: int
+            OPTIONAL: Only used for MagmaSat. The number of worker processes
+            the samples are shared between, each with its own MELTS instance.
+            Default is None, in which case the samples are calculated one
+            after the other in this process. Pass -1 to use one process per
+            CPU. Results are returned in the order of the samples.
+
         Returns
         -------
         pandas DataFrame
@@ -505,19 +755,21 @@ class BatchFile(batchfile.BatchFile):
 
             return fluid_data
         elif model == 'MagmaSat':
-            iterno = 0
+            keys = ['H2O', 'CO2']
+            if kwargs.get('verbose') is True:
+                keys += ['FluidMass_grams', 'FluidProportion_wt']
+            jobs = []
+            positions = []
             for index, row in fluid_data.iterrows():
-                iterno += 1
-                if print_status:
-                    percent = iterno/len(fluid_data.index)
-                    batchfile.status_bar.status_bar(percent, index)
-
                 if file_has_temp:
                     temperature = row[temp_name]
                 if temperature <= 0:
                     H2Ovals.append(np.nan)
                     CO2vals.append(np.nan)
                     warnings.append("Calculation skipped. Bad temperature.")
+                    if kwargs.get('verbose') is True:
+                        FluidMass_grams_vals.append(np.nan)
+                        FluidProportion_wt_vals.append(np.nan)
                     w.warn("Temperature for sample " + str(index) +
                            " is <=0. Skipping sample.",
                            stacklevel=2)
@@ -528,10 +780,20 @@ class BatchFile(batchfile.BatchFile):
                     H2Ovals.append(np.nan)
                     CO2vals.append(np.nan)
                     warnings.append("Calculation skipped. Bad pressure.")
+                    if kwargs.get('verbose') is True:
+                        FluidMass_grams_vals.append(np.nan)
+                        FluidProportion_wt_vals.append(np.nan)
                     w.warn("Pressure for sample " + str(index) +
                            " is <=0. Skipping sample.", stacklevel=2)
 
                 if temperature > 0 and pressure > 0:
+                    # Filled in once the calculations have been run
+                    H2Ovals.append(np.nan)
+                    CO2vals.append(np.nan)
+                    warnings.append("Calculation Failed.")
+                    if kwargs.get('verbose') is True:
+                        FluidMass_grams_vals.append(np.nan)
+                        FluidProportion_wt_vals.append(np.nan)
                     try:
                         # Get sample comp as Sample class with defaults
                         bulk_comp = self.get_sample_composition(
@@ -541,31 +803,29 @@ class BatchFile(batchfile.BatchFile):
                         bulk_comp.set_default_units(self.default_units)
                         bulk_comp.set_default_normalization(
                                                     self.default_normalization)
-
-                        calc = (
-                            calculate_classes.calculate_equilibrium_fluid_comp(
-                                           sample=bulk_comp, pressure=pressure,
-                                           temperature=temperature,
-                                           model=model, silence_warnings=True,
-                                           **kwargs))
-
-                        H2Ovals.append(calc.result['H2O'])
-                        CO2vals.append(calc.result['CO2'])
-                        if kwargs.get('verbose') is True:
-                            FluidMass_grams_vals.append(calc.result['FluidMass_grams'])
-                            FluidProportion_wt_vals.append(calc.result['FluidProportion_wt'])
-                        if calc.result['H2O'] == 0 and calc.result['CO2'] == 0:
-                            warnings.append(calc.calib_check + "Sample not " +
-                                            "saturated at these conditions")
-                        else:
-                            warnings.append(calc.calib_check)
+                        jobs.append((index, dict(kwargs, sample=bulk_comp,
+                                                 pressure=pressure,
+                                                 temperature=temperature)))
+                        positions.append(len(H2Ovals) - 1)
                     except Exception:
-                        H2Ovals.append(np.nan)
-                        CO2vals.append(np.nan)
-                        warnings.append("Calculation Failed.")
-                        if kwargs.get('verbose') is True:
-                            FluidMass_grams_vals.append(np.nan)
-                            FluidProportion_wt_vals.append(np.nan)
+                        pass
+
+            results = self._run_magmasat('calculate_equilibrium_fluid_comp',
+                                         keys, jobs, workers=workers,
+                                         print_status=print_status)
+            for i, (values, calib_check, error, caught) in zip(positions,
+                                                               results):
+                if error is not None:
+                    continue
+                H2Ovals[i], CO2vals[i] = values[:2]
+                if kwargs.get('verbose') is True:
+                    (FluidMass_grams_vals[i],
+                     FluidProportion_wt_vals[i]) = values[2:]
+                if values[0] == 0 and values[1] == 0:
+                    warnings[i] = (calib_check + "Sample not " +
+                                   "saturated at these conditions")
+                else:
+                    warnings[i] = calib_check
             fluid_data["XH2O_fl_VESIcal"] = H2Ovals
             fluid_data["XCO2_fl_VESIcal"] = CO2vals
             if kwargs.get('verbose') is True:
@@ -617,7 +877,8 @@ class BatchFile(batchfile.BatchFile):
             return fluid_data
 
     def calculate_saturation_pressure(self, temperature, print_status=None,
-                                      model='MagmaSat', **kwargs):
+                                      model='MagmaSat', workers=None,
+                                      **kwargs):
         """
         Calculates the saturation pressure of multiple sample compositions in
         the BatchFile.
@@ -642,25 +903,50 @@ class BatchFile(batchfile.BatchFile):
 
         model: string
             OPTIONAL: Default is 'MagmaSat'. Any other model name can be
-            passed here.
+            passed here. With 'MagmaSatFast', or a MagmaSatFast object, the
+            saturation pressures of all samples are first predicted at once
+            by the MagmaSatFast surrogate, and only the samples for which the
+            prediction is outside of its domain or not within tolerance are
+            calculated with MagmaSat.
+
+        tolerance: float
+            OPTIONAL: Only used for MagmaSatFast. The largest estimated
+            relative error of a saturation pressure predicted by the
+            surrogate. Default is the tolerance of the MagmaSatFast model,
+            0.1.
+
+        workers: int
+            OPTIONAL: Only used for MagmaSat and MagmaSatFast. The number
+            of worker processes the samples are shared between, each with its
+            own MELTS instance. Default is None, in which case the samples are
+            calculated one after the other in this process. Pass -1 to use one
+            process per CPU. Results are returned in the order of the samples.
 
         Returns
         -------
         pandas DataFrame object
             Values returned are saturation pressure in bars, the mass of
-            fluid present, and the composition of the fluid present.
+            fluid present, and the composition of the fluid present. For
+            MagmaSat, the number of MELTS equilibrations each sample took is
+            also returned. For MagmaSatFast, whether each saturation pressure
+            was predicted by the surrogate, and its estimated relative error,
+            are also returned. The fluid is not calculated, and no
+            equilibrations are made, for samples predicted by the surrogate.
         """
         satp_data = self.get_data().copy()
 
         # Check if the model passed has the attribute "model_type"
         # Currently only implemented for MagmaSat type models
+        fast_model = None
+        if isinstance(model, magmasatfast.MagmaSatFast):
+            fast_model = model
         if hasattr(model, 'model_type') is True:
             model = model.model_type
 
         # set default print_status to True for MagmaSat, False for other
         # models if user doesn't pass any option
         if print_status is None:
-            if model == 'MagmaSat':
+            if model in ['MagmaSat', 'MagmaSatFast']:
                 print_status = True
             else:
                 print_status = False
@@ -674,7 +960,7 @@ class BatchFile(batchfile.BatchFile):
             raise core.InputError("temperature must be type str or float or "
                                   "int")
 
-        if model != 'MagmaSat':
+        if model not in ['MagmaSat', 'MagmaSatFast']:
             satP = []
             warnings = []
             piStar = []
@@ -715,20 +1001,21 @@ class BatchFile(batchfile.BatchFile):
 
             return satp_data
 
-        elif model == 'MagmaSat':
+        else:
+            if model == 'MagmaSatFast':
+                if fast_model is None:
+                    fast_model = magmasatfast.MagmaSatFast()
+                tolerance = kwargs.pop('tolerance', None)
             satP = []
             flmass = []
             flH2O = []
             flCO2 = []
             flsystem_wtper = []
+            equilibrations = []
             warnings = []
-            iterno = 0
+            jobs = []
+            positions = []
             for index, row in satp_data.iterrows():
-                iterno += 1
-                if print_status:
-                    percent = iterno/len(satp_data.index)
-                    batchfile.status_bar.status_bar(percent, index)
-
                 if file_has_temp:
                     temperature = row[temp_name]
                 if temperature <= 0:
@@ -737,11 +1024,20 @@ class BatchFile(batchfile.BatchFile):
                     flsystem_wtper.append(np.nan)
                     flH2O.append(np.nan)
                     flCO2.append(np.nan)
+                    equilibrations.append(np.nan)
                     warnings.append("Calculation skipped. Bad temperature.")
                     w.warn("Temperature for sample " + str(index) +
                            " is <=0. Skipping sample.", stacklevel=2)
 
                 if temperature > 0:
+                    # Filled in once the calculations have been run
+                    satP.append(np.nan)
+                    flmass.append(np.nan)
+                    flsystem_wtper.append(np.nan)
+                    flH2O.append(np.nan)
+                    flCO2.append(np.nan)
+                    equilibrations.append(np.nan)
+                    warnings.append("Calculation Failed")
                     try:
                         # Get sample comp as Sample class with defaults
                         bulk_comp = self.get_sample_composition(
@@ -751,25 +1047,61 @@ class BatchFile(batchfile.BatchFile):
                         bulk_comp.set_default_units(self.default_units)
                         bulk_comp.set_default_normalization(
                                                     self.default_normalization)
-
-                        calc = calculate_classes.calculate_saturation_pressure(
-                                     sample=bulk_comp, temperature=temperature,
-                                     model=model, verbose=True,
-                                     silence_warnings=True)
-                        satP.append(calc.result["SaturationP_bars"])
-                        flmass.append(calc.result["FluidMass_grams"])
-                        flsystem_wtper.append(
-                                             calc.result["FluidProportion_wt"])
-                        flH2O.append(calc.result["XH2O_fl"])
-                        flCO2.append(calc.result["XCO2_fl"])
-                        warnings.append(calc.calib_check)
+                        jobs.append((index, dict(kwargs, sample=bulk_comp,
+                                                 temperature=temperature,
+                                                 verbose=True)))
+                        positions.append(len(satP) - 1)
                     except Exception:
-                        satP.append(np.nan)
-                        flmass.append(np.nan)
-                        flsystem_wtper.append(np.nan)
-                        flH2O.append(np.nan)
-                        flCO2.append(np.nan)
-                        warnings.append("Calculation Failed")
+                        pass
+
+            surrogate = [False] * len(satP)
+            relative_error = [np.nan] * len(satP)
+            if model == 'MagmaSatFast' and len(jobs) > 0:
+                compositions = pd.DataFrame(
+                        [fast_model.preprocess_sample(
+                            calc_kwargs['sample']).get_composition(
+                                units='wtpt_oxides',
+                                normalization='fixedvolatiles')
+                         for name, calc_kwargs in jobs])
+                predictions = fast_model.predict_saturation_pressure(
+                        compositions,
+                        [calc_kwargs['temperature']
+                         for name, calc_kwargs in jobs],
+                        tolerance=tolerance)
+                remaining = []
+                for job, i, predicted, error, used in zip(
+                        jobs, positions, predictions['SaturationP_bars'],
+                        predictions['RelativeError'],
+                        predictions['Surrogate']):
+                    if used:
+                        satP[i] = predicted
+                        equilibrations[i] = 0
+                        surrogate[i] = True
+                        relative_error[i] = error
+                        warnings[i] = fast_model.check_calibration_range(
+                                {'pressure': predicted,
+                                 'temperature': job[1]['temperature']})
+                    else:
+                        remaining.append((job, i))
+                if print_status:
+                    print(str(len(jobs) - len(remaining)) + " of " +
+                          str(len(jobs)) + " saturation pressures predicted "
+                          "by the MagmaSatFast surrogate.")
+                jobs = [job for job, i in remaining]
+                positions = [i for job, i in remaining]
+
+            results = self._run_magmasat(
+                            'calculate_saturation_pressure',
+                            ['SaturationP_bars', 'FluidMass_grams',
+                             'FluidProportion_wt', 'XH2O_fl', 'XCO2_fl',
+                             'Equilibrations'],
+                            jobs, workers=workers, print_status=print_status)
+            for i, (values, calib_check, error, caught) in zip(positions,
+                                                               results):
+                if error is None:
+                    (satP[i], flmass[i], flsystem_wtper[i], flH2O[i],
+                     flCO2[i], equilibrations[i]) = values
+                    warnings[i] = calib_check
 
             satp_data["SaturationP_bars_VESIcal"] = satP
             if file_has_temp is False:
@@ -778,6 +1110,10 @@ class BatchFile(batchfile.BatchFile):
             satp_data["XCO2_fl_VESIcal"] = flCO2
             satp_data["FluidMass_grams_VESIcal"] = flmass
             satp_data["FluidSystem_wt_VESIcal"] = flsystem_wtper
+            satp_data["Equilibrations_VESIcal"] = equilibrations
+            if model == 'MagmaSatFast':
+                satp_data["Surrogate_VESIcal"] = surrogate
+                satp_data["RelativeError_VESIcal"] = relative_error
             satp_data["Model"] = model
             satp_data["Warnings"] = warnings
 
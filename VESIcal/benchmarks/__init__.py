@@ -0,0 +1,6 @@
+"""
+Benchmarks of VESIcal's speed and accuracy. The benchmarks are not imported with VESIcal and
+are run from the command line, e.g.::
+
+    python -m VESIcal.benchmarks.fugacity
+"""
@@ -0,0 +1,287 @@
+"""
+Benchmark of the fugacity models (equations of state) in VESIcal.fugacity_models.
+
+Every EOS is evaluated over a standard grid of pressure, temperature and fluid composition
+spanning its calibration range, with the points taken at random within the intervals of the
+grid. The variants of each EOS are timed: the scalar fugacity method, which is called once per
+point and is the reference, the array-native fugacity_array method where the EOS has one, and
+the fugacity_tabulated interpolation of the EOS. For each variant the evaluation rate and the
+largest relative deviation from the scalar reference are reported.
+
+The benchmark needs nothing beyond VESIcal itself and runs offline with::
+
+    python -m VESIcal.benchmarks.fugacity
+
+Use ``--help`` to see the options for the grid size, the number of timing repeats, and writing
+the results to a csv file.
+"""
+
+from VESIcal import calibration_checks
+from VESIcal import fugacity_models
+
+import argparse
+import time
+import warnings as w
+
+import numpy as np
+import pandas as pd
+
+# Bounds used for the grid where the calibration range of an EOS is open-ended.
+default_pressure_range = (1.0, 20000.0)
+default_temperature_range = (500.0, 1500.0)
+default_X_fluid_range = (0.1, 1.0)
+
+# The EOS benchmarked, with the name they are reported under.
+default_models = {'idealgas': fugacity_models.fugacity_idealgas,
+                  'KJ81_co2': fugacity_models.fugacity_KJ81_co2,
+                  'KJ81_h2o': fugacity_models.fugacity_KJ81_h2o,
+                  'ZD09_co2': fugacity_models.fugacity_ZD09_co2,
+                  'MRK_co2': fugacity_models.fugacity_MRK_co2,
+                  'MRK_h2o': fugacity_models.fugacity_MRK_h2o,
+                  'HB_co2': fugacity_models.fugacity_HB_co2,
+                  'HB_h2o': fugacity_models.fugacity_HB_h2o,
+                  'RK_co2': fugacity_models.fugacity_RK_co2,
+                  'RK_h2o': fugacity_models.fugacity_RK_h2o}
+
+
+def calibration_bounds(model, parameter, default):
+    """ Returns the (lower, upper) bounds of a parameter in the calibration range of a fugacity
+    model. Open-ended ranges are closed with the default bounds.
+
+    Parameters
+    ----------
+    model     FugacityModel object
+        The fugacity model.
+    parameter     str
+        The name of the parameter, e.g., 'pressure'.
+    default     tuple
+        The bounds to use where the calibration range does not set them.
+
+    Returns
+    -------
+    tuple
+        The lower and upper bounds.
+    """
+    lower, upper = default
+    for calibration_range in getattr(model, 'calibration_ranges', []):
+        if calibration_range.parameter_name != parameter:
+            continue
+        value = np.ravel(calibration_range.value).astype(float)
+        if calibration_range.checkfunction is calibration_checks.crf_Between:
+            lower, upper = value[0], value[1]
+        elif calibration_range.checkfunction is calibration_checks.crf_LessThan:
+            upper = value[0]
+            if lower >= upper:
+                lower = upper - (default[1] - default[0])
+        elif calibration_range.checkfunction is calibration_checks.crf_GreaterThan:
+            lower = value[0]
+            if upper <= lower:
+                upper = lower + (default[1] - default[0])
+    return float(lower), float(upper)
+
+
+def grid_bounds(model):
+    """ Returns the bounds of the standard benchmark grid for a fugacity model: its calibration
+    range, closed with the default bounds where it is open-ended.
+
+    Parameters
+    ----------
+    model     FugacityModel object
+        The fugacity model.
+
+    Returns
+    -------
+    tuple
+        The (lower, upper) bounds of pressure (bars), temperature (degC) and X_fluid.
+    """
+    P_min, P_max = calibration_bounds(model, 'pressure', default_pressure_range)
+    T_min, T_max = calibration_bounds(model, 'temperature', default_temperature_range)
+    return (max(P_min, 1.0), P_max), (T_min, T_max), default_X_fluid_range
+
+
+def _stratified(lower, upper, points, rng):
+    """ Returns one random point in each of points equal intervals between lower and upper. """
+    edges = np.linspace(lower, upper, points + 1)
+    return edges[:-1] + rng.uniform(size=points)*np.diff(edges)
+
+
+def standard_grid(model, pressure_points=12, temperature_points=10, X_fluid_points=5, seed=0):
+    """ Returns the standard benchmark grid for a fugacity model. The bounds of the grid are
+    divided into equal intervals, logarithmically for pressure and linearly for temperature and
+    fluid composition, and a random point is taken in each interval. The points therefore do
+    not fall on the nodes of a fugacity_tabulated table, where its interpolation is exact.
+
+    Parameters
+    ----------
+    model     FugacityModel object
+        The fugacity model.
+    pressure_points, temperature_points, X_fluid_points     int
+        Number of grid points along each axis.
+    seed     int
+        OPTIONAL. Seed of the random number generator. Default is 0.
+
+    Returns
+    -------
+    tuple
+        Flattened numpy arrays of pressure (bars), temperature (degC) and X_fluid.
+    """
+    rng = np.random.default_rng(seed)
+    P_range, T_range, X_range = grid_bounds(model)
+    P, T, X = np.meshgrid(np.exp(_stratified(np.log(P_range[0]), np.log(P_range[1]),
+                                             pressure_points, rng)),
+                          _stratified(T_range[0], T_range[1], temperature_points, rng),
+                          _stratified(X_range[0], X_range[1], X_fluid_points, rng),
+                          indexing='ij')
+    return P.ravel(), T.ravel(), X.ravel()
+
+
+def _time(func, repeat):
+    """ Returns the result of func and the shortest of repeat timings of it, in seconds. """
+    best = np.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def _max_relative_deviation(values, reference, threshold=1e-4):
+    """ Returns the largest relative deviation of values from reference, the number of points
+    at which it is greater than threshold, and the number of points at which one of them is
+    not finite and the other is. """
+    values = np.asarray(values, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    both = np.isfinite(values) & np.isfinite(reference) & (reference != 0)
+    mismatched = int(np.sum(np.isfinite(values) != np.isfinite(reference)))
+    if not np.any(both):
+        return np.nan, 0, mismatched
+    deviation = np.abs(values[both] - reference[both]) / np.abs(reference[both])
+    return float(np.max(deviation)), int(np.sum(deviation > threshold)), mismatched
+
+
+def run_benchmark(models=None, pressure_points=12, temperature_points=10, X_fluid_points=5,
+                  repeat=3, tabulated=True, use_table_cache=False, verbose=False):
+    """ Times every variant of every fugacity model over its standard grid, and compares it
+    with the scalar implementation.
+
+    Parameters
+    ----------
+    models     dict
+        OPTIONAL. Names and classes of the fugacity models to benchmark. Default is all of the
+        models in default_models.
+    pressure_points, temperature_points, X_fluid_points     int
+        OPTIONAL. Number of grid points along each axis. Defaults are 12, 10 and 5.
+    repeat     int
+        OPTIONAL. Each variant is timed this many times and the fastest is reported. Default
+        is 3.
+    tabulated     bool
+        OPTIONAL. If False, fugacity_tabulated is not benchmarked. Default is True.
+    use_table_cache     bool
+        OPTIONAL. If True, tables are loaded from and saved to the fugacity_tabulated cache
+        directory. Default is False, so that the build time is measured.
+    verbose     bool
+        OPTIONAL. If True, each result is printed as it is obtained. Default is False.
+
+    Returns
+    -------
+    pandas DataFrame
+        One row per model and variant, with the number of evaluations, the evaluations per
+        second, the speedup relative to the scalar implementation, the largest relative
+        deviation from the scalar implementation, the number of points at which that deviation
+        is greater than 1e-4, the number of points at which only one of the two is finite, and,
+        for tabulated variants, the time taken to build the table.
+    """
+    if models is None:
+        models = default_models
+
+    rows = []
+    for name, model_class in models.items():
+        model = model_class()
+        P, T, X = standard_grid(model, pressure_points, temperature_points, X_fluid_points)
+
+        variants = [('scalar', model,
+                     lambda model=model: np.array(
+                         [model.fugacity(pressure=P_i, temperature=T_i, X_fluid=X_i)
+                          for P_i, T_i, X_i in zip(P, T, X)], dtype=float))]
+        if hasattr(model, 'fugacity_array'):
+            variants.append(('array', model,
+                             lambda model=model: model.fugacity_array(P, T, X)))
+        if tabulated and not isinstance(model, fugacity_models.fugacity_idealgas):
+            P_range, T_range, X_range = grid_bounds(model)
+            table = fugacity_models.fugacity_tabulated(
+                model_class(), pressure_range=P_range, temperature_range=T_range,
+                use_cache=use_table_cache)
+            variants.append(('tabulated', table,
+                             lambda table=table: table.fugacity_array(P, T, X)))
+
+        reference = None
+        scalar_time = None
+        for variant, eos, func in variants:
+            build_time = np.nan
+            with w.catch_warnings():
+                w.simplefilter('ignore')
+                if variant == 'tabulated':
+                    start = time.perf_counter()
+                    eos.build_table()
+                    build_time = time.perf_counter() - start
+                result, elapsed = _time(func, repeat)
+            if variant == 'scalar':
+                reference = result
+                scalar_time = elapsed
+            deviation, deviating, mismatched = _max_relative_deviation(result, reference)
+            row = {'model': name,
+                   'variant': variant,
+                   'evaluations': len(P),
+                   'evals_per_s': len(P) / elapsed,
+                   'speedup': scalar_time / elapsed,
+                   'max_rel_deviation': deviation,
+                   'points_over_1e-4': deviating,
+                   'nonfinite_mismatches': mismatched,
+                   'build_time_s': build_time}
+            rows.append(row)
+            if verbose:
+                print('{model:>10} {variant:>10} {evals_per_s:12.4g} evals/s  '
+                      'x{speedup:<8.3g} max rel dev {max_rel_deviation:.3g}'.format(**row),
+                      flush=True)
+
+    return pd.DataFrame(rows)
+
+
+def main(args=None):
+    """ Runs the benchmark from the command line and prints the results. """
+    parser = argparse.ArgumentParser(
+        prog='python -m VESIcal.benchmarks.fugacity',
+        description="Benchmark the speed and accuracy of VESIcal's fugacity models.")
+    parser.add_argument('--models', nargs='+', choices=sorted(default_models),
+                        help='Models to benchmark. Default is all of them.')
+    parser.add_argument('--pressure-points', type=int, default=12)
+    parser.add_argument('--temperature-points', type=int, default=10)
+    parser.add_argument('--X-fluid-points', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timing repeats; the fastest is reported.')
+    parser.add_argument('--no-tabulated', action='store_true',
+                        help='Do not benchmark fugacity_tabulated.')
+    parser.add_argument('--use-table-cache', action='store_true',
+                        help='Load and save tables in the fugacity_tabulated cache directory.')
+    parser.add_argument('--csv', help='Also write the results to this csv file.')
+    args = parser.parse_args(args)
+
+    models = None
+    if args.models is not None:
+        models = {name: default_models[name] for name in args.models}
+
+    results = run_benchmark(models=models, pressure_points=args.pressure_points,
+                            temperature_points=args.temperature_points,
+                            X_fluid_points=args.X_fluid_points, repeat=args.repeat,
+                            tabulated=not args.no_tabulated,
+                            use_table_cache=args.use_table_cache, verbose=True)
+    print()
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.to_string(index=False, float_format='{:.4g}'.format))
+    if args.csv is not None:
+        results.to_csv(args.csv, index=False)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark of the time taken to import VESIcal, and to first use the parts of it that load slow
+dependencies only when they are needed.
+
+Every statement is timed in a fresh interpreter, since modules are only imported once per
+interpreter. For each statement the time taken, the peak resident memory of the interpreter, and
+which of the slow dependencies it loaded are reported. The benchmark runs offline with::
+
+    python -m VESIcal.benchmarks.imports
+
+Use ``--help`` to see the options for the number of repeats and writing the results to a csv
+file.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+# The statements benchmarked, with the name they are reported under. 'interpreter' gives the
+# memory used by the interpreter alone.
+default_statements = {'interpreter': 'pass',
+                      'import': 'import VESIcal',
+                      'vplot': 'import VESIcal; VESIcal.vplot',
+                      'calibrations': 'import VESIcal; VESIcal.calibrations',
+                      'MagmaSat engine': 'import VESIcal; VESIcal.models.magmasat.get_engine()'}
+
+# Slow dependencies, reported if a statement loads them.
+heavy_modules = ['matplotlib.pyplot', 'sympy', 'scipy.optimize', 'thermoengine']
+
+# Run in the fresh interpreter. Times the statement and prints the results as json.
+_child = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+exec(compile(sys.argv[1], '<benchmark>', 'exec'), {})
+elapsed = time.perf_counter() - start
+# On linux, ru_maxrss is carried over from the parent process, so VmHWM is used instead
+rss = float('nan')
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                rss = float(line.split()[1]) / 1024
+except OSError:
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = rss / 1024**2 if sys.platform == 'darwin' else rss / 1024
+    except ImportError:
+        pass
+print(json.dumps({'time': elapsed, 'rss': rss,
+                  'modules': [name for name in json.loads(sys.argv[2]) if name in sys.modules]}))
+"""
+
+
+def _measure(statement):
+    """ Runs statement in a fresh interpreter. Returns the time it took in seconds, the peak
+    resident memory of the interpreter in MB, and the heavy modules loaded, or None if the
+    statement failed. """
+    process = subprocess.run([sys.executable, '-c', _child, statement, json.dumps(heavy_modules)],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(statements=None, repeat=5, verbose=False):
+    """ Times every statement in repeat fresh interpreters.
+
+    Parameters
+    ----------
+    statements     dict
+        OPTIONAL. Names and code of the statements to benchmark. Default is all of the
+        statements in default_statements.
+    repeat     int
+        OPTIONAL. Each statement is timed this many times. Default is 5.
+    verbose     bool
+        OPTIONAL. If True, each result is printed as it is obtained. Default is False.
+
+    Returns
+    -------
+    pandas DataFrame
+        One row per statement, with the median and shortest time taken in seconds, the largest
+        peak resident memory of the interpreter in MB, and the heavy modules the statement
+        loaded. Times are nan if the statement failed, e.g., if thermoengine is not installed.
+    """
+    if statements is None:
+        statements = default_statements
+
+    rows = []
+    for name, statement in statements.items():
+        results = [_measure(statement) for i in range(repeat)]
+        results = [result for result in results if result is not None]
+        if len(results) == 0:
+            row = {'statement': name, 'median_s': np.nan, 'min_s': np.nan,
+                   'max_rss_MB': np.nan, 'heavy_modules': 'failed'}
+        else:
+            times = [result['time'] for result in results]
+            row = {'statement': name,
+                   'median_s': float(np.median(times)),
+                   'min_s': float(np.min(times)),
+                   'max_rss_MB': float(np.max([result['rss'] for result in results])),
+                   'heavy_modules': ', '.join(results[-1]['modules'])}
+        rows.append(row)
+        if verbose:
+            print('{statement:>16} {median_s:8.3f} s {max_rss_MB:8.1f} MB  '
+                  '{heavy_modules}'.format(**row), flush=True)
+
+    return pd.DataFrame(rows)
+
+
+def main(args=None):
+    """ Runs the benchmark from the command line and prints the results. """
+    parser = argparse.ArgumentParser(
+        prog='python -m VESIcal.benchmarks.imports',
+        description='Benchmark the time and memory taken to import VESIcal.')
+    parser.add_argument('--statements', nargs='+', choices=list(default_statements),
+                        help='Statements to benchmark. Default is all of them.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Fresh interpreters per statement; the median is reported.')
+    parser.add_argument('--csv', help='Also write the results to this csv file.')
+    args = parser.parse_args(args)
+
+    statements = None
+    if args.statements is not None:
+        statements = {name: default_statements[name] for name in args.statements}
+
+    results = run_benchmark(statements=statements, repeat=args.repeat, verbose=True)
+    print()
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.to_string(index=False, float_format='{:.4g}'.format))
+    if args.csv is not None:
+        results.to_csv(args.csv, index=False)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark of the MagmaSat search algorithms: the saturation pressure search, the fluid
+composition search of calculate_dissolved_volatiles, isobars, and degassing paths.
+
+Every calculation is run on a standard basalt, and the number of equilibrations it takes and
+where its time goes are reported: in the equilibrium backend (equilibrate_tp), answering phase
+queries, and in the MagmaSat driver itself. By default the deterministic AnalyticBackend is
+used in place of MELTS, so that the benchmark needs nothing beyond VESIcal, runs offline, and
+measures the search algorithms and driver overhead alone::
+
+    python -m VESIcal.benchmarks.magmasat
+
+Use ``--backend thermoengine`` to run the calculations with MELTS, and ``--help`` to see the
+other options.
+"""
+
+from VESIcal import sample_class
+from VESIcal.models import magmasat
+
+import argparse
+import io
+import time
+import warnings as w
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+# The sample all calculations are run on.
+default_sample = {'SiO2': 47.95, 'TiO2': 1.67, 'Al2O3': 17.32, 'FeO': 10.24, 'Fe2O3': 0.1,
+                  'MgO': 5.76, 'CaO': 10.93, 'Na2O': 3.45, 'K2O': 1.99, 'P2O5': 0.51,
+                  'MnO': 0.1, 'H2O': 2.0, 'CO2': 0.1}
+
+# The calculations benchmarked, with the name they are reported under. Each is called with a
+# MagmaSat instance and the sample.
+default_calculations = {
+    'saturation_pressure': lambda model, sample: model.calculate_saturation_pressure(
+        sample, temperature=1200),
+    'saturation_pressure_step': lambda model, sample: model.calculate_saturation_pressure(
+        sample, temperature=1200, method='step'),
+    'dissolved_volatiles': lambda model, sample: [model.calculate_dissolved_volatiles(
+        sample, temperature=1200, pressure=2000, X_fluid=X_fluid)
+        for X_fluid in [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]],
+    'isobars': lambda model, sample: model.calculate_isobars_and_isopleths(
+        sample, temperature=1200, pressure_list=[1000, 2000, 3000], isopleth_list=[0.5],
+        smooth_isobars=False, smooth_isopleths=False, print_status=False),
+    'isobars_adaptive': lambda model, sample: model.calculate_isobars_and_isopleths(
+        sample, temperature=1200, pressure_list=[1000, 2000, 3000], isopleth_list=[0.5],
+        smooth_isobars=False, smooth_isopleths=False, print_status=False, adaptive=True),
+    'degassing_closed': lambda model, sample: model.calculate_degassing_path(
+        sample, temperature=1200, steps=20),
+    'degassing_open': lambda model, sample: model.calculate_degassing_path(
+        sample, temperature=1200, steps=20, fractionate_vapor=1.0),
+}
+
+
+def run_benchmark(calculations=None, backend='analytic', repeat=3, verbose=False):
+    """ Runs every calculation repeat times, and reports the fastest run.
+
+    Parameters
+    ----------
+    calculations     dict
+        OPTIONAL. Names and functions of the calculations to benchmark. Default is all of the
+        calculations in default_calculations.
+    backend     str
+        OPTIONAL. The MagmaSat equilibrium backend used. Default is 'analytic'. The backend of
+        the process is restored afterwards.
+    repeat     int
+        OPTIONAL. Each calculation is run this many times and the fastest is reported.
+        Default is 3.
+    verbose     bool
+        OPTIONAL. If True, each result is printed as it is obtained. Default is False.
+
+    Returns
+    -------
+    pandas DataFrame
+        One row per calculation, with the number of MELTS paths and equilibrations, the total
+        time taken, the time spent in equilibrate_tp and answering phase queries, and the
+        remaining driver overhead, in total and per equilibration, all in seconds.
+    """
+    if calculations is None:
+        calculations = default_calculations
+
+    previous_backend = magmasat.backend
+    magmasat.set_backend(backend)
+    sample = sample_class.Sample(default_sample)
+    rows = []
+    try:
+        for name, calculation in calculations.items():
+            best = None
+            for i in range(repeat):
+                model = magmasat.MagmaSat()
+                with w.catch_warnings(), redirect_stdout(io.StringIO()), \
+                        magmasat.MeltsStats() as stats:
+                    w.simplefilter('ignore')
+                    start = time.perf_counter()
+                    calculation(model, sample)
+                    elapsed = time.perf_counter() - start
+                summary = stats.summary()
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, summary)
+
+            elapsed, summary = best
+            overhead = elapsed - summary['MeltsTime_s'] - summary['QueryTime_s']
+            row = {'calculation': name,
+                   'paths': summary['Calculations'],
+                   'equilibrations': summary['Equilibrations'],
+                   'total_s': elapsed,
+                   'melts_s': summary['MeltsTime_s'],
+                   'query_s': summary['QueryTime_s'],
+                   'overhead_s': overhead,
+                   'overhead_per_equilibration_s': (overhead / summary['Equilibrations']
+                                                    if summary['Equilibrations'] > 0
+                                                    else np.nan)}
+            rows.append(row)
+            if verbose:
+                print('{calculation:>26} {equilibrations:6d} equilibrations {total_s:9.4f} s  '
+                      'overhead {overhead_s:9.4f} s'.format(**row), flush=True)
+    finally:
+        magmasat.set_backend(previous_backend)
+
+    return pd.DataFrame(rows)
+
+
+def main(args=None):
+    """ Runs the benchmark from the command line and prints the results. """
+    parser = argparse.ArgumentParser(
+        prog='python -m VESIcal.benchmarks.magmasat',
+        description='Benchmark the MagmaSat search algorithms.')
+    parser.add_argument('--calculations', nargs='+', choices=list(default_calculations),
+                        help='Calculations to benchmark. Default is all of them.')
+    parser.add_argument('--backend', choices=sorted(magmasat.backends), default='analytic',
+                        help='Equilibrium backend. Default is analytic.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per calculation; the fastest is reported.')
+    parser.add_argument('--csv', help='Also write the results to this csv file.')
+    args = parser.parse_args(args)
+
+    calculations = None
+    if args.calculations is not None:
+        calculations = {name: default_calculations[name] for name in args.calculations}
+
+    results = run_benchmark(calculations=calculations, backend=args.backend,
+                            repeat=args.repeat, verbose=True)
+    print()
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.to_string(index=False, float_format='{:.4g}'.format))
+    if args.csv is not None:
+        results.to_csv(args.csv, index=False)
+    return results
+
+
+if __name__ == '__main__':
+    main()
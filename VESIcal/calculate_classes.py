@@ -5,6 +5,7 @@ import numpy as np
 from VESIcal import core
 from VESIcal import models
 from VESIcal.models import magmasat
+from VESIcal.models import magmasatfast
 
 from copy import deepcopy
 
@@ -28,7 +29,9 @@ class Calculate(object):
         model:     string or Model class
             Which model to use for the calculation. If passed a string, it
             will look up the name in the default_models dictionary. Default is
-            MagmaSat.
+            MagmaSat. 'MagmaSatFast' predicts saturation pressures with a
+            surrogate of MagmaSat where it is accurate enough, see
+            VESIcal.models.magmasatfast.
         silence_warnings:     bool
             Silence warnings about calibration ranges. Default is False.
         preprocess_sample:     bool
@@ -39,6 +42,8 @@ class Calculate(object):
         self.model_name = model
         if model == 'MagmaSat':
             self.model = magmasat.MagmaSat()
+        elif model == 'MagmaSatFast':
+            self.model = magmasatfast.MagmaSatFast()
         elif type(model) == str:
             if model in models.default_models.keys():
                 self.model = models.default_models[model]
@@ -139,7 +144,7 @@ class calculate_dissolved_volatiles(Calculate):
                 bulk_comp.change_composition({'CO2': calc_result})
                 return bulk_comp.get_composition(species='CO2',
                                                  units=default_units)
-            elif self.model_name == 'MagmaSat':
+            elif self.model_name in ['MagmaSat', 'MagmaSatFast']:
                 bulk_comp.change_composition({'H2O': calc_result['H2O_liq'],
                                              'CO2': calc_result['CO2_liq']})
                 # check if verbose method has been chosen
@@ -153,7 +158,8 @@ class calculate_dissolved_volatiles(Calculate):
                             'XH2O_fl': calc_result['XH2O_fl'],
                             'XCO2_fl': calc_result['XCO2_fl'],
                             'FluidProportion_wt': calc_result[
-                                                     'FluidProportion_wt']}
+                                                     'FluidProportion_wt'],
+                            'Equilibrations': calc_result['Equilibrations']}
                 else:
                     return {'H2O_liq': bulk_comp.get_composition(
                                                       species='H2O',
@@ -4,6 +4,116 @@ from VESIcal import core
 from scipy.optimize import root_scalar
 from abc import abstractmethod
 import numpy as np
+import warnings as w
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+class FugacityCache(object):
+    """ A bounded least-recently-used cache of fugacity results, used by
+    FugacityModel.enable_cache. Keys are the arguments of the fugacity method, with floats
+    rounded to a number of significant figures. Arguments collected by **kwargs (e.g., the
+    sample passed on by the solubility models) are not used by the fugacity models and are
+    not part of the key. Calls with array arguments are not cached.
+    """
+
+    def __init__(self, maxsize=4096, significant_figures=10):
+        if maxsize < 1:
+            raise core.InputError("maxsize must be at least 1.")
+        self.maxsize = int(maxsize)
+        self.significant_figures = int(significant_figures)
+        self._results = OrderedDict()
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        del state['_signatures']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._signatures = {}
+
+    def _round(self, value):
+        if isinstance(value, (bool, str)) or value is None:
+            return value
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            return float('{:.{}g}'.format(value, self.significant_figures))
+        raise TypeError
+
+    def key(self, fugacity, model, args, kwargs):
+        """ Returns the cache key for a call, or None if the call cannot be cached. """
+        signature = self._signatures.get(fugacity)
+        if signature is None:
+            signature = inspect.signature(fugacity)
+            self._signatures[fugacity] = signature
+        bound = signature.bind(model, *args, **kwargs)
+        bound.apply_defaults()
+        key = [type(model).__name__, fugacity.__qualname__]
+        for name, parameter in signature.parameters.items():
+            variable = parameter.kind in (parameter.VAR_KEYWORD, parameter.VAR_POSITIONAL)
+            if name == 'self' or variable:
+                continue
+            try:
+                key.append(self._round(bound.arguments[name]))
+            except TypeError:
+                return None
+        return tuple(key)
+
+    def call(self, fugacity, model, args, kwargs):
+        """ Returns the cached result of the call if there is one, otherwise calls fugacity and
+        stores the result, evicting the least recently used result if the cache is full. """
+        key = self.key(fugacity, model, args, kwargs)
+        if key is None:
+            return fugacity(model, *args, **kwargs)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+        result = fugacity(model, *args, **kwargs)
+        with self._lock:
+            self.misses += 1
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'currsize': len(self._results), 'maxsize': self.maxsize}
+
+
+def _cacheable(fugacity):
+    """ Wraps the fugacity method of a FugacityModel subclass so that it is answered from the
+    instance's FugacityCache, if one has been enabled. """
+    @functools.wraps(fugacity)
+    def wrapper(self, *args, **kwargs):
+        cache = self.__dict__.get('_fugacity_cache')
+        if cache is None:
+            return fugacity(self, *args, **kwargs)
+        return cache.call(fugacity, self, args, kwargs)
+    return wrapper
 
 
 class FugacityModel(object):
@@ -13,6 +123,11 @@ class FugacityModel(object):
     to calculate the fugacity at a given pressure and mole fraction.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'fugacity' in cls.__dict__:
+            cls.fugacity = _cacheable(cls.__dict__['fugacity'])
+
     def __init__(self):
         self.set_calibration_ranges([])
 
@@ -24,6 +139,46 @@ class FugacityModel(object):
         """
         """
 
+    def enable_cache(self, maxsize=4096, significant_figures=10):
+        """ Stores the results of calls to the fugacity method in a bounded least-recently-used
+        cache, so that repeated calls with the same pressure, temperature and fluid composition
+        are answered without solving the EOS again. Inputs are rounded to significant_figures
+        before being compared, so inputs that differ by less than that are answered with the
+        result of the first of them. Worthwhile for the iteratively solved EOS; for cheap models
+        such as fugacity_idealgas the lookup costs more than the calculation.
+
+        Parameters
+        ----------
+        maxsize     int
+            Maximum number of results stored. Default is 4096.
+        significant_figures     int
+            Number of significant figures to which inputs are rounded. Default is 10.
+        """
+        self._fugacity_cache = FugacityCache(maxsize=maxsize,
+                                             significant_figures=significant_figures)
+
+    def disable_cache(self):
+        """ Removes the fugacity cache enabled with enable_cache. """
+        self._fugacity_cache = None
+
+    def clear_cache(self):
+        """ Empties the fugacity cache and resets its statistics. """
+        if getattr(self, '_fugacity_cache', None) is not None:
+            self._fugacity_cache.clear()
+
+    def cache_info(self):
+        """ Returns the statistics of the fugacity cache.
+
+        Returns
+        -------
+        dict or None
+            Number of hits, misses, and evictions, and the current and maximum number of
+            stored results. None if the cache is not enabled.
+        """
+        if getattr(self, '_fugacity_cache', None) is None:
+            return None
+        return self._fugacity_cache.info()
+
     # @abstractmethod
     def check_calibration_range(self, parameters, report_nonexistance=True):
         s = ''
@@ -33,6 +188,107 @@ class FugacityModel(object):
         return s
 
 
+# ------------- ARRAY ROOT FINDERS ----------------------------- #
+
+def _vectorized_illinois(f, a, b, f_a, f_b, maxiter=200, rtol=1e-12):
+    """ Narrows brackets [a, b] around the roots of arrays of independent problems with the
+    Illinois (modified regula falsi) method, which cannot leave the bracket and so always
+    converges. Elements without a valid bracket (f_a and f_b of the same sign, or not finite)
+    are returned as nan.
+
+    Parameters
+    ----------
+    f   function
+        Function of an array of x values, returning an array of residuals.
+    a, b    numpy.ndarray
+        Ends of the brackets.
+    f_a, f_b    numpy.ndarray
+        Residuals at a and b.
+    maxiter     int
+        Maximum number of iterations.
+    rtol    float
+        Relative tolerance on x.
+
+    Returns
+    -------
+    numpy.ndarray
+        The roots.
+    """
+    side = np.zeros(np.shape(a))
+    active = np.isfinite(f_a) & np.isfinite(f_b) & (f_a*f_b <= 0)
+    x = np.where(active, (a + b)/2, np.nan)
+    for n in range(maxiter):
+        if not np.any(active):
+            break
+        x_new = (a*f_b - b*f_a)/(f_b - f_a)
+        x_new = np.where(np.isfinite(x_new), x_new, (a + b)/2)
+        f_new = f(x_new)
+        same_as_a = f_new*f_a > 0
+        # Illinois step: halve the function value at the end that is retained twice in a row
+        f_b = np.where(same_as_a & (side == 1), f_b/2, f_b)
+        f_a = np.where(~same_as_a & (side == -1), f_a/2, f_a)
+        a = np.where(same_as_a, x_new, a)
+        f_a = np.where(same_as_a, f_new, f_a)
+        b = np.where(same_as_a, b, x_new)
+        f_b = np.where(same_as_a, f_b, f_new)
+        side = np.where(same_as_a, 1, -1)
+        converged = (np.abs(x_new - x) <= rtol*np.abs(x_new)) | (f_new == 0)
+        x = np.where(active, x_new, x)
+        active = active & ~converged
+    return x
+
+
+def _vectorized_secant(f, x0, x1, tol=1.48e-8, maxiter=50):
+    """ Runs the secant iteration of scipy.optimize.newton (as used by root_scalar with
+    method='secant') on arrays of independent problems at once, so that each element follows
+    the same iterates as the scalar solver would.
+
+    Parameters
+    ----------
+    f   function
+        Function of an array of x values, returning an array of residuals.
+    x0  numpy.ndarray
+        First initial guess.
+    x1  numpy.ndarray
+        Second initial guess.
+    tol     float
+        Absolute tolerance on x, as in scipy.optimize.newton.
+    maxiter     int
+        Maximum number of iterations.
+
+    Returns
+    -------
+    tuple of numpy.ndarrays
+        The roots, and a boolean array that is True where the iteration converged.
+    """
+    p0 = np.array(x0, dtype=float)
+    p1 = np.array(x1, dtype=float)
+    q0 = f(p0)
+    q1 = f(p1)
+    root = np.full(np.shape(p0), np.nan)
+    converged = np.zeros(np.shape(p0), dtype=bool)
+    active = np.ones(np.shape(p0), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for n in range(maxiter):
+            stalled = active & (q1 == q0)
+            root = np.where(stalled, (p1 + p0)/2, root)
+            active = active & ~stalled
+            p = np.where(np.abs(q1) > np.abs(q0),
+                         (-q0/q1*p1 + p0)/(1 - q0/q1),
+                         (-q1/q0*p0 + p1)/(1 - q1/q0))
+            done = active & (np.abs(p - p1) <= tol)
+            root = np.where(done, p, root)
+            converged = converged | done
+            active = active & ~done & np.isfinite(p)
+            if not np.any(active):
+                break
+            p0 = np.where(active, p1, p0)
+            q0 = np.where(active, q1, q0)
+            p1 = np.where(active, p, p1)
+            q1 = np.where(active, f(p1), q1)
+    return root, converged
+
+
 # ------------- FUGACITY MODELS -------------------------------- #
 
 class fugacity_idealgas(FugacityModel):
@@ -57,6 +313,190 @@ class fugacity_idealgas(FugacityModel):
         return pressure*X_fluid
 
 
+def _KJ81_parameters(T):
+    """ Returns the Kerrick and Jacobs (1981) parameters for pure CO2 and pure H2O. Works on
+    floats and on numpy arrays of temperature.
+
+    Parameters
+    ----------
+    T   float or numpy.ndarray
+        Temperature in K.
+
+    Returns
+    -------
+    tuple of dicts
+        The b, c, d, and e parameters of CO2 and of H2O.
+    """
+    c = {}
+    h = {}
+    c['b'] = 58.0
+    c['c'] = (28.31 + 0.10721*T - 8.81e-6*T**2)*1e6
+    c['d'] = (9380.0 - 8.53*T + 1.189e-3*T**2)*1e6
+    c['e'] = (-368654.0 + 715.9*T + 0.1534*T**2)*1e6
+    h['b'] = 29.0
+    h['c'] = (290.78 - 0.30276*T + 1.4774e-4*T**2)*1e6
+    h['d'] = (-8374.0 + 19.437*T - 8.148e-3*T**2)*1e6
+    h['e'] = (76600.0 - 133.9*T + 0.1071*T**2)*1e6
+    return c, h
+
+
+def _KJ81_mixing_terms(X, i, j):
+    """ Returns the mixing terms of the Kerrick and Jacobs (1981) EOS for a float or an array of
+    fluid composition, where X is the mole fraction of species i in a binary mixture with
+    species j. Pure fluids (X == 1) use the pure-species parameters for the cross terms, since
+    the geometric means are undefined where the parameters of the two species have different
+    signs.
+
+    Parameters
+    ----------
+    X   float or numpy.ndarray
+        Mole fraction of species i.
+    i   dict
+        Parameters of species i, as returned by _KJ81_parameters.
+    j   dict
+        Parameters of species j, as returned by _KJ81_parameters.
+
+    Returns
+    -------
+    dict
+        The mixture parameters bm, cm, dm and em, and the cross terms c12, d12 and e12.
+    """
+    pure = X == 1
+    m = {}
+    m['bm'] = np.where(pure, i['b'], X*i['b'] + (1-X)*j['b'])
+    with np.errstate(invalid='ignore'):
+        for k in ['c', 'd', 'e']:
+            cross = np.where(pure, i[k], np.sqrt(i[k]*j[k]))
+            m[k+'12'] = cross
+            m[k+'m'] = np.where(pure, i[k],
+                                i[k]*X**2 + j[k]*(1-X)**2 + 2*X*(1-X)*cross)
+    return m
+
+
+def _KJ81_pressure_residual(v, P, T, m):
+    """ Returns the difference between the rhs and lhs of Eq (28) of Kerrick and Jacobs (1981),
+    for arrays of volume, pressure (bars), temperature (K) and mixture parameters.
+    """
+    am = m['cm'] + m['dm']/v + m['em']/v**2
+    y = m['bm']/(4*v)
+    pt1 = (83.14 * T * (1 + y + y**2 - y**3)) / (v*(1-y)**3)
+    pt2 = - am / (T**0.5 * v * (v+m['bm']))
+    return -(P - pt1 - pt2)
+
+
+def _KJ81_solve_volume(P, T, m, x0, maxiter=200, rtol=1e-12):
+    """ Solves Eq (28) of Kerrick and Jacobs (1981) for the volume of the fluid, for arrays of
+    pressure, temperature and mixture parameters at once. Starting from the same initial guess
+    as the scalar solver, a bracket is grown geometrically away from the guess until the
+    residual changes sign, so that the root closest to the guess is found. The bracket is then
+    narrowed with the Illinois (modified regula falsi) method, which cannot leave it.
+
+    Parameters
+    ----------
+    P   numpy.ndarray
+        Total pressure in bars.
+    T   numpy.ndarray
+        Temperature in K.
+    m   dict
+        Mixture parameters, as returned by _KJ81_mixing_terms.
+    x0  numpy.ndarray
+        Initial guess for the volume.
+    maxiter     int
+        Maximum number of bracketing and Illinois iterations.
+    rtol    float
+        Relative tolerance on the volume.
+
+    Returns
+    -------
+    numpy.ndarray
+        Volume of the fluid. Entries for which no root could be bracketed are nan.
+    """
+    def f(v):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _KJ81_pressure_residual(v, P, T, m)
+
+    # The residual tends to +inf as the hard-sphere term diverges (v -> b/4), and to -P as the
+    # volume tends to infinity. Step away from the guess, towards larger volumes if the residual
+    # is positive and towards b/4 otherwise, until the residual changes sign.
+    vmin = m['bm']/4
+    a = np.array(x0, dtype=float)
+    f_a = f(a)
+    b = a.copy()
+    f_b = f_a.copy()
+    up = f_a > 0
+    for n in range(maxiter):
+        grow = f_a*f_b > 0
+        if not np.any(grow):
+            break
+        a = np.where(grow & up, b, a)
+        f_a = np.where(grow & up, f_b, f_a)
+        b = np.where(grow & ~up, a, b)
+        f_b = np.where(grow & ~up, f_a, f_b)
+        b = np.where(grow & up, b*2, b)
+        a = np.where(grow & ~up, vmin + (a - vmin)/2, a)
+        f_b = np.where(grow & up, f(b), f_b)
+        f_a = np.where(grow & ~up, f(a), f_a)
+
+    return _vectorized_illinois(f, a, b, f_a, f_b, maxiter=maxiter, rtol=rtol)
+
+
+def _KJ81_lnPhi(v, P, T, X, i, m):
+    """ Returns the natural log of the fugacity coefficient of species i in a mixed CO2-H2O
+    fluid, using Eq (27) of Kerrick and Jacobs (1981). Works on floats and numpy arrays.
+
+    Parameters
+    ----------
+    v   float or numpy.ndarray
+        Volume of the fluid.
+    P   float or numpy.ndarray
+        Total pressure in bars.
+    T   float or numpy.ndarray
+        Temperature in K.
+    X   float or numpy.ndarray
+        Mole fraction of species i in the fluid.
+    i   dict
+        Parameters of species i, as returned by _KJ81_parameters.
+    m   dict
+        Mixture parameters, as returned by _KJ81_mixing_terms.
+
+    Returns
+    -------
+    float or numpy.ndarray
+        The natural log of the fugacity coefficient of species i.
+    """
+    bm = m['bm']
+    cm = m['cm']
+    dm = m['dm']
+    em = m['em']
+    c12 = m['c12']
+    d12 = m['d12']
+    e12 = m['e12']
+
+    y = bm/(4*v)
+    Z = v*P/(83.14*T)
+    RT = 83.14*T**1.5
+    lnV = np.log((v+bm)/v)
+
+    lnPhi = 0
+    lnPhi += (4*y-3*y**2)/(1-y)**2 + (i['b']/bm * (4*y-2*y**2)/(1-y)**3)
+    lnPhi += - (2*i['c']*X+2*(1-X)*c12)/(RT*bm)*lnV
+    lnPhi += - cm*i['b']/(RT*bm*(v+bm))
+    lnPhi += cm*i['b']/(RT*bm**2)*lnV
+    lnPhi += - (2*i['d']*X+2*d12*(1-X)+dm)/(RT*bm*v)
+    lnPhi += (2*i['d']*X+2*(1-X)*d12+dm)/(RT*bm**2)*lnV
+    lnPhi += i['b']*dm/(RT*v*bm*(v+bm)) + 2*i['b']*dm/(RT*bm**2*(v+bm))
+    lnPhi += - 2*i['b']*dm/(RT*bm**3)*lnV
+    lnPhi += - (2*i['e']*X + 2*(1-X)*e12+2*em)/(RT*2*bm*v**2)
+    lnPhi += (2*i['e']*X+2*e12*(1-X)+2*em)/(RT*bm**2*v)
+    lnPhi += - (2*i['e']*X+2*e12*(1-X)+2*em)/(RT*bm**3)*lnV
+    lnPhi += (em*i['b']/(RT*2*bm*v**2*(v+bm)) -
+              3*em*i['b']/(RT*2*bm**2*v*(v+bm)))
+    lnPhi += (3*em*i['b']/(RT*bm**4)*lnV -
+              3*em*i['b']/(RT*bm**3*(v+bm)))
+    lnPhi += - np.log(Z)
+    return lnPhi
+
+
 class fugacity_KJ81_co2(FugacityModel):
     """ Implementation of the Kerrick and Jacobs (1981) EOS for mixed fluids. This class
     will return the properties of the CO2 component of the mixed fluid.
@@ -99,6 +539,84 @@ class fugacity_KJ81_co2(FugacityModel):
         else:
             return pressure*np.exp(self.lnPhi_mix(pressure, temperature, X_fluid))*X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of CO2 in a mixed
+        CO2-H2O fluid for arrays of pressure, temperature, and fluid composition at once, which
+        are broadcast against each other. Above 1050C, it assumes H2O and CO2 do not interact.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of CO2 in bars
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                      np.asarray(temperature, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        X_mix = np.where(T >= 1050.0, 1.0, X)
+        fugacity = P*np.exp(self.lnPhi_mix_array(P, T, X_mix))*X
+        return np.where(X == 0, 0.0, fugacity)
+
+    def volume_array(self, P, T, X_fluid):
+        """ Array-native version of volume. Solves Eq (28) of Kerrick and Jacobs (1981) for
+        arrays of pressure, temperature and fluid composition at once, starting from the same
+        initial guesses as volume.
+
+        Parameters
+        ----------
+        P   float or numpy.ndarray
+            Total pressure of the system, in bars.
+        T   float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid
+
+        Returns
+        -------
+        numpy.ndarray
+            Volume of the mixed fluid.
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(P, dtype=float), np.asarray(T, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X, c, h)
+        x0 = np.where((P >= 20000) & (T < 800-273.15), X*25+(1-X)*15, X*35+(1-X)*15)
+        return _KJ81_solve_volume(P, T + 273.15, m, x0)
+
+    def lnPhi_mix_array(self, P, T, X_fluid):
+        """ Array-native version of lnPhi_mix. Calculates the natural log of the fugacity
+        coefficient for CO2 in a mixed CO2-H2O fluid, for arrays of pressure, temperature and
+        fluid composition at once.
+
+        Parameters
+        ----------
+        P   float or numpy.ndarray
+            Total pressure in bars.
+        T   float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            The mole fraction of CO2 in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            The natural log of the fugacity coefficient for CO2 in a mixed fluid.
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(P, dtype=float), np.asarray(T, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        v = self.volume_array(P, T, X)
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X, c, h)
+        return _KJ81_lnPhi(v, P, T + 273.15, X, c, m)
+
     def volume(self, P, T, X_fluid):
         """ Calculates the volume of the mixed fluid, by solving Eq (28) of Kerrick and
         Jacobs (1981) using scipy.root_scalar.
@@ -261,62 +779,10 @@ class fugacity_KJ81_co2(FugacityModel):
         float
             The natural log of the fugacity coefficient for CO2 in a mixed fluid.
         """
-        T = T + 273.15
-        v = self.volume(P, T-273.15, X_fluid)
-
-        c = {}
-        h = {}
-
-        c['b'] = 58.0
-        c['c'] = (28.31 + 0.10721*T - 8.81e-6*T**2)*1e6
-        c['d'] = (9380.0 - 8.53*T + 1.189e-3*T**2)*1e6
-        c['e'] = (-368654.0 + 715.9*T + 0.1534*T**2)*1e6
-        h['b'] = 29.0
-        h['c'] = (290.78 - 0.30276*T + 1.4774e-4*T**2)*1e6
-        h['d'] = (-8374.0 + 19.437*T - 8.148e-3*T**2)*1e6
-        h['e'] = (76600.0 - 133.9*T + 0.1071*T**2)*1e6
-
-        if X_fluid == 1:
-            bm = c['b']
-            cm = c['c']
-            c12 = c['c']
-            dm = c['d']
-            d12 = c['d']
-            em = c['e']
-            e12 = c['e']
-        else:
-            bm = X_fluid*c['b'] + (1-X_fluid)*h['b']
-            c12 = (c['c']*h['c'])**0.5
-            cm = c['c']*X_fluid**2 + h['c']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*c12
-            d12 = (c['d']*h['d'])**0.5
-            dm = c['d']*X_fluid**2 + h['d']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*d12
-            e12 = (c['e']*h['e'])**0.5
-            em = c['e']*X_fluid**2 + h['e']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*e12
-
-        y = bm/(4*v)
-
-        Z = v*P/(83.14*T)
-
-        lnPhi = 0
-
-        lnPhi += (4*y-3*y**2)/(1-y)**2 + (c['b']/bm * (4*y-2*y**2)/(1-y)**3)
-        lnPhi += - (2*c['c']*X_fluid+2*(1-X_fluid)*c12)/(83.14*T**1.5*bm)*np.log((v+bm)/v)
-        lnPhi += - cm*c['b']/(83.14*T**1.5*bm*(v+bm))
-        lnPhi += cm*c['b']/(83.14*T**1.5*bm**2)*np.log((v+bm)/v)
-        lnPhi += - (2*c['d']*X_fluid+2*d12*(1-X_fluid)+dm)/(83.14*T**1.5*bm*v)
-        lnPhi += (2*c['d']*X_fluid+2*(1-X_fluid)*d12+dm)/(83.14*T**1.5*bm**2)*np.log((v+bm)/v)
-        lnPhi += c['b']*dm/(83.14*T**1.5*v*bm*(v+bm)) + 2*c['b']*dm/(83.14*T**1.5*bm**2*(v+bm))
-        lnPhi += - 2*c['b']*dm/(83.14*T**1.5*bm**3)*np.log((v+bm)/v)
-        lnPhi += - (2*c['e']*X_fluid + 2*(1-X_fluid)*e12+2*em)/(83.14*T**1.5*2*bm*v**2)
-        lnPhi += (2*c['e']*X_fluid+2*e12*(1-X_fluid)+2*em)/(83.14*T**1.5*bm**2*v)
-        lnPhi += - (2*c['e']*X_fluid+2*e12*(1-X_fluid)+2*em)/(83.14*T**1.5*bm**3)*np.log((v+bm)/v)
-        lnPhi += (em*c['b']/(83.14*T**1.5*2*bm*v**2*(v+bm)) -
-                  3*em*c['b']/(83.14*T**1.5*2*bm**2*v*(v+bm)))
-        lnPhi += (3*em*c['b']/(83.14*T**1.5*bm**4)*np.log((v+bm)/v) -
-                  3*em*c['b']/(83.14*T**1.5*bm**3*(v+bm)))
-        lnPhi += - np.log(Z)
-
-        return lnPhi
+        v = self.volume(P, T, X_fluid)
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X_fluid, c, h)
+        return _KJ81_lnPhi(v, P, T + 273.15, X_fluid, c, m)[()]
 
 
 class fugacity_KJ81_h2o(FugacityModel):
@@ -364,6 +830,86 @@ class fugacity_KJ81_h2o(FugacityModel):
         else:
             return pressure*np.exp(self.lnPhi_mix(pressure, temperature, X_fluid))*X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of H2O in a mixed
+        CO2-H2O fluid for arrays of pressure, temperature, and fluid composition at once, which
+        are broadcast against each other. Above 1050C, it assumes H2O and CO2 do not interact.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of H2O in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of H2O in bars
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                      np.asarray(temperature, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        X_mix = np.where(T >= 1050.0, 1.0, X)
+        fugacity = P*np.exp(self.lnPhi_mix_array(P, T, X_mix))*X
+        return np.where(X == 0, 0.0, fugacity)
+
+    def volume_array(self, P, T, X_fluid):
+        """ Array-native version of volume. Solves Eq (28) of Kerrick and Jacobs (1981) for
+        arrays of pressure, temperature and fluid composition at once, starting from the same
+        initial guesses as volume.
+
+        Parameters
+        ----------
+        P   float or numpy.ndarray
+            Total pressure of the system, in bars.
+        T   float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of H2O in the fluid
+
+        Returns
+        -------
+        numpy.ndarray
+            Volume of the mixed fluid.
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(P, dtype=float), np.asarray(T, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X, h, c)
+        high_P = (P >= 20000) & (T < 800-273.15)
+        x0 = np.where(high_P, (1-X)*25+X*15, (1-X)*35+X*15)
+        x0 = np.where(X == 1, np.where(high_P, 10, 15), x0)
+        return _KJ81_solve_volume(P, T + 273.15, m, x0)
+
+    def lnPhi_mix_array(self, P, T, X_fluid):
+        """ Array-native version of lnPhi_mix. Calculates the natural log of the fugacity
+        coefficient for H2O in a mixed CO2-H2O fluid, for arrays of pressure, temperature and
+        fluid composition at once.
+
+        Parameters
+        ----------
+        P   float or numpy.ndarray
+            Total pressure in bars.
+        T   float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            The mole fraction of H2O in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            The natural log of the fugacity coefficient for H2O in a mixed fluid.
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(P, dtype=float), np.asarray(T, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        v = self.volume_array(P, T, X)
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X, h, c)
+        return _KJ81_lnPhi(v, P, T + 273.15, X, h, m)
+
     def volume(self, P, T, X_fluid):
         """ Calculates the volume of the mixed fluid, by solving Eq (28) of Kerrick and
         Jacobs (1981) using scipy.root_scalar.
@@ -524,63 +1070,69 @@ class fugacity_KJ81_h2o(FugacityModel):
         float
             The natural log of the fugacity coefficient for H2O in a mixed fluid.
         """
-        T = T + 273.15
-        v = self.volume(P, T-273.15, X_fluid)
-
-        c = {}
-        h = {}
-
-        c['b'] = 58.0
-        c['c'] = (28.31 + 0.10721*T - 8.81e-6*T**2)*1e6
-        c['d'] = (9380.0 - 8.53*T + 1.189e-3*T**2)*1e6
-        c['e'] = (-368654.0 + 715.9*T + 0.1534*T**2)*1e6
-        h['b'] = 29.0
-        h['c'] = (290.78 - 0.30276*T + 1.4774e-4*T**2)*1e6
-        h['d'] = (-8374.0 + 19.437*T - 8.148e-3*T**2)*1e6
-        h['e'] = (76600.0 - 133.9*T + 0.1071*T**2)*1e6
-
-        if X_fluid == 1:
-            bm = h['b']
-            cm = h['c']
-            dm = h['d']
-            em = h['e']
-            c12 = h['c']
-            d12 = h['d']
-            e12 = h['e']
-        else:
-            bm = X_fluid*h['b'] + (1-X_fluid)*c['b']
-            c12 = (c['c']*h['c'])**0.5
-            cm = h['c']*X_fluid**2 + c['c']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*c12
-            d12 = (c['d']*h['d'])**0.5
-            dm = h['d']*X_fluid**2 + c['d']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*d12
-            e12 = (c['e']*h['e'])**0.5
-            em = h['e']*X_fluid**2 + c['e']*(1-X_fluid)**2 + 2*X_fluid*(1-X_fluid)*e12
-
-        y = bm/(4*v)
-
-        # Z = (1+y+y**2-y**3)/(1-y)**2 - am/(83.14*T**1.5*(v+bm))
-        Z = v*P/(83.14*T)
-
-        lnPhi = 0
-
-        lnPhi += (4*y-3*y**2)/(1-y)**2 + (h['b']/bm * (4*y-2*y**2)/(1-y)**3)
-        lnPhi += - (2*h['c']*X_fluid+2*(1-X_fluid)*c12)/(83.14*T**1.5*bm)*np.log((v+bm)/v)
-        lnPhi += - cm*h['b']/(83.14*T**1.5*bm*(v+bm))
-        lnPhi += cm*h['b']/(83.14*T**1.5*bm**2)*np.log((v+bm)/v)
-        lnPhi += - (2*h['d']*X_fluid+2*d12*(1-X_fluid)+dm)/(83.14*T**1.5*bm*v)
-        lnPhi += (2*h['d']*X_fluid+2*(1-X_fluid)*d12+dm)/(83.14*T**1.5*bm**2)*np.log((v+bm)/v)
-        lnPhi += h['b']*dm/(83.14*T**1.5*v*bm*(v+bm)) + 2*h['b']*dm/(83.14*T**1.5*bm**2*(v+bm))
-        lnPhi += - 2*h['b']*dm/(83.14*T**1.5*bm**3)*np.log((v+bm)/v)
-        lnPhi += - (2*h['e']*X_fluid + 2*(1-X_fluid)*e12+2*em)/(83.14*T**1.5*2*bm*v**2)
-        lnPhi += (2*h['e']*X_fluid+2*e12*(1-X_fluid)+2*em)/(83.14*T**1.5*bm**2*v)
-        lnPhi += - (2*h['e']*X_fluid+2*e12*(1-X_fluid)+2*em)/(83.14*T**1.5*bm**3)*np.log((v+bm)/v)
-        lnPhi += (em*h['b']/(83.14*T**1.5*2*bm*v**2*(v+bm)) -
-                  3*em*h['b']/(83.14*T**1.5*2*bm**2*v*(v+bm)))
-        lnPhi += (3*em*h['b']/(83.14*T**1.5*bm**4)*np.log((v+bm)/v) -
-                  3*em*h['b']/(83.14*T**1.5*bm**3*(v+bm)))
-        lnPhi += - np.log(Z)
-
-        return lnPhi
+        v = self.volume(P, T, X_fluid)
+        c, h = _KJ81_parameters(T + 273.15)
+        m = _KJ81_mixing_terms(X_fluid, h, c)
+        return _KJ81_lnPhi(v, P, T + 273.15, X_fluid, h, m)[()]
+
+
+# Parameters of the Zhang and Duan (2009) EOS for CO2: the coefficients a1-a15 of their Table 1
+# (a[0] is unused, so that indices match the paper), and the potential parameters epsilon/k (K)
+# and sigma (Angstrom).
+_ZD09_a = np.array([0.0,
+                    2.95177298930e-2,
+                    -6.33756452413e3,
+                    -2.75265428882e5,
+                    1.29128089283e-3,
+                    -1.45797416153e2,
+                    7.65938947237e4,
+                    2.58661493537e-6,
+                    0.52126532146,
+                    -1.39839523753e2,
+                    -2.36335007175e-8,
+                    5.35026383543e-3,
+                    -0.27110649951,
+                    2.50387836486e4,
+                    0.73226726041,
+                    1.5483335997e-2])
+_ZD09_epsilon = 235.0
+_ZD09_sigma = 3.79
+
+
+def _ZD09_Vm_residual(Vm, Pm, Tm):
+    """ Difference between the (rearranged) LHS and RHS of eqn (8) of Zhang and Duan (2009),
+    for floats or numpy arrays of Vm and of the reduced pressure and temperature. """
+    a = _ZD09_a
+    return ((1+(a[1]+a[2]/Tm**2+a[3]/Tm**3)/Vm +
+             (a[4]+a[5]/Tm**2+a[6]/Tm**3)/Vm**2 +
+             (a[7]+a[8]/Tm**2+a[9]/Tm**3)/Vm**4)*0.08314*Tm/Pm - Vm
+            )
+
+
+def _ZD09_solve_Vm_bracketed(Pm, Tm):
+    """ Solves eqn (8) of Zhang and Duan (2009) for Vm with a bracketing method, for arrays of
+    reduced pressure and temperature. The residual tends to +inf as Vm tends to zero (the
+    Vm**-4 coefficient is positive over the calibrated temperatures) and to -inf as Vm tends to
+    infinity, so a bracket is found by moving its ends outwards until the signs differ.
+    """
+    def f(Vm):
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return _ZD09_Vm_residual(Vm, Pm, Tm)
+
+    a = np.full(np.shape(Pm), 1.0)
+    b = np.full(np.shape(Pm), 1000.0)
+    f_a = f(a)
+    f_b = f(b)
+    for n in range(200):
+        grow_a = ~(f_a > 0)
+        grow_b = ~(f_b < 0)
+        if not np.any(grow_a | grow_b):
+            break
+        a = np.where(grow_a, a/2, a)
+        b = np.where(grow_b, b*2, b)
+        f_a = np.where(grow_a, f(a), f_a)
+        f_b = np.where(grow_b, f(b), f_b)
+    return _vectorized_illinois(f, a, b, f_a, f_b)
 
 
 class fugacity_ZD09_co2(FugacityModel):
@@ -623,24 +1175,9 @@ class fugacity_ZD09_co2(FugacityModel):
         P = pressure/10
         T = temperature + 273.15
 
-        a = np.array([0.0,
-                      2.95177298930e-2,
-                      -6.33756452413e3,
-                      -2.75265428882e5,
-                      1.29128089283e-3,
-                      -1.45797416153e2,
-                      7.65938947237e4,
-                      2.58661493537e-6,
-                      0.52126532146,
-                      -1.39839523753e2,
-                      -2.36335007175e-8,
-                      5.35026383543e-3,
-                      -0.27110649951,
-                      2.50387836486e4,
-                      0.73226726041,
-                      1.5483335997e-2])
-        e = 235.0
-        s = 3.79
+        a = _ZD09_a
+        e = _ZD09_epsilon
+        s = _ZD09_sigma
 
         Pm = 3.0636*P*s**3/e
         Tm = 154*T/e
@@ -660,6 +1197,60 @@ class fugacity_ZD09_co2(FugacityModel):
 
         return P*np.exp(lnfc)*10
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of CO2 for arrays of
+        pressure and temperature at once, which are broadcast against each other. Vm is found
+        for all elements together, with the same secant iteration and starting points as the
+        scalar version, so the results agree with it. Elements for which the secant iteration
+        does not converge (where the scalar version returns an unconverged Vm, e.g., at
+        200 degC and more than 25 kbar) are solved again by bisection-safe bracketing, which
+        always converges. Like fugacity, the result does not depend on X_fluid.
+
+        Parameters
+        ---------
+        pressure     float or numpy.ndarray
+            Pressure in bars
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid. Not used. Default is 1.0.
+
+        Returns
+        -------
+        numpy.ndarray
+            Fugacity of CO2, standard state 1 bar.
+        """
+        pressure, temperature = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                                    np.asarray(temperature, dtype=float))
+        shape = np.shape(pressure)
+        pressure = pressure.ravel()
+        temperature = temperature.ravel()
+        P = pressure/10
+        T = temperature + 273.15
+
+        a = _ZD09_a
+        Pm = 3.0636*P*_ZD09_sigma**3/_ZD09_epsilon
+        Tm = 154*T/_ZD09_epsilon
+        Vm, converged = _vectorized_secant(lambda Vm: _ZD09_Vm_residual(Vm, Pm, Tm),
+                                           np.full(np.shape(P), 200.0),
+                                           np.full(np.shape(P), 100.0))
+        if not np.all(converged):
+            Vm[~converged] = _ZD09_solve_Vm_bracketed(Pm[~converged], Tm[~converged])
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            S1 = ((a[1]+a[2]/Tm**2+a[3]/Tm**3)/Vm +
+                  (a[4]+a[5]/Tm**2+a[6]/Tm**3)/(2*Vm**2) +
+                  (a[7]+a[8]/Tm**2+a[9]/Tm**3)/(4*Vm**4) +
+                  (a[10]+a[11]/Tm**2+a[12]/Tm**3)/(5*Vm**5) +
+                  (a[13]/(2*a[15]*Tm**3)*(a[14]+1-(a[14]+1+a[15]/Vm**2) *
+                   np.exp(-a[15]/Vm**2)))
+                  )
+            Z = Pm*Vm/(8.314*Tm)
+            lnfc = Z - 1 - np.log(Z) + S1
+            fugacity = P*np.exp(lnfc)*10
+
+        return fugacity.reshape(shape)
+
     def Vm(self, Vm, P, T):
         """ Function to use for solving for the parameter Vm, defined by eqn (8) of
         Zhang and Duan (2009). Called by scipy.fsolve in the fugacity method.
@@ -678,29 +1269,113 @@ class fugacity_ZD09_co2(FugacityModel):
         float
             Difference between (rearranged) LHS and RHS of eqn (8) of Zhang and Duan (2009).
         """
-        Pm = 3.0636*P*3.79**3/235.0
-        Tm = 154*T/235.0
-        a = np.array([0.0,
-                      2.95177298930e-2,
-                      -6.33756452413e3,
-                      -2.75265428882e5,
-                      1.29128089283e-3,
-                      -1.45797416153e2,
-                      7.65938947237e4,
-                      2.58661493537e-6,
-                      0.52126532146,
-                      -1.39839523753e2,
-                      -2.36335007175e-8,
-                      5.35026383543e-3,
-                      -0.27110649951,
-                      2.50387836486e4,
-                      0.73226726041,
-                      1.5483335997e-2])
-
-        return ((1+(a[1]+a[2]/Tm**2+a[3]/Tm**3)/Vm +
-                 (a[4]+a[5]/Tm**2+a[6]/Tm**3)/Vm**2 +
-                 (a[7]+a[8]/Tm**2+a[9]/Tm**3)/Vm**4)*0.08314*Tm/Pm - Vm
-                )
+        Pm = 3.0636*P*_ZD09_sigma**3/_ZD09_epsilon
+        Tm = 154*T/_ZD09_epsilon
+        return _ZD09_Vm_residual(Vm, Pm, Tm)
+
+
+def _MRK_volume(model, V, Q, TK, A, B, P, maxiter=None):
+    """ Continues the VolatileCalc iteration for the volume of one state of
+    _MRK_pure_fugacity_array from volume V and step factor Q, with the same steps as the
+    scalar routine. Returns the volume, or nan if it has not converged within maxiter
+    iterations (if maxiter is not None). """
+    n = 0
+    while maxiter is None or n < maxiter:
+        n += 1
+        Temp1 = V
+        FNF_1 = model.FNF(Temp1, TK, A, B, P)
+        F_1 = (model.FNF(Temp1 + 0.01, TK, A, B, P) - FNF_1) / 0.01
+        V = Temp1 - Q * FNF_1 / F_1
+        F_2 = (model.FNF(V + 0.01, TK, A, B, P) - model.FNF(V, TK, A, B, P)) / 0.01
+        if F_2 * F_1 <= 0:
+            Q = Q / 2.
+        if not abs(V - Temp1) >= 0.00001:
+            return V
+    return np.nan
+
+
+def _MRK_pure_fugacity_array(model, P, TK, X_1, maxiter=None):
+    """ Array-native version of the MRK routine of fugacity_MRK_co2 and fugacity_MRK_h2o, for
+    one endmember and arrays of pressure and temperature. The VolatileCalc Newton-style
+    iteration for the volume is run on all elements together, each element following exactly
+    the same steps as in the scalar routine, and stops for each element as soon as its own
+    convergence criterion is met.
+
+    Parameters
+    ----------
+    model   fugacity_MRK_co2 or fugacity_MRK_h2o object
+        Provides the FNA, FNB, FNC and FNF functions.
+    P   numpy.ndarray
+        Pressure in bars.
+    TK  numpy.ndarray
+        Temperature in K.
+    X_1     int
+        1 for pure H2O, 0 for pure CO2.
+    maxiter     int
+        Maximum number of iterations. Elements that have not converged by then are nan. Default
+        is None, in which case, as in the scalar routine, every element is iterated until it
+        converges. Some low temperature states take hundreds of thousands of iterations.
+
+    Returns
+    -------
+    numpy.ndarray
+        Fugacity of the endmember in bars.
+    """
+    R = 83.14321
+    B_1 = 14.6
+    B_2 = 29.7
+
+    B = X_1 * B_1 + (1 - X_1) * B_2
+    A = (X_1**2 * model.FNA(TK) + 2 * X_1 * (1 - X_1) * model.FNC(TK) +
+         (1 - X_1)**2 * model.FNB(TK))
+    P, TK, A = np.broadcast_arrays(P, TK, A)
+    V = np.full(np.shape(P), np.nan)
+    # Only the elements that have not converged yet are carried through each iteration
+    idx = np.arange(np.size(P))
+    P_i = np.ravel(P)
+    TK_i = np.ravel(TK)
+    A_i = np.ravel(A)
+    Temp2 = np.full(np.shape(idx), B + 5.0)
+    Q = np.ones(np.shape(idx))
+    n = 0
+    while maxiter is None or n < maxiter:
+        n += 1
+        Temp1 = Temp2
+        FNF_1 = model.FNF(Temp1, TK_i, A_i, B, P_i)
+        F_1 = (model.FNF(Temp1 + 0.01, TK_i, A_i, B, P_i) - FNF_1) / 0.01
+        Temp2 = Temp1 - Q * FNF_1 / F_1
+        F_2 = (model.FNF(Temp2 + 0.01, TK_i, A_i, B, P_i) -
+               model.FNF(Temp2, TK_i, A_i, B, P_i)) / 0.01
+        Q = np.where(F_2 * F_1 <= 0, Q / 2., Q)
+        active = np.abs(Temp2 - Temp1) >= 0.00001
+        V.flat[idx[~active]] = Temp2[~active]
+        if not np.any(active):
+            break
+        idx = idx[active]
+        P_i = P_i[active]
+        TK_i = TK_i[active]
+        A_i = A_i[active]
+        Temp2 = Temp2[active]
+        Q = Q[active]
+        if np.size(idx) <= 16:
+            # The few elements left, often low temperature states that take many thousands of
+            # iterations, are finished one by one, which is much faster than with arrays.
+            for i, V_i, Q_i, TK_ii, A_ii, P_ii in zip(idx, Temp2, Q, TK_i, A_i, P_i):
+                V.flat[i] = _MRK_volume(model, V_i, Q_i, TK_ii, A_ii, B, P_ii,
+                                        None if maxiter is None else maxiter - n)
+            break
+
+    if X_1 == 1:
+        G = (np.log(V / (V - B)) + B_1 / (V - B) - 2 * (X_1 * model.FNA(TK) +
+             (1 - X_1) * model.FNC(TK)) * np.log((V + B) / V) / (R * TK**1.5 * B))
+        G = (G + (np.log((V + B) / V) - B / (V + B)) * A * B_1 / (R * TK**1.5 * B**2) -
+             np.log(P * V / (R * TK)))
+    else:
+        G = (np.log(V / (V - B)) + B_2 / (V - B) - 2 * (X_1 * model.FNC(TK) +
+             (1 - X_1) * model.FNB(TK)) * np.log((V + B) / V) / (R * TK**1.5 * B))
+        G = (G + (np.log((V + B) / V) - B / (V + B)) * A * B_2 / (R * TK**1.5 * B**2) -
+             np.log(P * V / (R * TK)))
+    return np.exp(G) * P
 
 
 class fugacity_MRK_co2(FugacityModel):
@@ -732,6 +1407,32 @@ class fugacity_MRK_co2(FugacityModel):
         fug = self.MRK(pressure, temperature+273.15)
         return fug*X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of CO2 in a pure or mixed
+        H2O-CO2 fluid (assuming ideal mixing), for arrays of pressure, temperature and fluid
+        composition at once, which are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of CO2 in bars
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                      np.asarray(temperature, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            fug = _MRK_pure_fugacity_array(self, P, T+273.15, 0)
+        return fug*X
+
     def FNA(self, TK):
         return ((166800000 - 193080 * (TK - 273.15) + 186.4 * (TK - 273.15)**2
                 - 0.071288 * ((TK - 273.15)**3)) * 1.01325)
@@ -815,6 +1516,32 @@ class fugacity_MRK_h2o(FugacityModel):
         fug = self.MRK(pressure, temperature+273.15)
         return fug*X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of H2O in a pure or mixed
+        H2O-CO2 fluid (assuming ideal mixing), for arrays of pressure, temperature and fluid
+        composition at once, which are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of H2O in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of H2O in bars
+        """
+        P, T, X = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                      np.asarray(temperature, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            fug = _MRK_pure_fugacity_array(self, P, T+273.15, 1)
+        return fug*X
+
     def FNA(self, TK):
         return ((166800000 - 193080 * (TK - 273.15) + 186.4 * (TK - 273.15)**2 -
                 0.071288 * ((TK - 273.15)**3)) * 1.01325)
@@ -893,6 +1620,29 @@ class fugacity_HB_co2(FugacityModel):
         pure_f = self.HBmodel.fugacity(pressure=pressure, temperature=temperature, species='CO2')
         return pure_f * X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of CO2 in a pure or mixed
+        H2O-CO2 fluid (assuming ideal mixing), for arrays of pressure, temperature and fluid
+        composition at once, which are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of CO2 in bars
+        """
+        pure_f = self.HBmodel.fugacity_array(pressure=pressure, temperature=temperature,
+                                             species='CO2')
+        return pure_f * X_fluid
+
 
 class fugacity_HB_h2o(FugacityModel):
     """
@@ -917,6 +1667,29 @@ class fugacity_HB_h2o(FugacityModel):
         pure_f = self.HBmodel.fugacity(pressure=pressure, temperature=temperature, species='H2O')
         return pure_f * X_fluid
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of H2O in a pure or mixed
+        H2O-CO2 fluid (assuming ideal mixing), for arrays of pressure, temperature and fluid
+        composition at once, which are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of H2O in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of H2O in bars
+        """
+        pure_f = self.HBmodel.fugacity_array(pressure=pressure, temperature=temperature,
+                                             species='H2O')
+        return pure_f * X_fluid
+
 
 class fugacity_HollowayBlank(FugacityModel):
     """
@@ -1036,6 +1809,66 @@ class fugacity_HollowayBlank(FugacityModel):
 
         return XLNFP
 
+    def REDKW_array(self, BP, A2B):
+        """
+        Array-native version of REDKW. Calculates the fugacity coefficient term for arrays of
+        B and A parameter sums at once, selecting the real root of the cubic (or the largest of
+        the three real roots) element by element with the same closed-form expressions.
+
+        Parameters
+        ----------
+        BP: numpy.ndarray
+            B parameter sum from RKCALC
+
+        A2B: numpy.ndarray
+            A parameter sum from RKCALC
+
+        Returns
+        -------
+        numpy.ndarray
+            XLNFP (fugacity coefficient?)
+        """
+        BP, A2B = np.broadcast_arrays(np.asarray(BP, dtype=float), np.asarray(A2B, dtype=float))
+        A2B = np.where(A2B < 1*10**(-10), 0.001, A2B)
+
+        # Define constants
+        TH = 0.333333
+        RR = -A2B*BP**2
+        QQ = BP*(A2B-BP-1)
+        XN = QQ*TH+RR-0.074074
+        XM = QQ-TH
+        XNN = XN*XN*0.25
+        XMM = XM**3 / 27.0
+        ARG = XNN+XMM
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # One real root
+            X = np.sqrt(np.where(ARG > 0, ARG, 0))
+            XN2 = -XN*0.5
+            iXMM = XN2+X
+            iXNN = XN2-X
+            Z_one = (np.where(iXMM < 0, -1, 1)*np.abs(iXMM)**TH +
+                     np.where(iXNN < 0, -1, 1)*np.abs(iXNN)**TH + TH)
+
+            # Three real roots: take the largest
+            COSPHI = np.sqrt(-XNN/XMM)
+            COSPHI = np.where(XN > 0, -COSPHI, COSPHI)
+            TANPHI = np.sqrt(1-COSPHI**2)/COSPHI
+            PHI = np.arctan(TANPHI)*TH
+            FAC = 2*np.sqrt(-XM*TH)
+            RH = np.maximum(np.maximum(np.cos(PHI), np.cos(PHI+2.0944)), np.cos(PHI+4.18879))
+            Z_three = RH*FAC+TH
+
+            Z = np.where(ARG > 0, Z_one, Z_three)
+            ZBP = Z-BP
+            ZBP = np.where(ZBP < 0.000001, 0.000001, ZBP)
+            BPZ = 1+BP/Z
+            FP = Z-1-np.log(ZBP)-A2B*np.log(BPZ)
+        FP = np.where((FP < -37) | (FP > 37), 0.000001, FP)
+        XLNFP = np.where(ARG == 0, 1.0, FP)
+
+        return XLNFP
+
     def Saxena(self, TK, pb):
         """
         High pressure corresponding states routines from Saxena and Fei (1987) GCA
@@ -1058,6 +1891,31 @@ class fugacity_HollowayBlank(FugacityModel):
         # Define integration limit
         PO = 4000
 
+        A, B_PC, C_PC, D_PC = self.Saxena_coefficients(TK)
+
+        # integrate from PO (4000 bars) to P to calculate ln fugacity
+        LNF = A*np.log(pb/PO)+B_PC*(pb-PO)+C_PC*(pb**2-PO**2)
+        LNF = LNF+D_PC*(pb**3-PO**3)
+        XLNF = LNF
+
+        return XLNF
+
+    def Saxena_coefficients(self, TK):
+        """
+        The temperature-dependent coefficients of the Saxena and Fei (1987) integral, i.e., the
+        terms A, B/PC, C/(2*PC**2), and D/(3*PC**3) multiplying ln(P/PO), (P-PO), (P**2-PO**2)
+        and (P**3-PO**3). Works on floats and numpy arrays.
+
+        Parameters
+        ----------
+        TK: float or numpy.ndarray
+            Temperature in K.
+
+        Returns
+        -------
+        tuple
+            The four coefficients.
+        """
         # Critical temperatures and pressures for CO2
         TR = TK/304.2
         PC = 73.9
@@ -1068,12 +1926,7 @@ class fugacity_HollowayBlank(FugacityModel):
         C = -1.8935*10**(-6)/TR - 1.1092*10**(-5)/TR**2 - 2.1892*10**(-5)/TR**3
         D = 5.0527*10**(-11)/TR - 6.3033*10**(-21)/TR**3
 
-        # integrate from PO (4000 bars) to P to calculate ln fugacity
-        LNF = A*np.log(pb/PO)+(B/PC)*(pb-PO)+(C/(2*PC**2))*(pb**2-PO**2)
-        LNF = LNF+(D/(3*PC**3))*(pb**3-PO**3)
-        XLNF = LNF
-
-        return XLNF
+        return A, B/PC, C/(2*PC**2), D/(3*PC**3)
 
     def RKCALC(self, temperature, pressure, species):
         """
@@ -1125,6 +1978,98 @@ class fugacity_HollowayBlank(FugacityModel):
         PUREG = XLNFP + PBLN
         return PUREG
 
+    def RKCALC_array(self, temperature, pressure, species):
+        """
+        Array-native version of RKCALC, for arrays of temperature and pressure.
+
+        Parameters
+        ----------
+        temperature: numpy.ndarray
+            Temperature in degrees K.
+
+        pressure: numpy.ndarray
+            Pressure in atmospheres.
+
+        species: str
+            'H2O' or 'CO2'.
+
+        Returns
+        -------
+        numpy.ndarray
+            Natural log of the fugacity of a pure gas.
+        """
+        # Define constants
+        R = 82.05736
+        pb = 1.013*pressure
+        PBLN = np.log(pb)
+        TCEL = temperature-273.15
+        RXT = R*temperature
+        RT = R*temperature**1.5 * 10**(-6)
+
+        if species == 'CO2':
+            ACO2M = 73.03 - 0.0714*TCEL + 2.157*10**(-5)*TCEL**2
+            BSUM = 29.7
+            ASUM = ACO2M / (BSUM*RT)
+        elif species == 'H2O':
+            AH2OM = 115.98 - np.double(0.0016295)*temperature - 1.4984*10**(-5)*temperature**2
+            BSUM = 14.5
+            ASUM = AH2OM / (BSUM*RT)
+        else:
+            raise core.InputError("Species must be H2O or CO2.")
+
+        BSUM = pressure*BSUM/RXT
+        XLNFP = self.REDKW_array(BSUM, ASUM)
+
+        # Convert to ln(fugacity)
+        PUREG = XLNFP + PBLN
+        return PUREG
+
+    def fugacity_array(self, pressure, temperature, species, **kwargs):
+        """
+        Array-native version of fugacity, for arrays of pressure and temperature, which are
+        broadcast against each other. For CO2 above 4000 bars, the MRK fugacity at 4000 bars
+        and the coefficients of the Saxena and Fei (1987) integral depend only on temperature,
+        so they are calculated once for each distinct temperature.
+
+        Parameters
+        ----------
+        pressure: float or numpy.ndarray
+            Pressure in bars.
+
+        temperature: float or numpy.ndarray
+            Temperature in degrees C.
+
+        species: str
+            Choose which species to calculate. Options are 'H2O' and 'CO2'.
+
+        Returns
+        -------
+        numpy.ndarray
+            Fugacity of the passed species, in bars
+        """
+        pressure, temperature = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                                    np.asarray(temperature, dtype=float))
+        shape = np.shape(pressure)
+        pressure = pressure.ravel()
+        temperatureK = temperature.ravel() + 273.15
+        PO = 4000/1.013
+
+        PUREG = self.RKCALC_array(temperatureK, pressure/1.013, species)
+
+        high = pressure > 4000
+        if species == 'CO2' and np.any(high):
+            TK, inverse = np.unique(temperatureK[high], return_inverse=True)
+            inverse = inverse.ravel()
+            iPUREG = self.RKCALC_array(TK, np.full(np.shape(TK), PO), species)
+            A, B_PC, C_PC, D_PC = self.Saxena_coefficients(TK)
+            pb = pressure[high]
+            XLNF = (A[inverse]*np.log(pb/4000)+B_PC[inverse]*(pb-4000) +
+                    C_PC[inverse]*(pb**2-4000**2))
+            XLNF = XLNF+D_PC[inverse]*(pb**3-4000**3)
+            PUREG[high] = iPUREG[inverse] + XLNF
+
+        return np.exp(PUREG).reshape(shape)
+
     def fugacity(self, pressure, temperature, species, **kwargs):
         """
         Calculates fugacity.
@@ -1189,6 +2134,28 @@ class fugacity_RK_co2(FugacityModel):
     def fugacity(self, pressure, temperature, X_fluid, **kwargs):
         return self.RKmodel.fugacity(pressure, temperature, X_fluid, 'CO2')
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of CO2 in a pure or mixed
+        H2O-CO2 fluid, for arrays of pressure, temperature and fluid composition at once, which
+        are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of CO2 in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of CO2 in bars
+        """
+        return self.RKmodel.fugacity(np.asarray(pressure, dtype=float),
+                                     np.asarray(temperature, dtype=float), X_fluid, 'CO2')
+
 
 class fugacity_RK_h2o(FugacityModel):
     """
@@ -1213,6 +2180,28 @@ class fugacity_RK_h2o(FugacityModel):
     def fugacity(self, pressure, temperature, X_fluid, **kwargs):
         return self.RKmodel.fugacity(pressure, temperature, X_fluid, 'H2O')
 
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Array-native version of fugacity. Calculates the fugacity of H2O in a pure or mixed
+        H2O-CO2 fluid, for arrays of pressure, temperature and fluid composition at once, which
+        are broadcast against each other.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of H2O in the fluid.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity of H2O in bars
+        """
+        return self.RKmodel.fugacity(np.asarray(pressure, dtype=float),
+                                     np.asarray(temperature, dtype=float), X_fluid, 'H2O')
+
 
 class fugacity_RedlichKwong(FugacityModel):
     """
@@ -1233,16 +2222,38 @@ class fugacity_RedlichKwong(FugacityModel):
                 pass_msg=calibration_checks.crmsg_GreaterThan_pass,
                 description_msg=calibration_checks.crmsg_GreaterThan_description)])
 
+        R = 8.3145
+        self.critical_params = {'CO2': {"cT":   304.15,
+                                        "cP":   73.8659,
+                                        "o":    0.225
+                                        },
+                                'H2O': {"cT":   647.25,
+                                        "cP":   221.1925,
+                                        "o":    0.334
+                                        }
+                                }
+
+        # Calculate a and b parameters (depend only on critical parameters)...
+        self.species_params = {}
+        for species, critical_params in self.critical_params.items():
+            a = (0.42748 * R**2.0 * critical_params["cT"]**(2.5) /
+                 (critical_params["cP"] * 10.0**5))
+            b = (0.08664 * R * critical_params["cT"] /
+                 (critical_params["cP"] * 10.0**5))
+            self.species_params[species] = (a, b)
+
     def gamma(self, pressure, temperature, species):
         """
-        Calculates fugacity coefficients.
+        Calculates fugacity coefficients. Pressure and temperature may be floats or numpy
+        arrays, which are broadcast against each other; the cubic equation of state is solved
+        for all elements at once.
 
         Parameters
         ----------
-        temperature: fload
+        temperature: float or numpy.ndarray
             Temperature in degrees C.
 
-        pressure: float
+        pressure: float or numpy.ndarray
             Pressure in bars.
 
         species: str
@@ -1250,28 +2261,16 @@ class fugacity_RedlichKwong(FugacityModel):
 
         Returns
         -------
-        float
+        float or numpy.ndarray
             Fugacity coefficient for passed species.
         """
+        if species not in self.species_params:
+            raise core.InputError("Species must be H2O or CO2.")
 
-        temperatureK = temperature + 273.15
+        temperatureK = np.asarray(temperature, dtype=float) + 273.15
+        pressure = np.asarray(pressure, dtype=float)
         R = 8.3145
-
-        critical_params = {'CO2': {"cT":   304.15,
-                                   "cP":   73.8659,
-                                   "o":    0.225
-                                   },
-                           'H2O': {"cT":   647.25,
-                                   "cP":   221.1925,
-                                   "o":    0.334
-                                   }
-                           }
-
-        # Calculate a and b parameters (depend only on critical parameters)...
-        a = (0.42748 * R**2.0 * critical_params[species]["cT"]**(2.5) /
-             (critical_params[species]["cP"] * 10.0**5))
-        b = (0.08664 * R * critical_params[species]["cT"] /
-             (critical_params[species]["cP"] * 10.0**5))
+        a, b = self.species_params[species]
 
         # Calculate coefficients in the cubic equation of state...
         # coeffs: (C0, C1, C2, A, B)
@@ -1286,68 +2285,388 @@ class fugacity_RedlichKwong(FugacityModel):
         P1 = C2**2.0 / 9.0 - C1 / 3.0
         D = Q1**2.0 - P1**3.0
 
-        if D >= 0:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # D >= 0: one real root (Cardano)
             kOneThird = 1.0 / 3.0
+            sqrtD = np.sqrt(np.where(D >= 0, D, 0.0))
 
-            absQ1PSqrtD = np.fabs(Q1 + np.sqrt(D))
+            absQ1PSqrtD = np.fabs(Q1 + sqrtD)
             temp1 = absQ1PSqrtD**kOneThird
-            temp1 *= (Q1 + np.sqrt(D)) / absQ1PSqrtD
+            temp1 = temp1 * (Q1 + sqrtD) / absQ1PSqrtD
 
-            absQ1MSqrtD = np.fabs(Q1 - np.sqrt(D))
+            absQ1MSqrtD = np.fabs(Q1 - sqrtD)
             temp2 = absQ1MSqrtD**kOneThird
-            temp2 *= (Q1 - np.sqrt(D)) / absQ1MSqrtD
+            temp2 = temp2 * (Q1 - sqrtD) / absQ1MSqrtD
 
-            Z0 = temp1 + temp2 - C2 / 3.0
-        else:
+            Z_cardano = temp1 + temp2 - C2 / 3.0
+
+            # D < 0: three real roots (trigonometric); the largest is used
             temp1 = Q1**2.0 / (P1**3.0)
             temp2 = np.sqrt(1.0 - temp1) / np.sqrt(temp1)
-            temp2 *= Q1 / np.fabs(Q1)
-
-            gamma = np.arctan(temp2)
-
-            if gamma < 0:
-                gamma = gamma + np.pi
-
-            Z0 = 2.0 * np.sqrt(P1) * np.cos(gamma/3.0) - C2 / 3.0
-            Z1 = 2.0 * np.sqrt(P1) * np.cos((gamma + 2.0 * np.pi) / 3.0) - C2/3.0
-            Z2 = 2.0 * np.sqrt(P1) * np.cos((gamma + 4.0 * np.pi) / 3.0) - C2/3.0
+            temp2 = temp2 * Q1 / np.fabs(Q1)
 
-            if Z0 < Z1:
-                temp0 = Z0
-                Z0 = Z1
-                Z1 = temp0
+            angle = np.arctan(temp2)
+            angle = np.where(angle < 0, angle + np.pi, angle)
 
-            if Z1 < Z2:
-                temp0 = Z1
-                Z1 = Z2
-                Z2 = temp0
+            Z0 = 2.0 * np.sqrt(P1) * np.cos(angle/3.0) - C2 / 3.0
+            Z1 = 2.0 * np.sqrt(P1) * np.cos((angle + 2.0 * np.pi) / 3.0) - C2/3.0
+            Z2 = 2.0 * np.sqrt(P1) * np.cos((angle + 4.0 * np.pi) / 3.0) - C2/3.0
+            Z_trig = np.maximum(np.maximum(Z0, Z1), Z2)
 
-            if Z0 < Z1:
-                temp0 = Z0
-                Z0 = Z1
-                Z1 = temp0
+            Z0 = np.where(D >= 0, Z_cardano, Z_trig)
 
-        # Calculate Departure Functions
-        gamma = np.exp(Z0 - 1.0 - np.log(Z0-B) - A * np.log(1.0+B/Z0)/B)
+            # Calculate Departure Functions
+            gamma = np.exp(Z0 - 1.0 - np.log(Z0-B) - A * np.log(1.0+B/Z0)/B)
 
-        return gamma
+        # A float for float pressure and temperature
+        return gamma[()]
 
     def fugacity(self, pressure, temperature, X_fluid=1.0, species='H2O', **kwargs):
         """
         Calculates the fugacity of H2O in a mixed H2O-CO2 fluid using the universal relationships:
         P_i = f_i/gamma_i = (fpure_i * Xfluid_i) / gamma_i
-        See Iacovino (2015) EPSL for further explanation.
+        See Iacovino (2015) EPSL for further explanation. Pressure, temperature and X_fluid may be
+        floats or numpy arrays.
         """
+        if species not in ['H2O', 'CO2']:
+            raise core.InputError("Species must be H2O or CO2.")
+
+        fugacity_pure = pressure * self.gamma(pressure, temperature, species)
+        return fugacity_pure * X_fluid
+
 
-        gammaH2O = self.gamma(pressure, temperature, 'H2O')
-        gammaCO2 = self.gamma(pressure, temperature, 'CO2')
+# ------------- TABULATED FUGACITY MODELS ---------------------- #
 
-        fugacityH2Opure = pressure * gammaH2O
-        fugacityCO2pure = pressure * gammaCO2
+def _cubic_stencil(x, x_min, step, n):
+    """ Returns the index of the first of four neighbouring grid nodes, and the Lagrange weights
+    of those nodes, for cubic interpolation at x on a uniform grid.
 
-        if species == 'H2O':
-            return fugacityH2Opure * X_fluid
-        elif species == 'CO2':
-            return fugacityCO2pure * X_fluid
+    Parameters
+    ----------
+    x   numpy.ndarray
+        Query coordinates.
+    x_min   float
+        Coordinate of the first grid node.
+    step    float
+        Spacing of the grid nodes.
+    n   int
+        Number of grid nodes, at least 4.
+
+    Returns
+    -------
+    tuple
+        The index of the first node of each stencil, and an array of shape (4, len(x)) with
+        the weights of the four nodes.
+    """
+    u = (x - x_min)/step
+    i = np.clip(np.floor(u).astype(int) - 1, 0, n - 4)
+    t = u - i - 1
+    weights = np.array([-t*(t-1)*(t-2)/6,
+                        (t+1)*(t-1)*(t-2)/2,
+                        -(t+1)*t*(t-2)/2,
+                        (t+1)*t*(t-1)/6])
+    return i, weights
+
+
+class fugacity_tabulated(FugacityModel):
+    """ Answers fugacity queries for another fugacity model by interpolating in a precomputed
+    table of its fugacity coefficients, rather than solving the EOS at every call.
+
+    The natural log of the fugacity coefficient is tabulated on a uniform grid of ln(pressure),
+    temperature, and, for models in which the species do not mix ideally (the Kerrick and
+    Jacobs, 1981, EOS), the mole fraction of the species in the fluid. For the other models the
+    fugacity is scaled with the mole fraction exactly as the model itself does. Queries are
+    answered by tensor-product cubic (four-point Lagrange) interpolation. The table is built the
+    first time it is needed, and is saved to, and later loaded from, a cache directory on disk.
+
+    When the table is built, the interpolated fugacity is compared with the exact EOS at three
+    points of every grid cell: its centre, and the points a quarter and three quarters of the
+    way along its diagonal. Cells in which the relative error at any of these points exceeds
+    `tolerance` (or in which the EOS is undefined) are marked, and queries falling in those
+    cells, or outside of the table, are passed on to the exact EOS. The largest relative error
+    found in the cells that are used is stored as max_relative_error. It is never greater than
+    tolerance, but since the error is only checked at these points it is an estimate of, not a
+    bound on, the error elsewhere in the cells.
+
+    Fugacity models with a species argument (fugacity_HollowayBlank and
+    fugacity_RedlichKwong) should be tabulated through their single-species versions, e.g.,
+    fugacity_HB_co2.
+    """
+
+    _table_version = 2
+
+    def __init__(self, fugacity_model, pressure_range=(1.0, 20000.0),
+                 temperature_range=(500.0, 1500.0), pressure_points=121,
+                 temperature_points=101, X_fluid_points=41, tolerance=1e-4,
+                 cache_dir=None, use_cache=True):
+        """
+        Sets up the tabulated model. The table itself is built on the first call to fugacity.
+
+        Parameters
+        ----------
+        fugacity_model     FugacityModel object
+            The fugacity model to tabulate.
+        pressure_range     tuple
+            Lowest and highest pressure in the table, in bars. Default is (1, 20000).
+        temperature_range     tuple
+            Lowest and highest temperature in the table, in degC. Default is (500, 1500).
+        pressure_points     int
+            Number of grid nodes in ln(pressure). Default is 121.
+        temperature_points     int
+            Number of grid nodes in temperature. Default is 101.
+        X_fluid_points     int
+            Number of grid nodes in fluid composition, only used for models without ideal
+            mixing. Default is 41.
+        tolerance     float
+            Maximum relative error of the interpolated fugacity. Default is 1e-4.
+        cache_dir     str
+            Directory in which tables are saved. Defaults to the VESICAL_CACHE_DIR environment
+            variable if it is set, otherwise to ~/.cache/VESIcal.
+        use_cache     bool
+            If False, the table is neither loaded from nor saved to disk. Default is True.
+        """
+        self.fugacity_model = fugacity_model
+        self.set_calibration_ranges(fugacity_model.calibration_ranges)
+        self.mixing = isinstance(fugacity_model, (fugacity_KJ81_co2, fugacity_KJ81_h2o))
+        # The Zhang and Duan (2009) model returns the fugacity of pure CO2 whatever X_fluid is
+        self.scales_with_X_fluid = not isinstance(fugacity_model, fugacity_ZD09_co2)
+        self.lnP_range = (np.log(pressure_range[0]), np.log(pressure_range[1]))
+        self.temperature_range = tuple(float(T) for T in temperature_range)
+        self.shape = [int(pressure_points), int(temperature_points)]
+        if self.mixing:
+            self.shape.append(int(X_fluid_points))
+        if min(self.shape) < 4:
+            raise core.InputError("The table needs at least 4 points along each axis.")
+        self.tolerance = tolerance
+        if cache_dir is None:
+            cache_dir = os.environ.get('VESICAL_CACHE_DIR',
+                                       os.path.join(os.path.expanduser('~'), '.cache',
+                                                    'VESIcal'))
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.table = None
+        self.bad_cells = None
+        self.max_relative_error = None
+
+        self.axes = [np.linspace(self.lnP_range[0], self.lnP_range[1], self.shape[0]),
+                     np.linspace(self.temperature_range[0], self.temperature_range[1],
+                                 self.shape[1])]
+        if self.mixing:
+            self.axes.append(np.linspace(0.0, 1.0, self.shape[2]))
+
+    def _exact_fugacity(self, P, T, X):
+        """ Returns the fugacity from the exact EOS, for arrays of pressure, temperature and
+        mole fraction. Uses the array-native version of the EOS if it has one.
+        """
+        if hasattr(self.fugacity_model, 'fugacity_array'):
+            return self.fugacity_model.fugacity_array(P, T, X)
+        fugacity = [self.fugacity_model.fugacity(pressure=P_i, temperature=T_i, X_fluid=X_i)
+                    for P_i, T_i, X_i in zip(np.ravel(P), np.ravel(T), np.ravel(X))]
+        return np.array(fugacity, dtype=float).reshape(np.shape(P))
+
+    def _exact_lnPhi(self, lnP, T, X):
+        """ Returns ln(fugacity coefficient) from the exact EOS, for arrays of ln(pressure),
+        temperature and mole fraction.
+        """
+        if self.mixing:
+            # The fugacity is zero in a fluid without the species, but its fugacity
+            # coefficient is not.
+            return self.fugacity_model.lnPhi_mix_array(np.exp(lnP), T,
+                                                       np.where(T >= 1050.0, 1.0, X))
+        P = np.exp(lnP)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.log(self._exact_fugacity(P, T, np.ones(np.shape(P)))/P)
+
+    def _cache_path(self):
+        """ Returns the path of the file in which this table is saved. The name is derived from
+        the EOS, the source code of the module defining it and of this module (which hold the
+        helper functions and constants it uses), the version of VESIcal, and the grid, so that a
+        change to any of them gives a new table. """
+        modules = [sys.modules[__name__], inspect.getmodule(type(self.fugacity_model))]
+        source = hashlib.sha1()
+        for module in modules[:1] if modules[1] is modules[0] else modules:
+            try:
+                source.update(inspect.getsource(module).encode())
+            except (OSError, TypeError):
+                pass
+        key = repr((self._table_version, sys.modules['VESIcal'].__version__,
+                    type(self.fugacity_model).__name__, source.hexdigest(), self.lnP_range,
+                    self.temperature_range, self.shape, self.tolerance))
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, type(self.fugacity_model).__name__ + '_' + digest
+                            + '.npz')
+
+    def build_table(self):
+        """ Builds the table, or loads it from the cache directory if it has been built before,
+        and checks the interpolation error at three points of every grid cell.
+        """
+        path = self._cache_path()
+        if self.use_cache and os.path.isfile(path):
+            try:
+                with np.load(path) as saved:
+                    self.table = saved['table']
+                    self.bad_cells = saved['bad_cells']
+                    self.max_relative_error = float(saved['max_relative_error'])
+                return
+            except (OSError, KeyError, ValueError):
+                w.warn("Could not read the fugacity table in " + path + ". It will be rebuilt.",
+                       RuntimeWarning)
+
+        axes = self.axes
+        nodes = np.meshgrid(*axes, indexing='ij')
+        if not self.mixing:
+            nodes.append(np.ones(self.shape))
+        self.table = self._exact_lnPhi(*nodes)
+
+        # Compare with the exact EOS at the centre of every cell, and a quarter and three
+        # quarters of the way along its diagonal, keeping the largest error in each cell
+        error = np.zeros([n - 1 for n in self.shape])
+        for fraction in [0.5, 0.25, 0.75]:
+            points = [axis[:-1] + fraction*(axis[1:] - axis[:-1]) for axis in axes]
+            points = np.meshgrid(*points, indexing='ij')
+            X = points[2] if self.mixing else np.ones(np.shape(points[0]))
+            exact = self._exact_lnPhi(points[0], points[1], X)
+            interpolated = self._interpolate([p.ravel() for p in points]).reshape(np.shape(exact))
+            with np.errstate(invalid='ignore', over='ignore'):
+                point_error = np.abs(np.expm1(interpolated - exact))
+            # nan where the EOS is undefined at any of the points
+            error = np.maximum(error, point_error)
+        self.bad_cells = ~(error <= self.tolerance)
+        if np.all(self.bad_cells):
+            self.max_relative_error = np.nan
         else:
-            raise core.InputError("Species must be H2O or CO2.")
+            self.max_relative_error = float(np.max(error[~self.bad_cells]))
+
+        if self.use_cache:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, table=self.table, bad_cells=self.bad_cells,
+                         max_relative_error=self.max_relative_error)
+            except OSError:
+                w.warn("Could not save the fugacity table to " + self.cache_dir + ".",
+                       RuntimeWarning)
+
+    def _interpolate(self, coords):
+        """ Interpolates ln(fugacity coefficient) in the table, at points given as a list of
+        coordinate arrays (ln(pressure), temperature, and X_fluid if tabulated). """
+        stencils = [_cubic_stencil(x, axis[0], axis[1] - axis[0], len(axis))
+                    for x, axis in zip(coords, self.axes)]
+        result = np.zeros(len(coords[0]))
+        for offsets in np.ndindex(*[4]*len(coords)):
+            weight = np.ones(len(coords[0]))
+            index = []
+            for (i, weights), offset in zip(stencils, offsets):
+                weight = weight*weights[offset]
+                index.append(i + offset)
+            result += weight*self.table[tuple(index)]
+        return result
+
+    def fugacity_array(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Calculates the fugacity for arrays of pressure, temperature and fluid composition,
+        which are broadcast against each other. Points outside of the table, or in cells where
+        the interpolation is not accurate enough, are calculated with the exact EOS.
+
+        Parameters
+        ----------
+        pressure    float or numpy.ndarray
+            Total pressure of the system in bars.
+        temperature     float or numpy.ndarray
+            Temperature in degC
+        X_fluid     float or numpy.ndarray
+            Mole fraction of the species in the fluid. Default is 1.0.
+
+        Returns
+        -------
+        numpy.ndarray
+            fugacity in bars
+        """
+        if self.table is None:
+            self.build_table()
+
+        P, T, X = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                      np.asarray(temperature, dtype=float),
+                                      np.asarray(X_fluid, dtype=float))
+        shape = np.shape(P)
+        P, T, X = P.ravel(), T.ravel(), X.ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coords = [np.log(P), T]
+        if self.mixing:
+            coords.append(X)
+
+        axes = self.axes
+        inside = np.ones(len(P), dtype=bool)
+        cells = []
+        for x, axis in zip(coords, axes):
+            inside &= (x >= axis[0]) & (x <= axis[-1])
+            cell = np.floor((x - axis[0])/(axis[1] - axis[0]))
+            cells.append(np.clip(np.nan_to_num(cell), 0, len(axis) - 2).astype(int))
+        inside[inside] = ~self.bad_cells[tuple(cell[inside] for cell in cells)]
+
+        fugacity = np.zeros(len(P))
+        if np.any(inside):
+            lnPhi = self._interpolate([x[inside] for x in coords])
+            fugacity[inside] = P[inside]*np.exp(lnPhi)
+            if self.scales_with_X_fluid:
+                fugacity[inside] *= X[inside]
+        if np.any(~inside):
+            fugacity[~inside] = self._exact_fugacity(P[~inside], T[~inside], X[~inside])
+        return fugacity.reshape(shape)
+
+    def fugacity(self, pressure, temperature, X_fluid=1.0, **kwargs):
+        """ Calculates the fugacity by interpolating in the table of fugacity coefficients,
+        falling back to the exact EOS outside of the table. Arrays are passed on to
+        fugacity_array.
+
+        Parameters
+        ----------
+        pressure    float
+            Total pressure of the system in bars.
+        temperature     float
+            Temperature in degC
+        X_fluid     float
+            Mole fraction of the species in the fluid. Default is 1.0.
+
+        Returns
+        -------
+        float
+            fugacity in bars
+        """
+        if np.ndim(pressure) > 0 or np.ndim(temperature) > 0 or np.ndim(X_fluid) > 0:
+            return self.fugacity_array(pressure, temperature, X_fluid)
+        if self.table is None:
+            self.build_table()
+
+        # Scalar queries are answered without building temporary arrays, as they are made
+        # one at a time from within the solubility models.
+        coords = [temperature]
+        if self.mixing:
+            coords.append(X_fluid)
+        if pressure > 0:
+            coords.insert(0, np.log(pressure))
+        else:
+            coords.insert(0, -np.inf)
+        starts = []
+        cells = []
+        weights = []
+        for x, axis in zip(coords, self.axes):
+            u = (x - axis[0])/(axis[1] - axis[0])
+            if not 0 <= u <= len(axis) - 1:
+                return self.fugacity_model.fugacity(pressure=pressure, temperature=temperature,
+                                                    X_fluid=X_fluid)
+            cells.append(min(int(u), len(axis) - 2))
+            start = min(max(cells[-1] - 1, 0), len(axis) - 4)
+            t = u - start - 1
+            starts.append(start)
+            weights.append([-t*(t-1)*(t-2)/6, (t+1)*(t-1)*(t-2)/2,
+                            -(t+1)*t*(t-2)/2, (t+1)*t*(t-1)/6])
+        if self.bad_cells[tuple(cells)]:
+            return self.fugacity_model.fugacity(pressure=pressure, temperature=temperature,
+                                                X_fluid=X_fluid)
+
+        lnPhi = self.table[tuple(slice(start, start+4) for start in starts)]
+        for weight in weights:
+            lnPhi = np.tensordot(weight, lnPhi, axes=(0, 0))
+        fugacity = pressure*np.exp(float(lnPhi))
+        if self.scales_with_X_fluid:
+            fugacity *= X_fluid
+        return fugacity
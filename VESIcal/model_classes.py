@@ -270,6 +270,49 @@ class MixedFluid(Model):
         else:
             return result
 
+    def calculate_dissolved_volatiles_grid(self, pressure, X_fluid, **kwargs):
+        """
+        Calculates the dissolved volatile concentrations in wt% for a whole
+        grid of pressures and fluid compositions at once. The results are
+        written into a preallocated array, and each distinct
+        (pressure, X_fluid) pair is evaluated only once, however many times it
+        appears in the grid.
+
+        Parameters
+        ----------
+        pressure     numpy.ndarray
+            Total pressures in bars, one for each grid point.
+        X_fluid     numpy.ndarray
+            The mole fraction of the first species in self.volatile_species,
+            one for each grid point. Must be the same length as pressure.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (2, n) containing the dissolved volatile
+            concentrations of each species, in the order set by
+            self.volatile_species, for each of the n grid points.
+        """
+        if len(self.volatile_species) != 2:
+            raise core.InputError("calculate_dissolved_volatiles_grid may "
+                                  "only be used with two volatile species.")
+
+        pressure = np.asarray(pressure, dtype=float).ravel()
+        X_fluid = np.asarray(X_fluid, dtype=float).ravel()
+        if len(pressure) != len(X_fluid):
+            raise core.InputError("pressure and X_fluid must be the same "
+                                  "length.")
+
+        grid = np.column_stack([pressure, X_fluid])
+        unique_grid, inverse = np.unique(grid, axis=0, return_inverse=True)
+
+        dissolved = np.zeros([2, len(unique_grid)])
+        for i, (P, Xv0) in enumerate(unique_grid):
+            dissolved[:, i] = self.calculate_dissolved_volatiles(
+                pressure=P, X_fluid=(Xv0, 1-Xv0), **kwargs)
+
+        return dissolved[:, inverse.ravel()]
+
     def calculate_equilibrium_fluid_comp(self, pressure, sample,
                                          return_dict=True, **kwargs):
         """ Calculates the composition of the fluid in equilibrium with the
@@ -413,6 +456,7 @@ class MixedFluid(Model):
     def calculate_isobars_and_isopleths(self, pressure_list,
                                         isopleth_list=[0, 1], points=51,
                                         return_dfs=True, extend_to_zero=True,
+                                        adaptive=False, tolerance=0.01,
                                         **kwargs):
         """
         Calculates isobars and isopleths. Isobars can be calculated for any
@@ -430,11 +474,21 @@ class MixedFluid(Model):
             isopleths. Values can range from 0 to 1.
         points     int
             The number of points in each isobar and isopleth. Default value is
-            101.
+            101. If adaptive is True, this is the maximum number of points in
+            each curve.
         return_dfs     bool
             If True, the results will be returned as two pandas DataFrames, as
             produced by the MagmaSat method. If False the results will be
             returned as lists of numpy arrays.
+        adaptive     bool
+            If True, each isobar and isopleth starts from five evenly spaced
+            points and is refined only where it is curved (see
+            adaptive_curve_sampling), rather than being evaluated at evenly
+            spaced values. Default is False.
+        tolerance     float
+            Only used if adaptive is True. The maximum allowed deviation of the
+            curve from a straight line between neighbouring points, relative to
+            the range of the curve. Default is 0.01.
 
         Returns
         -------
@@ -473,41 +527,83 @@ class MixedFluid(Model):
         if isopleth_list is None:
             has_isopleths = False
 
-        isobars_df = pd.DataFrame(columns=['Pressure', 'H2O_liq', 'CO2_liq'])
-        isobars = []
-        for pressure in pressure_list:
-            dissolved = np.zeros([2, points])
+        if has_isopleths:
+            pmin = np.nanmin(pressure_list)
+            pmax = np.nanmax(pressure_list)
+            if pmin == pmax:
+                pmin = 0.0
+
+        if adaptive:
+            # Each curve starts from a coarse set of points and is refined
+            # only where it bends, with at most `points` points per curve.
+            n_init = min(points, 5)
+            isobar_curves = []
+            for pressure in pressure_list:
+                def isobar_func(X, pressure=pressure):
+                    return self.calculate_dissolved_volatiles_grid(
+                        pressure=np.full(len(X), float(pressure)),
+                        X_fluid=X, **kwargs)
+                X, curve = adaptive_curve_sampling(
+                    isobar_func, np.linspace(0.0, 1.0, n_init),
+                    tolerance=tolerance, max_points=points)
+                isobar_curves.append((np.full(len(X), float(pressure)), X,
+                                      curve))
+            isopleth_curves = []
+            if has_isopleths:
+                for Xv0 in isopleth_list:
+                    def isopleth_func(P, Xv0=Xv0):
+                        return self.calculate_dissolved_volatiles_grid(
+                            pressure=P, X_fluid=np.full(len(P), float(Xv0)),
+                            **kwargs)
+                    P, curve = adaptive_curve_sampling(
+                        isopleth_func, np.linspace(pmin, pmax, n_init),
+                        tolerance=tolerance, max_points=points,
+                        min_interval=0.002*(pmax - pmin))
+                    isopleth_curves.append((P, np.full(len(P), float(Xv0)),
+                                            curve))
+        else:
+            # Build the (pressure x X_fluid) grid for the isobars and the
+            # (isopleth x pressure) grid for the isopleths up front, so that
+            # the dissolved volatiles can be evaluated in a single pass.
             Xv0 = np.linspace(0.0, 1.0, points)
-            for i in range(points):
-                dissolved[:, i] = self.calculate_dissolved_volatiles(
-                       pressure=pressure, X_fluid=(Xv0[i], 1-Xv0[i]), **kwargs)
-                isobars_df = isobars_df.append({
-                                               'Pressure': pressure,
-                                               'H2O_liq': dissolved[H2O_id, i],
-                                               'CO2_liq': dissolved[CO2_id, i]
-                                               }, ignore_index=True)
-            isobars.append(dissolved)
+            grid_P = [np.full(points, float(pressure))
+                      for pressure in pressure_list]
+            grid_X = [Xv0 for pressure in pressure_list]
+            if has_isopleths:
+                P_iso = np.linspace(pmin, pmax, points)
+                grid_P += [P_iso for X in isopleth_list]
+                grid_X += [np.full(points, float(X)) for X in isopleth_list]
+
+            dissolved = self.calculate_dissolved_volatiles_grid(
+                            pressure=np.concatenate(grid_P),
+                            X_fluid=np.concatenate(grid_X), **kwargs)
+            curves = [(grid_P[i], grid_X[i],
+                       dissolved[:, i*points:(i+1)*points])
+                      for i in range(len(grid_P))]
+            isobar_curves = curves[:len(pressure_list)]
+            isopleth_curves = curves[len(pressure_list):]
+
+        # Assemble the DataFrames once, from all curves.
+        isobar_P = np.concatenate([curve[0] for curve in isobar_curves])
+        isobar_dissolved = np.hstack([curve[2] for curve in isobar_curves])
+        isobars_df = pd.DataFrame({'Pressure': isobar_P,
+                                   'H2O_liq': isobar_dissolved[H2O_id],
+                                   'CO2_liq': isobar_dissolved[CO2_id]})
+        isobars = [curve[2] for curve in isobar_curves]
 
         if has_isopleths:
-            isopleths_df = pd.DataFrame(columns=['XH2O_fl', 'H2O_liq',
-                                                 'CO2_liq'])
-            isopleths = []
-            for isopleth in isopleth_list:
-                dissolved = np.zeros([2, points])
-                pmin = np.nanmin(pressure_list)
-                pmax = np.nanmax(pressure_list)
-                if pmin == pmax:
-                    pmin = 0.0
-                pressure = np.linspace(pmin, pmax, points)
-                for i in range(points):
-                    dissolved[:, i] = self.calculate_dissolved_volatiles(
-                          pressure=pressure[i], X_fluid=(isopleth, 1-isopleth),
-                          **kwargs)
-                    isopleths_df = isopleths_df.append({
-                       'XH2O_fl': [isopleth, 1-isopleth][H2O_id],
-                       'H2O_liq': dissolved[H2O_id, i],
-                       'CO2_liq': dissolved[CO2_id, i]}, ignore_index=True)
-                isopleths.append(dissolved)
+            isopleth_X = np.concatenate([curve[1] for curve in
+                                         isopleth_curves])
+            isopleth_dissolved = np.hstack([curve[2] for curve in
+                                            isopleth_curves])
+            if H2O_id == 0:
+                XH2O_fl = isopleth_X
+            else:
+                XH2O_fl = 1 - isopleth_X
+            isopleths_df = pd.DataFrame({'XH2O_fl': XH2O_fl,
+                                         'H2O_liq': isopleth_dissolved[H2O_id],
+                                         'CO2_liq': isopleth_dissolved[CO2_id]})
+            isopleths = [curve[2] for curve in isopleth_curves]
 
         if return_dfs:
             if has_isopleths:
@@ -793,3 +889,84 @@ class MixedFluid(Model):
             for cr in model.activity_model.calibration_ranges:
                 s += cr.string(None)
         return s
+
+
+# ------------ CURVE SAMPLING ------------------------------- #
+def adaptive_curve_sampling(func, x_init, tolerance=0.01, max_points=51,
+                            min_interval=0.002):
+    """
+    Samples a curve parameterized by x, refining the sampling only where the
+    curve bends. Each interval between neighbouring points is tested by
+    evaluating its midpoint and comparing it to the straight line (chord)
+    between the interval end points. Intervals where the misfit exceeds the
+    tolerance are split and tested again, until every interval is within the
+    tolerance, the point budget is used up, or intervals become narrower than
+    min_interval. All evaluated points are kept, so no model call is wasted.
+
+    Parameters
+    ----------
+    func     function
+        Function taking a numpy array of x values and returning a numpy array
+        of shape (2, n) with the curve coordinates (e.g., H2O_liq and CO2_liq)
+        at each x value.
+    x_init     list or numpy array
+        The initial x values, which are always evaluated. Must contain at
+        least two values.
+    tolerance     float
+        Maximum allowed misfit between a midpoint and its chord, relative to
+        the range spanned by each coordinate over the initial points. Default
+        is 0.01.
+    max_points     int
+        Maximum number of points evaluated along the curve, including the
+        initial points. Default is 51.
+    min_interval     float
+        Intervals narrower than this are not split any further. Default is
+        0.002.
+
+    Returns
+    -------
+    tuple of numpy arrays
+        The sorted x values and an array of shape (2, n) with the
+        corresponding curve coordinates.
+    """
+    x = np.unique(np.asarray(x_init, dtype=float))
+    if len(x) < 2:
+        raise core.InputError("At least two initial points are needed to "
+                              "sample a curve.")
+    y = np.asarray(func(x), dtype=float)
+
+    scale = np.ptp(y, axis=1)
+    scale = np.where(scale > 0, scale, 1.0)
+
+    # Intervals still to be tested, as pairs of x values (x_a, x_b), ordered
+    # by the misfit of their parent interval so that the worst parts of the
+    # curve are refined first when the point budget runs out.
+    pending = [(x[i], x[i+1]) for i in range(len(x)-1)]
+    xs = list(x)
+    ys = list(y.T)
+    lookup = dict(zip(xs, ys))
+
+    while len(pending) > 0 and len(xs) < max_points:
+        pending = [(xa, xb) for (xa, xb) in pending if xb - xa >= min_interval]
+        pending = pending[:max_points - len(xs)]
+        if len(pending) == 0:
+            break
+
+        x_mid = np.array([0.5*(xa + xb) for (xa, xb) in pending])
+        y_mid = np.asarray(func(x_mid), dtype=float)
+
+        refine = []
+        for i, (xa, xb) in enumerate(pending):
+            chord = 0.5*(lookup[xa] + lookup[xb])
+            misfit = np.nanmax(np.abs(y_mid[:, i] - chord) / scale)
+            xs.append(x_mid[i])
+            ys.append(y_mid[:, i])
+            lookup[x_mid[i]] = y_mid[:, i]
+            if misfit > tolerance:
+                refine.append((misfit, (xa, x_mid[i]), (x_mid[i], xb)))
+
+        refine.sort(key=lambda item: item[0], reverse=True)
+        pending = [half for item in refine for half in item[1:]]
+
+    order = np.argsort(xs)
+    return np.array(xs)[order], np.array(ys).T[:, order]
@@ -7,7 +7,6 @@ from VESIcal import sample_class
 
 import numpy as np
 import warnings as w
-import sympy
 from scipy.optimize import root_scalar
 
 
@@ -120,7 +119,9 @@ class water(model_classes.Model):
             w.warn("{:.1f} bars is above the saturation pressure ({:.1f} bars) for this sample. "
                    "Results from this calculation may be nonsensical.".format(pressure, satP))
 
-        # Use sympy to solve solubility equation for XH2Ofluid
+        # Use sympy to solve solubility equation for XH2Ofluid. sympy is slow to import, so is
+        # only imported when needed.
+        import sympy
         XH2Ofluid = sympy.symbols('XH2Ofluid')  # XH2Ofluid is the variable to solve for
 
         equation = ((354.94*(XH2Ofluid*pressureMPa)**(0.5) + 9.623*(XH2Ofluid*pressureMPa)
@@ -330,6 +331,7 @@ class carbon(model_classes.Model):
                    " bars) for this sample. Results from this calculation may be nonsensical.")
 
         # Use sympy to solve solubility equation for XH2Ofluid
+        import sympy
         XCO2fluid = sympy.symbols('XCO2fluid')  # XCO2fluid is the variable to solve for
 
         equation = ((XCO2fluid*pressureMPa*(5668 - 55.99*(pressureMPa*(1-XCO2fluid)))/temperatureK
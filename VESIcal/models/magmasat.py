@@ -2,36 +2,1063 @@ from VESIcal import calibration_checks
 from VESIcal import core
 from VESIcal import model_classes
 from VESIcal import sample_class
-from VESIcal import vplot
 from VESIcal import batchfile  # needed for status_bar functions
 
+from abc import ABC, abstractmethod
 from copy import deepcopy
 import numpy as np
 import pandas as pd
 import warnings as w
 import sys
+import time
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import weakref
+import concurrent.futures
+from collections import deque
 from contextlib import redirect_stdout
 import io
 
-from thermoengine import equilibrate
-
 # Variable to send H2O driver warnings into the void
 _f = io.StringIO()
 
 w.filterwarnings("ignore", message="rubicon.objc.ctypes_patch has only been tested ")
 
 # -------------- MELTS preamble --------------- #
-# instantiate thermoengine equilibrate MELTS instance
-melts = equilibrate.MELTSmodel("1.2.0")
-
-# Suppress phases not required in the melts simulation
-phases = melts.get_phase_names()
-for phase in phases:
-    melts.set_phase_inclusion_status({phase: False})
-melts.set_phase_inclusion_status({"Fluid": True, "Liquid": True})
+# MELTS version and the phases included in MagmaSat calculations
+melts_version = "1.2.0"
+included_phases = ("Fluid", "Liquid")
+
+# Name of the equilibrium backend, one of those in backends, that MagmaSat uses in this
+# process. The default is thermoengine, unless set by the VESICAL_MAGMASAT_BACKEND environment
+# variable. Use set_backend to change it.
+backend = os.environ.get("VESICAL_MAGMASAT_BACKEND", "thermoengine")
+
+# The MELTS instance used by MagmaSat in this process. It is created by get_engine the first
+# time MagmaSat needs it, so that importing VESIcal does not load thermoengine or build MELTS.
+melts = None
+
+
+def new_engine():
+    """
+    Returns a new instance of the equilibrium backend, by default a thermoengine equilibrate
+    MELTS instance, with all phases but those in included_phases suppressed.
+    """
+    if backend not in backends:
+        raise core.InputError("MagmaSat backend must be one of " + str(list(backends)) +
+                              ", not " + repr(backend) + ".")
+    engine = backends[backend](melts_version)
+
+    # Suppress phases not required in the melts simulation
+    for phase in engine.get_phase_names():
+        engine.set_phase_inclusion_status({phase: False})
+    engine.set_phase_inclusion_status({phase: True for phase in included_phases})
+    return engine
+
+
+def get_engine():
+    """
+    Returns the MELTS instance used by MagmaSat in this process, creating it the first time it
+    is needed.
+    """
+    global melts
+    if melts is None:
+        melts = new_engine()
+    return melts
+
+
+def set_backend(name):
+    """
+    Sets the equilibrium backend used by MagmaSat in this process. The MELTS instance is
+    replaced by one of the new backend the next time it is needed.
+
+    Parameters
+    ----------
+    name: str
+        Name of the backend, one of those in backends: 'thermoengine' for MELTS, or 'analytic'
+        for AnalyticBackend, which needs no thermoengine installation.
+    """
+    global backend, melts
+    if name not in backends:
+        raise core.InputError("MagmaSat backend must be one of " + str(list(backends)) +
+                              ", not " + repr(name) + ".")
+    backend = name
+    melts = None
+
+
+def engine_version():
+    """
+    Returns the version of the backend's thermodynamic model, which identifies its equilibrium
+    results, e.g., in the MagmaSat cache. This is melts_version for the thermoengine backend.
+    """
+    if backend == "thermoengine":
+        return melts_version
+    return backend + "-" + melts_version
+
+
+def _worker_initargs():
+    """
+    Returns the arguments passed to _initialize_worker in the worker processes of a parallel
+    MagmaSat calculation: the backend of this process, and the (cache_dir, maxsize,
+    significant_figures) of its cache, or None if it has none. Workers started by spawning
+    rather than forking would otherwise read the backend from the environment again, and
+    calculate without the cache.
+    """
+    if _cache is None:
+        cache_config = None
+    else:
+        cache_config = (_cache.cache_dir, _cache.maxsize, _cache.significant_figures)
+    return (backend, cache_config)
+
+
+def _initialize_worker(backend_name=None, cache_config=None):
+    """
+    Run once in every worker process of a parallel MagmaSat calculation, so that the worker
+    creates its own MELTS instances rather than sharing those created by the parent process
+    before it was forked.
+
+    Parameters
+    ----------
+    backend_name: str
+        OPTIONAL: Default is None, in which case the backend is left as it is. Name of the
+        backend the worker uses, as returned by _worker_initargs.
+
+    cache_config: tuple
+        OPTIONAL: Default is None, in which case the cache is left as it is. The cache_dir,
+        maxsize and significant_figures of the cache the worker uses, as returned by
+        _worker_initargs.
+    """
+    global melts
+    if backend_name is not None:
+        set_backend(backend_name)
+    if cache_config is not None:
+        enable_cache(*cache_config)
+    melts = None
+    engine_pool.clear()
 # --------------------------------------------- #
 
 
+# ------------ Equilibrium backends ------------ #
+class EquilibriumBackend(ABC):
+    """
+    The interface of the equilibrium calculators MagmaSat can use, that of the thermoengine
+    equilibrate MELTSmodel class, which is used as it is. Other backends, such as
+    AnalyticBackend, implement these methods and are added to backends under a name.
+
+    equilibrate_tp returns a list of (status, temperature, pressure, xmlout) tuples. The status
+    of a successful equilibration is a string starting with 'success', and xmlout is the
+    equilibrium state, which is only passed back to get_mass_of_phase and
+    get_composition_of_phase.
+    """
+
+    @abstractmethod
+    def get_phase_names(self):
+        """Returns a list of the names of the phases in the model."""
+
+    @abstractmethod
+    def set_phase_inclusion_status(self, status):
+        """Includes (True) or suppresses (False) the phases named in the status dict."""
+
+    @abstractmethod
+    def set_bulk_composition(self, bulk_comp):
+        """Sets the bulk composition equilibrated, a dict of oxides and their masses in g."""
+
+    @abstractmethod
+    def equilibrate_tp(self, temperature, pressureMPa, initialize=True):
+        """Equilibrates the bulk composition at temperature (degC) and pressure (MPa)."""
+
+    @abstractmethod
+    def get_mass_of_phase(self, xmlout, phase_name="System"):
+        """Returns the mass of a phase in g, or 0 if it is not present."""
+
+    @abstractmethod
+    def get_composition_of_phase(self, xmlout, phase_name="System", mode="oxide_wt"):
+        """
+        Returns the composition of a phase as a dict, or an empty dict if it is not present:
+        in wt% oxides if mode is 'oxide_wt', or, for the fluid, in mole fractions of the
+        'Water' and 'Carbon Dioxide' components if mode is 'component'.
+        """
+
+
+class AnalyticBackend(EquilibriumBackend):
+    """
+    A deterministic analytic stand-in for MELTS, for testing, benchmarking and profiling the
+    MagmaSat search algorithms on machines without thermoengine, and for separating their
+    overhead from the time spent in MELTS. It is not a model of real magmas.
+
+    The melt dissolves H2O and CO2 in proportion to the square root of the fugacity of H2O and
+    to the fugacity of CO2 respectively, with the fluid an ideal mixture of H2O and CO2:
+    H2O_liq = H2O_solubility * sqrt(P * XH2O) and CO2_liq = CO2_solubility * P * (1 - XH2O),
+    in g per 100 g of the volatile-free bulk composition, with P in bars. Temperature has no
+    effect. The saturation pressure, in bars, is then given by saturation_pressure.
+    """
+
+    H2O_solubility = 0.12
+    CO2_solubility = 6e-5
+    status = "success, Optimal residual norm."
+
+    def __init__(self, version=melts_version):
+        self.version = version
+        self.bulk_comp = {}
+        self.phases = {"Liquid": True, "Fluid": True, "Olivine": True}
+
+    def get_phase_names(self):
+        return list(self.phases)
+
+    def set_phase_inclusion_status(self, status):
+        self.phases.update(status)
+
+    def set_bulk_composition(self, bulk_comp):
+        self.bulk_comp = {oxide: float(value) for oxide, value in bulk_comp.items()}
+
+    def _anhydrous_mass(self):
+        return sum(value for oxide, value in self.bulk_comp.items()
+                   if oxide not in ("H2O", "CO2")) / 100
+
+    def saturation_pressure(self, bulk_comp=None):
+        """Returns the saturation pressure of bulk_comp, by default the bulk composition set,
+        in bars."""
+        if bulk_comp is not None:
+            self.set_bulk_composition(bulk_comp)
+        mass = self._anhydrous_mass()
+        H2O = self.bulk_comp.get("H2O", 0.0) / mass
+        CO2 = self.bulk_comp.get("CO2", 0.0) / mass
+        return (H2O / self.H2O_solubility)**2 + CO2 / self.CO2_solubility
+
+    def equilibrate_tp(self, temperature, pressureMPa, initialize=True):
+        mass = self._anhydrous_mass()
+        H2O = self.bulk_comp.get("H2O", 0.0)
+        CO2 = self.bulk_comp.get("CO2", 0.0)
+        pressure = 10.0 * pressureMPa
+        H2O_sat = self.H2O_solubility * np.sqrt(pressure) * mass
+        CO2_sat = self.CO2_solubility * pressure * mass
+        state = {"fluid": 0.0, "H2O_liq": H2O, "CO2_liq": CO2, "XH2O": None}
+
+        if (self.phases.get("Fluid", False) and H2O + CO2 > 0 and
+                (H2O / H2O_sat)**2 + CO2 / CO2_sat > 1):
+            def H2O_wt(XH2O):
+                # Mass fraction of H2O in a fluid with mole fraction XH2O of H2O
+                H2O_mass = XH2O * core.oxideMass["H2O"]
+                return H2O_mass / (H2O_mass + (1 - XH2O) * core.oxideMass["CO2"])
+
+            def mass_balance(XH2O):
+                # Positive if the fluid has too little H2O for the bulk composition
+                return ((H2O - H2O_sat * np.sqrt(XH2O)) * (1 - H2O_wt(XH2O)) -
+                        (CO2 - CO2_sat * (1 - XH2O)) * H2O_wt(XH2O))
+
+            low, high = 0.0, 1.0
+            for i in range(60):
+                XH2O = (low + high) / 2
+                if mass_balance(XH2O) > 0:
+                    low = XH2O
+                else:
+                    high = XH2O
+            XH2O = (low + high) / 2
+            if H2O_wt(XH2O) > 0.5:
+                fluid = (H2O - H2O_sat * np.sqrt(XH2O)) / H2O_wt(XH2O)
+            else:
+                fluid = (CO2 - CO2_sat * (1 - XH2O)) / (1 - H2O_wt(XH2O))
+            if fluid > 0:
+                state = {"fluid": fluid,
+                         "H2O_liq": H2O - fluid * H2O_wt(XH2O),
+                         "CO2_liq": CO2 - fluid * (1 - H2O_wt(XH2O)),
+                         "XH2O": XH2O}
+
+        state["bulk_comp"] = dict(self.bulk_comp)
+        return [(self.status, temperature, pressureMPa, state)]
+
+    def get_mass_of_phase(self, xmlout, phase_name="System"):
+        system = sum(xmlout["bulk_comp"].values())
+        if phase_name == "Fluid":
+            return xmlout["fluid"]
+        if phase_name == "Liquid":
+            return system - xmlout["fluid"]
+        if phase_name == "System":
+            return system
+        return 0.0
+
+    def get_composition_of_phase(self, xmlout, phase_name="System", mode="oxide_wt"):
+        if phase_name in ("System", "Liquid"):
+            composition = dict(xmlout["bulk_comp"])
+            if phase_name == "Liquid":
+                composition["H2O"] = xmlout["H2O_liq"]
+                composition["CO2"] = xmlout["CO2_liq"]
+            total = sum(composition.values())
+            return {oxide: 100 * value / total for oxide, value in composition.items()}
+        if phase_name != "Fluid" or xmlout["XH2O"] is None:
+            return {}
+        XH2O = xmlout["XH2O"]
+        if mode == "component":
+            return {"Water": XH2O, "Carbon Dioxide": 1 - XH2O}
+        H2O_mass = XH2O * core.oxideMass["H2O"]
+        CO2_mass = (1 - XH2O) * core.oxideMass["CO2"]
+        return {"H2O": 100 * H2O_mass / (H2O_mass + CO2_mass),
+                "CO2": 100 * CO2_mass / (H2O_mass + CO2_mass)}
+
+
+def _thermoengine_backend(version):
+    """Returns a new thermoengine equilibrate MELTS instance."""
+    from thermoengine import equilibrate
+
+    return equilibrate.MELTSmodel(version)
+
+
+# The equilibrium backends, by name. Each is called with the MELTS version and returns an
+# object with the methods of EquilibriumBackend.
+backends = {"thermoengine": _thermoengine_backend, "analytic": AnalyticBackend}
+# --------------------------------------------- #
+
+
+class MeltsPath(object):
+    """
+    A sequence of MELTS equilibrations made along a path or grid, such as the pressures visited
+    in a saturation pressure search or the steps of a degassing path. Every equilibration is
+    timed and counted.
+
+    If warm_start is True, an equilibration of the same bulk composition as the one before it is
+    started from the previous equilibrium state (equilibrate_tp with initialize=False) rather
+    than from scratch. Warm starts are only made where the bulk composition is unchanged, since
+    a new bulk composition must be set in MELTS, which requires a cold start. If a warm start
+    raises an error or MELTS reports that it failed, the equilibration is repeated from a cold
+    start, and this is counted as a fallback.
+
+    The MELTS output of every successful equilibration is wrapped in a MeltsRecord, which
+    replaces it in the output of equilibrate, so that each phase mass and composition is read
+    from the MELTS xml once, however often it is queried. Phases should therefore be queried
+    with the get_mass_of_phase and get_composition_of_phase methods of the path rather than
+    those of the MELTS instance.
+
+    If a MeltsCache is given, equilibrations are answered from it where possible, and the
+    records of the others are stored in it.
+
+    Besides the equilibrations, the path records the time spent in equilibrate_tp, the failed
+    statuses reported by MELTS, and the number of phase queries (get_mass_of_phase and
+    get_composition_of_phase) and the time spent parsing the MELTS output and answering them.
+    """
+
+    def __init__(self, name, warm_start=False, engine=None, cache=None):
+        """
+        Parameters
+        ----------
+        name: str
+            Name of the path, used in the statistics, e.g., the name of the calculation.
+
+        warm_start: bool
+            OPTIONAL: Default is False. If True, warm starts are made where possible.
+
+        engine: thermoengine equilibrate MELTSmodel
+            OPTIONAL: The MELTS instance used. Default is None, in which case the module level
+            instance is used.
+
+        cache: MeltsCache
+            OPTIONAL: The cache of equilibrium results used. Default is None, in which case no
+            cache is used.
+        """
+        self.name = name
+        self.warm_start = warm_start
+        self.engine = engine
+        self.cache = cache
+        self.equilibrations = 0
+        self.warm_starts = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.failed_statuses = set()
+        self.wall_time = 0.0
+        self.melts_time = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self._bulk_comp = None
+
+    def _engine(self):
+        return get_engine() if self.engine is None else self.engine
+
+    def _same_bulk_comp(self, bulk_comp):
+        """Returns True if bulk_comp is the bulk composition last set in MELTS."""
+        if self._bulk_comp is None or set(bulk_comp) != set(self._bulk_comp):
+            return False
+        for oxide, value in bulk_comp.items():
+            if abs(value - self._bulk_comp[oxide]) > 1e-10 * max(abs(value), 1.0):
+                return False
+        return True
+
+    def _equilibrate_tp(self, engine, temperature, pressureMPa, initialize):
+        """Calls equilibrate_tp of engine, timing it."""
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(_f):
+                return engine.equilibrate_tp(temperature, pressureMPa, initialize=initialize)
+        finally:
+            self.melts_time += time.perf_counter() - start
+
+    def _equilibrate(self, engine, temperature, pressureMPa, bulk_comp):
+        """Equilibrates bulk_comp with a warm start if possible, otherwise a cold start."""
+        if self.warm_start and self._same_bulk_comp(bulk_comp):
+            self.warm_starts += 1
+            try:
+                output = self._equilibrate_tp(engine, temperature, pressureMPa, False)
+                if _failed(output[0][0]):
+                    raise RuntimeError(output[0][0])
+                return output[0]
+            except Exception:
+                self.fallbacks += 1
+
+        self._bulk_comp = None
+        engine.set_bulk_composition(bulk_comp)
+        output = self._equilibrate_tp(engine, temperature, pressureMPa, True)
+        self._bulk_comp = bulk_comp
+        return output[0]
+
+    def equilibrate(self, temperature, pressureMPa, bulk_comp):
+        """
+        Equilibrates bulk_comp in MELTS at the given temperature and pressure.
+
+        Parameters
+        ----------
+        temperature: float
+            Temperature in degrees C.
+
+        pressureMPa: float
+            Pressure in MPa.
+
+        bulk_comp: dict
+            Bulk composition in wt% oxides.
+
+        Returns
+        -------
+        tuple
+            status, temperature, pressure (MPa) and a MeltsRecord of the equilibrium state, or,
+            if the equilibration failed, the xmlout returned by MELTS.
+        """
+        engine = self._engine()
+        bulk_comp = {oxide: float(value) for oxide, value in dict(bulk_comp).items()}
+        start = time.perf_counter()
+        try:
+            self.equilibrations += 1
+            if self.cache is not None:
+                key = self.cache.key(temperature, pressureMPa, bulk_comp, engine_version(),
+                                     included_phases)
+                record = self.cache.get(key)
+                if record is not None:
+                    self.cache_hits += 1
+                    # MELTS has not been run, so its state is no longer that of _bulk_comp
+                    self._bulk_comp = None
+                    return record.status, temperature, pressureMPa, record
+
+            output = self._equilibrate(engine, temperature, pressureMPa, bulk_comp)
+            status, temperature, pressureMPa, xmlout = output
+            if _failed(status):
+                self.failures += 1
+                self.failed_statuses.add(status)
+                return output
+
+            query_start = time.perf_counter()
+            record = _record_from_xmlout(engine, status, xmlout)
+            self.query_time += time.perf_counter() - query_start
+            if self.cache is not None:
+                self.cache.put(key, record)
+            return status, temperature, pressureMPa, record
+        finally:
+            self.wall_time += time.perf_counter() - start
+
+    def get_mass_of_phase(self, xmlout, phase_name="System"):
+        """Returns the mass of a phase in grams, from the output of equilibrate."""
+        start = time.perf_counter()
+        try:
+            self.queries += 1
+            if isinstance(xmlout, MeltsRecord):
+                return xmlout.get_mass_of_phase(phase_name)
+            return self._engine().get_mass_of_phase(xmlout, phase_name=phase_name)
+        finally:
+            self.query_time += time.perf_counter() - start
+
+    def get_composition_of_phase(self, xmlout, phase_name="System", mode="oxide_wt"):
+        """Returns the composition of a phase as a dict, from the output of equilibrate."""
+        start = time.perf_counter()
+        try:
+            self.queries += 1
+            if isinstance(xmlout, MeltsRecord):
+                return xmlout.get_composition_of_phase(phase_name, mode)
+            return self._engine().get_composition_of_phase(xmlout, phase_name=phase_name,
+                                                           mode=mode)
+        finally:
+            self.query_time += time.perf_counter() - start
+
+    def get_stats(self):
+        """
+        Returns
+        -------
+        dict
+            The name of the path, whether warm starts were made, the number of equilibrations,
+            warm starts, fallbacks to a cold start, equilibrations answered from the cache, and
+            failed equilibrations, the failed statuses reported by MELTS, the wall time of the
+            equilibrations, the time spent in equilibrate_tp in total and per call, and the
+            number of phase queries and the time spent answering them, all times in seconds.
+        """
+        melts_calls = self.equilibrations - self.cache_hits + self.fallbacks
+        return {
+            "Path": self.name,
+            "WarmStart": self.warm_start,
+            "Equilibrations": self.equilibrations,
+            "WarmStarts": self.warm_starts,
+            "Fallbacks": self.fallbacks,
+            "CacheHits": self.cache_hits,
+            "Failures": self.failures,
+            "FailedStatuses": ", ".join(sorted(str(status) for status in self.failed_statuses)),
+            "WallTime_s": self.wall_time,
+            "MeltsTime_s": self.melts_time,
+            "TimePerCall_s": self.melts_time / melts_calls if melts_calls > 0 else np.nan,
+            "Queries": self.queries,
+            "QueryTime_s": self.query_time,
+        }
+
+
+# Columns of the path statistics, as returned by MeltsPath.get_stats
+path_stats_columns = ["Path", "WarmStart", "Equilibrations", "WarmStarts", "Fallbacks",
+                      "CacheHits", "Failures", "FailedStatuses", "WallTime_s", "MeltsTime_s",
+                      "TimePerCall_s", "Queries", "QueryTime_s"]
+
+# The MeltsStats currently recording, to which every new MagmaSat path is added
+_recorders = []
+
+
+class MeltsStats(object):
+    """
+    Records the statistics of the MELTS paths of every MagmaSat calculation made while it is
+    active, whichever MagmaSat instance makes them, e.g., those made through calculate_classes::
+
+        with magmasat.MeltsStats() as stats:
+            v.calculate_saturation_pressure(sample=sample, temperature=1200).result
+        stats.get_stats()
+
+    Recorders can be nested. Paths made in other threads while a recorder is active are recorded
+    too.
+    """
+
+    def __init__(self):
+        self.paths = []
+
+    def __enter__(self):
+        _recorders.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _recorders.remove(self)
+        return False
+
+    def get_stats(self):
+        """
+        Returns
+        -------
+        pandas DataFrame
+            One row per path, as returned by MeltsPath.get_stats, in the order they were made.
+        """
+        return pd.DataFrame([path.get_stats() for path in self.paths],
+                            columns=path_stats_columns)
+
+    def summary(self):
+        """
+        Returns
+        -------
+        dict
+            The statistics of all recorded paths combined: the number of paths under
+            'Calculations', and the totals of the statistics of get_stats, with the time per
+            equilibrate_tp call averaged over all calls.
+        """
+        stats = self.get_stats()
+        summary = {"Calculations": len(stats)}
+        for column in ["Equilibrations", "WarmStarts", "Fallbacks", "CacheHits", "Failures",
+                       "WallTime_s", "MeltsTime_s", "Queries", "QueryTime_s"]:
+            summary[column] = stats[column].sum()
+        statuses = set()
+        for path in self.paths:
+            statuses |= set(str(status) for status in path.failed_statuses)
+        summary["FailedStatuses"] = ", ".join(sorted(statuses))
+        melts_calls = (summary["Equilibrations"] - summary["CacheHits"] +
+                       summary["Fallbacks"])
+        summary["TimePerCall_s"] = (summary["MeltsTime_s"] / melts_calls if melts_calls > 0
+                                    else np.nan)
+        return summary
+
+
+class MeltsRecord(object):
+    """
+    The phase masses and compositions extracted from the MELTS output of one equilibration.
+    Records stand in for the MELTS output in the results of MeltsPath.equilibrate and in the
+    MagmaSat cache, and answer the same phase queries as the MELTS instance.
+
+    A record made from the output of an equilibration extracts each phase mass and composition
+    the first time it is asked for, and answers later queries of it from memory. Xml output is
+    parsed directly: the System and Phase elements are looked up once, and only at the top
+    level of the tree, where MELTS writes them, rather than by the search of the whole tree
+    made by every query of the MELTS instance. Other output, e.g., that of the
+    AnalyticBackend, or xml that cannot be parsed in this way, is queried through the engine.
+    A record loaded from the cache holds the phases and modes used by MagmaSat, those in
+    phases and compositions.
+    """
+
+    phases = ("Fluid", "Liquid", "System")
+    compositions = (("Liquid", "oxide_wt"), ("Fluid", "oxide_wt"), ("Fluid", "component"))
+
+    # The xml elements read for each composition mode, and the attribute naming them
+    _elements = {"oxide_wt": ("Oxide", "Type"), "component": ("Component", "Name")}
+
+    def __init__(self, status, masses=None, compositions=None, xmlout=None, engine=None,
+                 parse=False):
+        """
+        Parameters
+        ----------
+        status: str
+            The status of the equilibration.
+
+        masses, compositions: dict
+            OPTIONAL: Phase masses, and compositions keyed by phase and mode, already
+            extracted.
+
+        xmlout:
+            OPTIONAL: The MELTS output phases not in masses and compositions are extracted
+            from.
+
+        engine: thermoengine equilibrate MELTSmodel
+            OPTIONAL: The engine that made the output, queried for phases that are not parsed.
+
+        parse: bool
+            OPTIONAL: If True, xmlout is parsed rather than queried through engine. Default is
+            False.
+        """
+        self.status = status
+        self.masses = {} if masses is None else masses
+        self.compositions = {} if compositions is None else compositions
+        self._xmlout = xmlout
+        self._engine = engine
+        self._parse = parse
+        self._elements_by_phase = {}
+
+    def _phase_element(self, phase_name):
+        """Returns the System or Phase element of the xml output for phase_name, or None if
+        there is none. MELTS writes these at the top level of the tree, so only it is
+        searched."""
+        if phase_name not in self._elements_by_phase:
+            if phase_name == "System":
+                element = self._xmlout.find("System")
+            else:
+                element = self._xmlout.find("Phase[@Type='" + phase_name + "']")
+            self._elements_by_phase[phase_name] = element
+        return self._elements_by_phase[phase_name]
+
+    def _parse_mass(self, phase_name):
+        element = self._phase_element(phase_name)
+        mass = None if element is None else element.find("Mass")
+        return 0.0 if mass is None else float(mass.text)
+
+    def _parse_composition(self, phase_name, mode):
+        element = self._phase_element(phase_name)
+        if element is None or (phase_name == "System" and mode == "component"):
+            # Only the oxides of the system are reported by MELTS
+            return {}
+        tag, attribute = self._elements[mode]
+        composition = {child.get(attribute): float(child.text)
+                       for child in element.iterfind(tag)}
+        if mode == "component" and len(composition) == 0:
+            formula = element.find("Formula")
+            if formula is not None:
+                # As returned by MELTS for phases without components
+                composition = {"formula": formula.text}
+        return composition
+
+    def get_mass_of_phase(self, phase_name="System"):
+        if phase_name not in self.masses:
+            if self._xmlout is None:
+                raise KeyError(phase_name)
+            if self._parse:
+                self.masses[phase_name] = self._parse_mass(phase_name)
+            else:
+                self.masses[phase_name] = float(self._engine.get_mass_of_phase(
+                    self._xmlout, phase_name=phase_name))
+        return self.masses[phase_name]
+
+    def get_composition_of_phase(self, phase_name="System", mode="oxide_wt"):
+        if mode not in self.compositions.get(phase_name, {}):
+            if self._xmlout is None:
+                raise KeyError((phase_name, mode))
+            if self._parse and mode in self._elements:
+                composition = self._parse_composition(phase_name, mode)
+            else:
+                composition = {name: float(value) if mode != "formula" else value
+                               for name, value in dict(self._engine.get_composition_of_phase(
+                                   self._xmlout, phase_name=phase_name, mode=mode)).items()}
+            self.compositions.setdefault(phase_name, {})[mode] = composition
+        return dict(self.compositions[phase_name][mode])
+
+    def to_dict(self):
+        """Returns the phases and modes used by MagmaSat, extracting any not yet extracted."""
+        masses = {phase: self.get_mass_of_phase(phase) for phase in self.phases}
+        compositions = {}
+        for phase, mode in type(self).compositions:
+            compositions.setdefault(phase, {})[mode] = self.get_composition_of_phase(phase,
+                                                                                     mode)
+        return {"status": self.status, "masses": masses, "compositions": compositions}
+
+
+# Whether MeltsRecord parses the xml output of each engine it has been used with as the engine
+# itself does. It is checked against the queries of the engine on the first output of the
+# engine in which every phase of MeltsRecord.phases is present, and xml is not parsed if they
+# differ, e.g., with a version of thermoengine that writes a different xml output.
+_parser_agrees = weakref.WeakKeyDictionary()
+
+
+def _record_from_xmlout(engine, status, xmlout):
+    """Returns a MeltsRecord of the output of an equilibration made with engine."""
+    if not isinstance(status, (str, int, float)):
+        status = str(status)
+    if not (hasattr(xmlout, "iter") and hasattr(xmlout, "tag")):
+        return MeltsRecord(status, xmlout=xmlout, engine=engine)
+
+    try:
+        agrees = _parser_agrees.get(engine)
+    except TypeError:
+        # engine cannot be weakly referenced, so is checked every time
+        agrees = None
+    if agrees is None:
+        record = MeltsRecord(status, xmlout=xmlout, engine=engine)
+        queried = record.to_dict()
+        if min(queried["masses"].values()) <= 0:
+            return record
+        agrees = MeltsRecord(status, xmlout=xmlout, parse=True).to_dict() == queried
+        if not agrees:
+            w.warn("The MELTS output could not be parsed, so it is queried phase by phase "
+                   "instead.", RuntimeWarning)
+        try:
+            _parser_agrees[engine] = agrees
+        except TypeError:
+            pass
+        return record
+    return MeltsRecord(status, xmlout=xmlout, engine=engine, parse=agrees)
+
+
+def _failed(status):
+    """Returns True if status, as returned by MELTS, reports a failed equilibration."""
+    return isinstance(status, str) and not status.startswith("success")
+
+
+class MeltsCache(object):
+    """
+    A persistent cache of MELTS equilibrium results, used by MeltsPath once enabled with
+    enable_cache. Results are stored as MeltsRecords in an sqlite database on disk, so that
+    they are shared between sessions and processes. Keys are a hash of the bulk composition,
+    temperature and pressure, rounded to a number of significant figures, the MELTS version,
+    and the phases included in the calculation. Once the cache holds maxsize results, the
+    least recently used are evicted. Hit statistics are kept for the current process.
+    """
+
+    _cache_version = 1
+
+    def __init__(self, cache_dir=None, maxsize=100000, significant_figures=10):
+        if maxsize < 1:
+            raise core.InputError("maxsize must be at least 1.")
+        if cache_dir is None:
+            cache_dir = os.environ.get('VESICAL_CACHE_DIR',
+                                       os.path.join(os.path.expanduser('~'), '.cache',
+                                                    'VESIcal'))
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, "magmasat_v" + str(self._cache_version) + ".sqlite")
+        self.maxsize = int(maxsize)
+        self.significant_figures = int(significant_figures)
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Returns the connection to the database, opening it if needed. A connection is never
+        shared with a forked process."""
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._pid = os.getpid()
+            # A lost write only costs a repeated equilibration, so commits need not wait for
+            # the disk
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                         "(key TEXT PRIMARY KEY, record TEXT, used REAL)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS results_used "
+                                         "ON results (used)")
+        return self._connection
+
+    def _round(self, value):
+        return float('{:.{}g}'.format(float(value), self.significant_figures))
+
+    def key(self, temperature, pressureMPa, bulk_comp, version, phases):
+        """Returns the cache key for an equilibration."""
+        key = repr((self._cache_version, str(version), tuple(sorted(phases)),
+                    tuple((oxide, self._round(value)) for oxide, value in
+                          sorted(bulk_comp.items())),
+                    self._round(temperature), self._round(pressureMPa)))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the MeltsRecord stored under key, or None if there is none."""
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    row = connection.execute("SELECT record FROM results WHERE key = ?",
+                                             (key,)).fetchone()
+                    if row is not None:
+                        connection.execute("UPDATE results SET used = ? WHERE key = ?",
+                                           (time.time(), key))
+            except (OSError, sqlite3.Error) as error:
+                w.warn("Could not read the MagmaSat cache in " + self.path + ": " +
+                       str(error), RuntimeWarning)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        record = json.loads(row[0])
+        return MeltsRecord(record["status"], record["masses"], record["compositions"])
+
+    def put(self, key, record):
+        """Stores record under key, evicting the least recently used records if the cache is
+        full."""
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                       (key, json.dumps(record.to_dict()), time.time()))
+                    size = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                    if size > self.maxsize:
+                        connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM "
+                                           "results ORDER BY used LIMIT ?)",
+                                           (size - self.maxsize,))
+                        self.evictions += size - self.maxsize
+            except (OSError, sqlite3.Error) as error:
+                w.warn("Could not write to the MagmaSat cache in " + self.path + ": " +
+                       str(error), RuntimeWarning)
+
+    def clear(self):
+        """Deletes every stored result and resets the statistics."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM results")
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        with self._lock:
+            try:
+                currsize = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except (OSError, sqlite3.Error):
+                currsize = None
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups > 0 else np.nan,
+                'evictions': self.evictions, 'currsize': currsize, 'maxsize': self.maxsize,
+                'path': self.path}
+
+
+# The MagmaSat cache, if one has been enabled
+_cache = None
+
+
+def enable_cache(cache_dir=None, maxsize=100000, significant_figures=10):
+    """
+    Stores the results of MELTS equilibrations made by MagmaSat in a persistent cache on disk,
+    so that an equilibration of a bulk composition at a temperature and pressure that has been
+    made before, in this or an earlier session, is not made again. Inputs are rounded to
+    significant_figures before being compared. The cache holds the phase masses and
+    compositions used by MagmaSat, about 1 kB per result. The worker processes of parallel
+    MagmaSat calculations use the cache too.
+
+    Parameters
+    ----------
+    cache_dir: str
+        OPTIONAL: Directory of the cache. Defaults to the VESICAL_CACHE_DIR environment variable
+        if it is set, otherwise to ~/.cache/VESIcal.
+
+    maxsize: int
+        OPTIONAL: Maximum number of results stored. Default is 100000.
+
+    significant_figures: int
+        OPTIONAL: Number of significant figures to which inputs are rounded. Default is 10.
+    """
+    global _cache
+    _cache = MeltsCache(cache_dir=cache_dir, maxsize=maxsize,
+                        significant_figures=significant_figures)
+
+
+def disable_cache():
+    """Stops using the MagmaSat cache enabled with enable_cache. Stored results are kept on
+    disk."""
+    global _cache
+    _cache = None
+
+
+def clear_cache():
+    """Deletes every result in the MagmaSat cache and resets its statistics."""
+    if _cache is not None:
+        _cache.clear()
+
+
+def cache_info():
+    """
+    Returns the statistics of the MagmaSat cache.
+
+    Returns
+    -------
+    dict or None
+        Number of hits and misses in this process, the hit rate, the number of evictions, the
+        current and maximum number of stored results, and the path of the cache file. None if
+        the cache is not enabled.
+    """
+    if _cache is None:
+        return None
+    return _cache.info()
+
+
+class EnginePool(object):
+    """
+    A pool of MELTS instances for calculations that need an instance of their own, rather than
+    the one shared by MagmaSat in this process, because they may leave it in a bad state, e.g.,
+    calculate_degassing_path, which can set infeasible bulk compositions in MELTS. Building a
+    MELTS instance and suppressing its phases is costly, so instances are returned to the pool
+    once the calculation is done, and lent again to the next one. An instance is only
+    discarded, and a new one built in its place, if the calculation that used it reports it
+    unhealthy, i.e., MELTS failed or an error was raised, or if it belongs to an equilibrium
+    backend other than the current one. Up to maxsize idle instances are kept.
+    """
+
+    def __init__(self, maxsize=4):
+        if maxsize < 0:
+            raise core.InputError("maxsize must not be negative.")
+        self.maxsize = int(maxsize)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+
+    def acquire(self):
+        """Returns an idle MELTS instance of the current backend, or a new one if there is
+        none. The instance is set to the bulk composition of the calculation by the caller, and
+        should be given back with release."""
+        with self._lock:
+            while len(self._idle) > 0:
+                engine_backend, engine = self._idle.pop()
+                if engine_backend == backend:
+                    self.reused += 1
+                    return engine
+                self.recycled += 1
+            self.created += 1
+        return new_engine()
+
+    def release(self, engine, healthy=True):
+        """
+        Gives back a MELTS instance obtained from acquire.
+
+        Parameters
+        ----------
+        engine: thermoengine equilibrate MELTSmodel
+            The MELTS instance.
+
+        healthy: bool
+            OPTIONAL: Default is True. If False, the instance is discarded rather than reused.
+        """
+        with self._lock:
+            if not healthy:
+                self.recycled += 1
+            elif len(self._idle) < self.maxsize:
+                self._idle.append((backend, engine))
+
+    def clear(self):
+        """Discards every idle MELTS instance and resets the statistics of the pool."""
+        with self._lock:
+            self._idle = []
+            self.created = 0
+            self.reused = 0
+            self.recycled = 0
+
+    def info(self):
+        """
+        Returns
+        -------
+        dict
+            Number of MELTS instances created, reused and recycled (discarded), and the number
+            of idle instances.
+        """
+        with self._lock:
+            return {'created': self.created,
+                    'reused': self.reused,
+                    'recycled': self.recycled,
+                    'idle': len(self._idle)}
+
+
+# The pool of MELTS instances used by calculate_degassing_path
+engine_pool = EnginePool()
+
+
+def _predict_dissolved(evaluated, X):
+    """
+    Predicts the H2O and CO2 dissolved at saturation in a fluid of composition X from the points
+    already calculated along the same isobar, by interpolating between the nearest lower and
+    higher XH2Ofluid, or extrapolating from the two nearest.
+
+    Parameters
+    ----------
+    evaluated: dict
+        Dissolved H2O and CO2 in wt%, keyed by XH2Ofluid.
+
+    X: float
+        XH2Ofluid of the point to predict.
+
+    Returns
+    -------
+    tuple or None
+        The predicted dissolved H2O and CO2 in wt%, or None if no points have been calculated.
+    """
+    if len(evaluated) == 0:
+        return None
+    lower = [X_done for X_done in evaluated if X_done < X]
+    upper = [X_done for X_done in evaluated if X_done > X]
+    if len(lower) > 0 and len(upper) > 0:
+        neighbours = [max(lower), min(upper)]
+    else:
+        neighbours = sorted(evaluated, key=lambda X_done: abs(X_done - X))[:2]
+    if len(neighbours) == 1:
+        return evaluated[neighbours[0]]
+    X_a, X_b = neighbours
+    f = (X - X_a) / (X_b - X_a)
+    return tuple(a + f * (b - a) for a, b in zip(evaluated[X_a], evaluated[X_b]))
+
+
+def _calculate_isobar(args):
+    """
+    Calculates one isobar in a worker process of calculate_isobars_and_isopleths.
+    """
+    return MagmaSat()._calculate_isobar(*args)
+
+
 class MagmaSat(model_classes.Model):
     """
     An object to instantiate a thermoengine equilibrate class
@@ -68,6 +1095,8 @@ class MagmaSat(model_classes.Model):
             ]
         )
         self.model_type = "MagmaSat"
+        # Statistics of the most recent MELTS paths, see get_path_stats
+        self.paths = deque(maxlen=1000)
 
     def preprocess_sample(self, sample):
         """
@@ -147,6 +1176,40 @@ class MagmaSat(model_classes.Model):
             s += cr.string(None)
         return s
 
+    def _new_path(self, name, warm_start=False, engine=None):
+        """Returns a new MeltsPath, whose statistics are kept by the model."""
+        path = MeltsPath(name, warm_start=warm_start, engine=engine, cache=_cache)
+        self.paths.append(path)
+        for recorder in _recorders:
+            recorder.paths.append(path)
+        return path
+
+    def get_path_stats(self, clear=False):
+        """Returns the statistics of the MELTS paths taken by the most recent calculations,
+        one path per calculation, in the order they were made. Up to 1000 paths are kept.
+
+        Parameters
+        ----------
+        clear: bool
+            OPTIONAL: Default is False. If set to True, the statistics are cleared once
+            returned.
+
+        Returns
+        -------
+        pandas DataFrame
+            One row per path, as returned by MeltsPath.get_stats: the name of the calculation,
+            whether warm starts were enabled, the number of equilibrations, warm starts,
+            fallbacks to a cold start, equilibrations answered from the MagmaSat cache, and
+            failed equilibrations, the failed statuses, and the time spent in MELTS and
+            answering phase queries. To record the paths of calculations made through
+            calculate_classes, which use a new MagmaSat instance each time, use MeltsStats.
+        """
+        stats = pd.DataFrame([path.get_stats() for path in self.paths],
+                             columns=path_stats_columns)
+        if clear:
+            self.paths.clear()
+        return stats
+
     def get_fluid_mass(self, sample, temperature, pressure, H2O, CO2):
         """An internally used function to calculate fluid mass.
 
@@ -179,12 +1242,12 @@ class MagmaSat(model_classes.Model):
                           core.magmasat_oxides}
         bulk_comp_dict["H2O"] = H2O
         bulk_comp_dict["CO2"] = CO2
-        melts.set_bulk_composition(bulk_comp_dict)
 
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+        path = self._new_path("get_fluid_mass")
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa, bulk_comp_dict
+        )
+        fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
         return fluid_mass
 
@@ -219,14 +1282,13 @@ class MagmaSat(model_classes.Model):
         pressureMPa = pressure / 10.0
 
         _sample.change_composition({"H2O": H2O, "CO2": CO2})
-        melts.set_bulk_composition(
+
+        path = self._new_path("get_XH2O_fluid")
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa,
             _sample.get_composition(units="wtpt_oxides", normalization="none")
         )
-
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_comp = melts.get_composition_of_phase(
+        fluid_comp = path.get_composition_of_phase(
             xmlout, phase_name="Fluid", mode="component"
         )
         # NOTE mode='component' returns endmember component keys with values in mol fraction.
@@ -246,6 +1308,10 @@ class MagmaSat(model_classes.Model):
         X_fluid=1,
         H2O_guess=0.0,
         verbose=False,
+        tolerance=0.0001,
+        max_equilibrations=100,
+        warm_start=False,
+        dissolved_guess=None,
         **kwargs
     ):
         """
@@ -270,8 +1336,32 @@ class MagmaSat(model_classes.Model):
 
         verbose: bool
             OPTIONAL: Default is False. If set to True, returns H2O and CO2 concentration in the
-            melt, H2O and CO2 concentration in the fluid, mass of the fluid in grams, and
-            proportion of fluid in the system in wt%.
+            melt, H2O and CO2 concentration in the fluid, mass of the fluid in grams,
+            proportion of fluid in the system in wt%, and the number of MELTS equilibrations
+            the calculation took.
+
+        tolerance: float
+            OPTIONAL: Default is 0.0001. Tolerance, in mole fraction, to which the fluid
+            composition is matched to X_fluid.
+
+        max_equilibrations: int
+            OPTIONAL: Default is 100. The maximum number of MELTS equilibrations used to match
+            the fluid composition. If the fluid composition has not been matched to within
+            tolerance by then, a warning is raised and the closest match is used.
+
+        warm_start: bool
+            OPTIONAL: Default is False. If set to True, equilibrations are started from the
+            previous equilibrium state wherever the bulk composition is unchanged, falling back
+            on a cold start if that fails. As the search changes the volatile content of the
+            bulk composition at every step, only the final equilibration can be warm started.
+            Path statistics are returned by get_path_stats.
+
+        dissolved_guess: tuple
+            OPTIONAL: Default is None. A guess at the dissolved H2O and CO2 in wt%, e.g.,
+            interpolated from neighbouring points on an isobar. If given, the search for a fluid
+            saturated bulk composition starts from the guess plus a little fluid of composition
+            X_fluid, rather than from H2O_guess, so that a good guess leaves only a small
+            correction to the fluid composition.
 
         Returns
         -------
@@ -300,122 +1390,124 @@ class MagmaSat(model_classes.Model):
                     "0.9999."
                 )
 
+        bulk_comp = dict(_sample.get_composition(units="wtpt_oxides", normalization="none"))
+        path = self._new_path("calculate_dissolved_volatiles", warm_start)
+
+        def XH2O_fluid_at(H2O, CO2):
+            xmlout = path.equilibrate(
+                temperature, pressureMPa, dict(bulk_comp, H2O=H2O, CO2=CO2)
+            )[3]
+            fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
+            fluid_comp = path.get_composition_of_phase(
+                xmlout, phase_name="Fluid", mode="component"
+            )
+            return fluid_mass, fluid_comp.get("Water", 0.0)
+
+        # ------ Find a fluid saturated bulk composition ------ #
+        # Volatiles are added with the bulk H2O/(H2O+CO2) in wt set to X_fluid, doubling the
+        # amount added until a fluid is present. With dissolved_guess, fluid of composition
+        # X_fluid is added to the guessed dissolved volatiles instead.
+        step = 0.2 if X_fluid >= 0.5 else 0.1
         H2O_val = H2O_guess
         CO2_val = 0.0
         fluid_mass = 0.0
+        if dissolved_guess is not None:
+            H2O_fl = X_fluid * core.oxideMass["H2O"]
+            CO2_fl = (1 - X_fluid) * core.oxideMass["CO2"]
+            H2O_fl, CO2_fl = H2O_fl / (H2O_fl + CO2_fl), CO2_fl / (H2O_fl + CO2_fl)
+            H2O_dissolved = 0.0 if X_fluid == 0 else max(float(dissolved_guess[0]), 0.0)
+            CO2_dissolved = 0.0 if X_fluid == 1 else max(float(dissolved_guess[1]), 0.0)
+            step = 0.1
+        while fluid_mass <= 0 and dissolved_guess is not None:
+            if path.equilibrations >= max_equilibrations:
+                raise core.SaturationError(
+                    "Fluid saturation not reached in " + str(path.equilibrations) +
+                    " MELTS equilibrations."
+                )
+            H2O_val = H2O_dissolved + step * H2O_fl
+            CO2_val = CO2_dissolved + step * CO2_fl
+            fluid_mass, XH2O_fluid = XH2O_fluid_at(H2O_val, CO2_val)
+            step *= 2
         while fluid_mass <= 0:
+            if path.equilibrations >= max_equilibrations:
+                raise core.SaturationError(
+                    "Fluid saturation not reached in " + str(path.equilibrations) +
+                    " MELTS equilibrations."
+                )
             if X_fluid == 0:
-                CO2_val += 0.1
-            elif X_fluid >= 0.5:
-                H2O_val += 0.2
-                # NOTE this is setting XH2Owt of the system (not of the fluid) to X_fluid
-                CO2_val = (H2O_val / X_fluid) - H2O_val
-                # TODO this is what needs to be higher for higher XH2O. Slows down computation
-                # by a second or two
+                CO2_val = step
             else:
-                H2O_val += 0.1
-                # NOTE this is setting XH2Owt of the system (not of the fluid) to X_fluid
+                H2O_val = H2O_guess + step
                 CO2_val = (H2O_val / X_fluid) - H2O_val
-                # TODO this is what needs to be higher for higher XH2O. Slows down computation
-                # by a second or two
-
-            fluid_mass = self.get_fluid_mass(
-                _sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        _sample.change_composition(
-            {"H2O": H2O_val, "CO2": CO2_val}, units="wtpt_oxides"
-        )
-        melts.set_bulk_composition(
-            _sample.get_composition(units="wtpt_oxides", normalization="none")
-        )
-
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        liquid_comp = melts.get_composition_of_phase(
-            xmlout, phase_name="Liquid", mode="oxide_wt"
-        )
-        fluid_comp = melts.get_composition_of_phase(
-            xmlout, phase_name="Fluid", mode="component"
-        )
-
-        if "Water" in fluid_comp:
-            H2O_fl = fluid_comp["Water"]
-        else:
-            H2O_fl = 0.0
-
-        XH2O_fluid = H2O_fl
-
-        # ------ Coarse Check ------ #
-        while XH2O_fluid < X_fluid - 0.1:  # too low coarse check
-            H2O_val += 0.2
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        while XH2O_fluid > X_fluid + 0.1:  # too high coarse check
-            CO2_val += 0.1
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        # ------ Refinement 1 ------ #
-        while XH2O_fluid < X_fluid - 0.01:  # too low refinement 1
-            H2O_val += 0.05
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        while XH2O_fluid > X_fluid + 0.01:  # too high refinement 1
-            CO2_val += 0.01
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        # ------ Refinement 2 ------ #
-        while XH2O_fluid < X_fluid - 0.001:  # too low refinement 2
-            H2O_val += 0.005
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        while XH2O_fluid > X_fluid + 0.001:  # too high refinement 2
-            CO2_val += 0.001
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        # ------ Final refinement ------ #
-        while XH2O_fluid < X_fluid - 0.0001:  # too low final refinement
-            H2O_val += 0.001
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
-
-        while XH2O_fluid > X_fluid + 0.0001:  # too high final refinement
-            CO2_val += 0.0001
-            XH2O_fluid = self.get_XH2O_fluid(
-                sample, temperature, pressure, H2O_val, CO2_val
-            )
+            fluid_mass, XH2O_fluid = XH2O_fluid_at(H2O_val, CO2_val)
+            step *= 2
+
+        # ------ Match the fluid composition ------ #
+        # Adding H2O (t > 0) or CO2 (t < 0) to the saturated bulk composition keeps it
+        # saturated, and XH2O of the fluid increases monotonically with t. XH2O(t) = X_fluid is
+        # solved by bracketing the root and then using the Illinois method.
+        def H2O_CO2(t):
+            return H2O_val + max(t, 0.0), CO2_val + max(-t, 0.0)
+
+        def residual(t):
+            return XH2O_fluid_at(*H2O_CO2(t))[1] - X_fluid
+
+        t_best, f_best = 0.0, XH2O_fluid - X_fluid
+        if abs(f_best) > tolerance and X_fluid != 0 and X_fluid != 1:
+            t_a, f_a = t_best, f_best
+            # Bracket the root, with the first steps those of the old coarse search. Starting
+            # from dissolved_guess, the first step is instead the change in dissolved H2O or CO2
+            # expected if it were proportional to XH2O or XCO2 of the fluid.
+            t_b = 0.2 if f_a < 0 else -0.1
+            if dissolved_guess is not None:
+                if f_a < 0:
+                    t_b = max(-f_a * H2O_dissolved / X_fluid, 0.001)
+                else:
+                    t_b = min(-f_a * CO2_dissolved / (1 - X_fluid), -0.001)
+            f_b = residual(t_b)
+            while (f_b < 0) == (f_a < 0) and abs(f_b) > tolerance:
+                if path.equilibrations >= max_equilibrations:
+                    break
+                t_a, f_a = t_b, f_b
+                t_b *= 2
+                f_b = residual(t_b)
+            if abs(f_b) < abs(f_best):
+                t_best, f_best = t_b, f_b
+
+            # Illinois
+            while abs(f_b) > tolerance and path.equilibrations < max_equilibrations:
+                if (f_b < 0) == (f_a < 0):
+                    break
+                t_c = t_b - f_b * (t_b - t_a) / (f_b - f_a)
+                f_c = residual(t_c)
+                if (f_c < 0) != (f_b < 0):
+                    t_a, f_a = t_b, f_b
+                else:
+                    f_a = f_a / 2
+                t_b, f_b = t_c, f_c
+                if abs(f_b) < abs(f_best):
+                    t_best, f_best = t_b, f_b
+
+            if abs(f_best) > tolerance:
+                w.warn(
+                    "Fluid composition matched to within " + str(abs(f_best)) + " of X_fluid, "
+                    "not " + str(tolerance) + ", in " + str(path.equilibrations) +
+                    " MELTS equilibrations.",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+        H2O_val, CO2_val = H2O_CO2(t_best)
 
         # ------ Get calculated values ------ #
-        _sample.change_composition(
-            {"H2O": H2O_val, "CO2": CO2_val}, units="wtpt_oxides"
-        )
-        melts.set_bulk_composition(
-            _sample.get_composition(units="wtpt_oxides", normalization="none")
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa, dict(bulk_comp, H2O=H2O_val, CO2=CO2_val)
         )
-
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
-        system_mass = melts.get_mass_of_phase(xmlout, phase_name="System")
-        liquid_comp = melts.get_composition_of_phase(
+        fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
+        system_mass = path.get_mass_of_phase(xmlout, phase_name="System")
+        liquid_comp = path.get_composition_of_phase(
             xmlout, phase_name="Liquid", mode="oxide_wt"
         )
-        fluid_comp = melts.get_composition_of_phase(
+        fluid_comp = path.get_composition_of_phase(
             xmlout, phase_name="Fluid", mode="component"
         )
 
@@ -449,6 +1541,7 @@ class MagmaSat(model_classes.Model):
                 "XH2O_fl": H2O_fl,
                 "XCO2_fl": CO2_fl,
                 "FluidProportion_wt": 100 * fluid_mass / system_mass,
+                "Equilibrations": path.equilibrations,
             }
 
         if verbose is False:
@@ -518,20 +1611,19 @@ class MagmaSat(model_classes.Model):
 
         pressureMPa = pressure / 10.0
 
-        melts.set_bulk_composition(bulk_comp_dict)
-
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+        path = self._new_path("calculate_equilibrium_fluid_comp")
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa, bulk_comp_dict
+        )
+        fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
         flsystem_wtper = (
             100
             * fluid_mass
-            / (fluid_mass + melts.get_mass_of_phase(xmlout, phase_name="Liquid"))
+            / (fluid_mass + path.get_mass_of_phase(xmlout, phase_name="Liquid"))
         )
 
         if fluid_mass > 0.0:
-            fluid_comp = melts.get_composition_of_phase(
+            fluid_comp = path.get_composition_of_phase(
                 xmlout, phase_name="Fluid", mode="component"
             )
             fluid_comp_H2O = fluid_comp["Water"]
@@ -540,7 +1632,7 @@ class MagmaSat(model_classes.Model):
             fluid_comp_H2O = 0
             fluid_comp_CO2 = 0
 
-        melts.set_bulk_composition(self.bulk_comp_orig)  # reset
+        get_engine().set_bulk_composition(self.bulk_comp_orig)  # reset
 
         if verbose is False:
             return {"CO2": fluid_comp_CO2, "H2O": fluid_comp_H2O}
@@ -554,7 +1646,7 @@ class MagmaSat(model_classes.Model):
             }
 
     def calculate_saturation_pressure(
-        self, sample, temperature, verbose=False, **kwargs
+        self, sample, temperature, verbose=False, method="bracket", warm_start=False, **kwargs
     ):
         """
         Calculates the saturation pressure of a sample composition.
@@ -571,7 +1663,21 @@ class MagmaSat(model_classes.Model):
             OPTIONAL: Default is False. If set to False, only the saturation pressure is returned.
             If set to True, the saturation pressure, mass of fluid in grams, proportion of fluid
             in wt%, and H2O and CO2 concentrations in the fluid in mole fraction are all returned
-            in a dict.
+            in a dict, along with the number of MELTS equilibrations the search took.
+
+        method: str
+            OPTIONAL: Default is 'bracket', in which case the saturation pressure is found by a
+            bracketing search on the mass of fluid, combining secant steps with bisection. If
+            set to 'step', the pressure is instead stepped down (or up) from 2000 MPa in steps
+            of 100, 10 and then 1 MPa, as in earlier versions of VESIcal, which takes several
+            times more equilibrations. Both find the saturation pressure to within 1 MPa.
+
+        warm_start: bool
+            OPTIONAL: Default is False. If set to True, each equilibration of the search is
+            started from the equilibrium state found at the previous pressure, falling back on
+            a cold start if that fails. The number of equilibrations, warm starts and
+            fallbacks, and the time taken, are recorded in the path statistics returned by
+            get_path_stats.
 
         Returns
         -------
@@ -580,19 +1686,99 @@ class MagmaSat(model_classes.Model):
             If verbose is set to True: dict of all calculated values.
         """
         _sample = self.preprocess_sample(sample)
+        bulk_comp = _sample.get_composition(units="wtpt_oxides", normalization="fixedvolatiles")
 
-        melts.set_bulk_composition(
-            _sample.get_composition(units="wtpt_oxides", normalization="fixedvolatiles")
-        )
+        if method == "bracket":
+            search = self._saturation_pressure_bracket
+        elif method == "step":
+            search = self._saturation_pressure_step
+        else:
+            raise core.InputError("method must be 'bracket' or 'step'.")
+        path = self._new_path("calculate_saturation_pressure", warm_start)
+        pressureMPa, fluid_mass, xmlout = search(bulk_comp, temperature, path)
+
+        if pressureMPa != np.nan:
+            satP = pressureMPa * 10  # convert pressure to bars
+            flmass = fluid_mass
+            flsystem_wtper = (
+                100
+                * fluid_mass
+                / (fluid_mass + path.get_mass_of_phase(xmlout, phase_name="Liquid"))
+            )
+            flcomp = path.get_composition_of_phase(
+                xmlout, phase_name="Fluid", mode="component"
+            )
+            try:
+                flH2O = flcomp["Water"]
+            except Exception:
+                flH2O = 0.0
+            try:
+                flCO2 = flcomp["Carbon Dioxide"]
+            except Exception:
+                flCO2 = 0.0
+        else:
+            flmass = np.nan
+            flsystem_wtper = np.nan
+            flH2O = np.nan
+            flCO2 = np.nan
+            warnmessage = "Calculation failed."
+
+        get_engine().set_bulk_composition(
+            self.bulk_comp_orig
+        )  # this needs to be reset always!
+
+        if verbose is False:
+            try:
+                w.warn(warnmessage)
+            except Exception:
+                pass
+            return satP
+
+        elif verbose:
+            try:
+                w.warn(warnmessage)
+            except Exception:
+                pass
+            return {
+                "SaturationP_bars": satP,
+                "FluidMass_grams": flmass,
+                "FluidProportion_wt": flsystem_wtper,
+                "XH2O_fl": flH2O,
+                "XCO2_fl": flCO2,
+                "Equilibrations": path.equilibrations,
+            }
+
+    def _saturation_pressure_step(self, bulk_comp, temperature, path):
+        """
+        Finds the saturation pressure by stepping the pressure from 2000 MPa in steps of 100,
+        10, and then 1 MPa, as in earlier versions of VESIcal.
+
+        Parameters
+        ----------
+        bulk_comp: dict
+            Bulk composition in wt% oxides, as passed to MELTS.
+
+        temperature: float
+            Temperature in degrees C.
+
+        path: MeltsPath
+            The path through which the equilibrations are made.
+
+        Returns
+        -------
+        tuple
+            Saturation pressure in MPa, mass of fluid in grams, and MELTS output at the
+            saturation pressure.
+        """
         # Coarse search
         # NOTE that pressure is in MPa for MagmaSat calculations but reported in bars.
         pressureMPa = 2000
 
         # Check if saturated at 2000 MPa (rare, for deep samples)
-        with redirect_stdout(_f):
-            output = melts.equilibrate_tp(temperature, pressureMPa, initialize=True)
-        (status, temperature, pressureMPa, xmlout) = output[0]
-        fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+        (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+            temperature, pressureMPa, bulk_comp
+        )
+        fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
         if fluid_mass <= 0:  # if not sat'd at 2000 MPa
             while fluid_mass <= 0:
@@ -600,12 +1786,10 @@ class MagmaSat(model_classes.Model):
                 if pressureMPa <= 0:
                     break
 
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
+                )
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
             fluid_mass = 0
             pressureMPa += 100
@@ -614,38 +1798,25 @@ class MagmaSat(model_classes.Model):
             while fluid_mass > 0:
                 pressureMPa += 100
 
-                melts.set_bulk_composition(
-                    _sample.get_composition(
-                        units="wtpt_oxides", normalization="fixedvolatiles"
-                    )
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
                 )
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
             fluid_mass = 1.0
             pressureMPa -= 100
 
         # Refined search 1
-        melts.set_bulk_composition(
-            _sample.get_composition(units="wtpt_oxides", normalization="fixedvolatiles")
-        )
-
         if fluid_mass <= 0:  # proceed down pressure search
             while fluid_mass <= 0:
                 pressureMPa -= 10
                 if pressureMPa <= 0:
                     break
 
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
+                )
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
             fluid_mass = 0
             pressureMPa += 10
@@ -654,104 +1825,114 @@ class MagmaSat(model_classes.Model):
             while fluid_mass > 0:
                 pressureMPa += 10
 
-                melts.set_bulk_composition(
-                    _sample.get_composition(
-                        units="wtpt_oxides", normalization="fixedvolatiles"
-                    )
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
                 )
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
             fluid_mass = 1.0
             pressureMPa -= 10
 
         # Refined search 2
-        melts.set_bulk_composition(
-            _sample.get_composition(units="wtpt_oxides", normalization="fixedvolatiles")
-        )
-
         if fluid_mass <= 0:  # proceed down pressure search
             while fluid_mass <= 0:
                 pressureMPa -= 1
                 if pressureMPa <= 0:
                     break
 
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
+                )
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
         elif fluid_mass > 0:  # proceed upward pressure search
             while fluid_mass > 0:
                 pressureMPa += 1
 
-                melts.set_bulk_composition(
-                    _sample.get_composition(
-                        units="wtpt_oxides", normalization="fixedvolatiles"
-                    )
+                (status, temperature, pressureMPa, xmlout) = path.equilibrate(
+                    temperature, pressureMPa, bulk_comp
                 )
-                with redirect_stdout(_f):
-                    output = melts.equilibrate_tp(
-                        temperature, pressureMPa, initialize=True
-                    )
-                (status, temperature, pressureMPa, xmlout) = output[0]
-                fluid_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+                fluid_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
 
-        if pressureMPa != np.nan:
-            satP = pressureMPa * 10  # convert pressure to bars
-            flmass = fluid_mass
-            flsystem_wtper = (
-                100
-                * fluid_mass
-                / (fluid_mass + melts.get_mass_of_phase(xmlout, phase_name="Liquid"))
-            )
-            flcomp = melts.get_composition_of_phase(
-                xmlout, phase_name="Fluid", mode="component"
-            )
-            try:
-                flH2O = flcomp["Water"]
-            except Exception:
-                flH2O = 0.0
-            try:
-                flCO2 = flcomp["Carbon Dioxide"]
-            except Exception:
-                flCO2 = 0.0
-        else:
-            flmass = np.nan
-            flsystem_wtper = np.nan
-            flH2O = np.nan
-            flCO2 = np.nan
-            warnmessage = "Calculation failed."
+        return pressureMPa, fluid_mass, xmlout
 
-        melts.set_bulk_composition(
-            self.bulk_comp_orig
-        )  # this needs to be reset always!
+    def _saturation_pressure_bracket(self, bulk_comp, temperature, path, tolerance=1):
+        """
+        Finds the saturation pressure by a bracketing search on the mass of fluid. The bracket
+        is kept between a pressure at which the sample is fluid saturated and one at which it
+        is not, and is narrowed with secant steps, which extrapolate the fluid mass at the two
+        saturated pressures nearest the bracket to zero, falling back on bisection whenever
+        the secant steps do not shrink the bracket quickly enough. Pressures are kept to whole
+        multiples of tolerance, so the result is that of the stepped search in
+        _saturation_pressure_step: the highest such pressure at which fluid is present.
 
-        if verbose is False:
-            try:
-                w.warn(warnmessage)
-            except Exception:
-                pass
-            return satP
+        Parameters
+        ----------
+        bulk_comp: dict
+            Bulk composition in wt% oxides, as passed to MELTS.
 
-        elif verbose:
-            try:
-                w.warn(warnmessage)
-            except Exception:
-                pass
-            return {
-                "SaturationP_bars": satP,
-                "FluidMass_grams": flmass,
-                "FluidProportion_wt": flsystem_wtper,
-                "XH2O_fl": flH2O,
-                "XCO2_fl": flCO2,
-            }
+        temperature: float
+            Temperature in degrees C.
+
+        path: MeltsPath
+            The path through which the equilibrations are made.
+
+        tolerance: float
+            OPTIONAL: Width of the final bracket in MPa. Default is 1.
+
+        Returns
+        -------
+        tuple
+            Saturation pressure in MPa, mass of fluid in grams, and MELTS output at the
+            saturation pressure.
+        """
+        def fluid_mass_at(pressureMPa):
+            xmlout = path.equilibrate(temperature, pressureMPa, bulk_comp)[3]
+            return path.get_mass_of_phase(xmlout, phase_name="Fluid"), xmlout
+
+        # Bracket the saturation pressure, starting from 2000 MPa
+        hi = 2000
+        hi_mass, hi_xmlout = fluid_mass_at(hi)
+        saturated = []  # (pressure, fluid mass) of the saturated pressures, in order found
+        if hi_mass > 0:  # if sat'd at 2000 MPa (rare, for deep samples), add pressure
+            step = 100
+            while hi_mass > 0:
+                lo, lo_mass, lo_xmlout = hi, hi_mass, hi_xmlout
+                saturated.append((lo, lo_mass))
+                hi = lo + step
+                step *= 2
+                hi_mass, hi_xmlout = fluid_mass_at(hi)
+        else:
+            lo = tolerance
+            lo_mass, lo_xmlout = fluid_mass_at(lo)
+            if lo_mass <= 0:  # never saturated
+                return 0, lo_mass, lo_xmlout
+            saturated.append((lo, lo_mass))
+
+        # Narrow the bracket
+        widths = [hi - lo]
+        while hi - lo > tolerance:
+            pressureMPa = None
+            if len(saturated) >= 2 and (len(widths) < 3 or widths[-1] < 0.5 * widths[-3]):
+                (P1, m1), (P2, m2) = saturated[-1], saturated[-2]
+                if m1 != m2:
+                    estimate = P1 + m1 * (P1 - P2) / (m2 - m1)
+                    if np.isfinite(estimate):
+                        # Round down to the grid, staying strictly inside the bracket
+                        estimate = tolerance * int(estimate // tolerance)
+                        pressureMPa = min(max(estimate, lo + tolerance), hi - tolerance)
+            if pressureMPa is None:
+                pressureMPa = lo + tolerance * int((hi - lo) // (2 * tolerance))
+
+            fluid_mass, xmlout = fluid_mass_at(pressureMPa)
+            if fluid_mass > 0:
+                lo, lo_mass, lo_xmlout = pressureMPa, fluid_mass, xmlout
+                saturated.append((lo, lo_mass))
+            else:
+                hi = pressureMPa
+            widths.append(hi - lo)
+
+        return lo, lo_mass, lo_xmlout
 
     def calculate_isobars_and_isopleths(
         self,
@@ -762,12 +1943,19 @@ class MagmaSat(model_classes.Model):
         smooth_isobars=True,
         smooth_isopleths=True,
         print_status=True,
+        adaptive=False,
+        tolerance=0.01,
+        points=21,
+        warm_start=False,
+        workers=None,
         **kwargs
     ):
         """
         Calculates isobars and isopleths at a constant temperature for a given sample. Isobars can
         be calculated for any number of pressures. Isobars are calculated using 5 XH2O values
-        (0, 0.25, 0.5, 0.75, 1).
+        (0, 0.25, 0.5, 0.75, 1), or, if adaptive is True, starting from those values and adding
+        points only where the isobar bends. Along each isobar, every point is started from the
+        dissolved volatiles predicted from the neighbouring points already calculated.
 
         Parameters
         ----------
@@ -799,6 +1987,29 @@ class MagmaSat(model_classes.Model):
             OPTIONAL: Default is True. If set to True, progress of the calculations will be
             printed to the terminal.
 
+        adaptive: bool
+            OPTIONAL: Default is False. If set to True, each isobar is refined in XH2Ofluid until
+            it deviates from a straight line between neighbouring points by no more than
+            tolerance, or until it holds points points. All computed points are returned.
+
+        tolerance: float
+            OPTIONAL: Default is 0.01. Only used if adaptive is True. Maximum deviation of the
+            isobar from a straight line between neighbouring points, relative to the range of
+            dissolved H2O and CO2 along the isobar.
+
+        points: int
+            OPTIONAL: Default is 21. Only used if adaptive is True. Maximum number of points
+            calculated along each isobar.
+
+        warm_start: bool
+            OPTIONAL: Default is False. Passed to calculate_dissolved_volatiles for every point.
+
+        workers: int
+            OPTIONAL: Default is None, in which case the isobars are calculated one after the
+            other in this process. Otherwise, the isobars are shared between this number of
+            worker processes, each with its own MELTS instance. Pass -1 to use one process per
+            CPU.
+
         Returns
         -------
         pandas DataFrame objects
@@ -832,52 +2043,37 @@ class MagmaSat(model_classes.Model):
         all_iso_vals = list(dict.fromkeys(all_iso_vals))  # remove duplicates
         all_iso_vals.sort()  # sort from smallest to largest
 
+        if workers == -1:
+            workers = os.cpu_count()
+        if workers is not None and (not isinstance(workers, int) or workers < 1):
+            raise core.InputError("workers must be None, -1, or a positive integer.")
+
+        isobar_args = [(_sample, temperature, i, all_iso_vals, adaptive, tolerance, points,
+                        warm_start) for i in P_vals]
+        if workers is None or workers == 1 or len(P_vals) <= 1:
+            isobars = [self._calculate_isobar(*args, print_status=print_status)
+                       for args in isobar_args]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=min(workers, len(P_vals)),
+                    initializer=_initialize_worker,
+                    initargs=_worker_initargs()) as executor:
+                isobars = []
+                for i, isobar in zip(P_vals, executor.map(_calculate_isobar, isobar_args)):
+                    if print_status:
+                        print("Calculated isobar at " + str(i) + " bars")
+                    isobars.append(isobar)
+
         isobar_data = []
         isopleth_data = []
         for X in iso_vals:
             isopleth_data.append([X, 0.0, 0.0])
-        # Calculate equilibrium phase assemblage for all P/T conditions, check if saturated in
-        # fluid...
-        for i in P_vals:
-            guess = 0.0
-            if print_status:
-                print("Calculating isobar at " + str(i) + " bars")
-            X_iter = 0
-            for X in all_iso_vals:
-                X_iter += 1
-                if print_status:
-                    if isopleth_list is not None and X in iso_vals:
-                        sys.stdout.write(
-                            "\r Calculating isopleth at XH2Ofluid = "
-                            + str(X)
-                            + "               "
-                        )
-                    if X not in iso_vals:
-                        sys.stdout.write(
-                            "\r Calculating isobar control point at XH2Ofluid = "
-                            + str(X)
-                            + "               "
-                        )
-                    if X_iter == len(all_iso_vals):
-                        sys.stdout.write(
-                            "\r done.                                               "
-                            "                                                       "
-                            "                     \n"
-                        )
-                saturated_vols = self.calculate_dissolved_volatiles(
-                    sample=_sample,
-                    temperature=temperature,
-                    pressure=i,
-                    H2O_guess=guess,
-                    X_fluid=X,
-                )
-
-                if X in required_iso_vals:
-                    isobar_data.append([i, saturated_vols["H2O_liq"], saturated_vols["CO2_liq"]])
+        for i, isobar in zip(P_vals, isobars):
+            for X, H2O_liq, CO2_liq in isobar:
+                if adaptive or X in required_iso_vals:
+                    isobar_data.append([i, H2O_liq, CO2_liq])
                 if X in iso_vals:
-                    isopleth_data.append([X, saturated_vols["H2O_liq"], saturated_vols["CO2_liq"]])
-
-                guess = saturated_vols["H2O_liq"]
+                    isopleth_data.append([X, H2O_liq, CO2_liq])
 
         if print_status:
             print("Done!")
@@ -885,15 +2081,18 @@ class MagmaSat(model_classes.Model):
         isobars_df = pd.DataFrame(isobar_data, columns=["Pressure", "H2O_liq", "CO2_liq"])
         isopleths_df = pd.DataFrame(isopleth_data, columns=["XH2O_fl", "H2O_liq", "CO2_liq"])
 
-        melts.set_bulk_composition(self.bulk_comp_orig)  # reset
+        get_engine().set_bulk_composition(self.bulk_comp_orig)  # reset
 
+        # vplot imports matplotlib, so is only imported when smoothing
         if smooth_isobars:
+            from VESIcal import vplot
             isobars_smoothed = vplot.smooth_isobars_and_isopleths(isobars=isobars_df)
             res_isobars = isobars_smoothed.copy()
         else:
             res_isobars = isobars_df.copy()
 
         if smooth_isopleths:
+            from VESIcal import vplot
             isopleths_smoothed = vplot.smooth_isobars_and_isopleths(isopleths=isopleths_df)
             res_isopleths = isopleths_smoothed.copy()
         else:
@@ -901,8 +2100,87 @@ class MagmaSat(model_classes.Model):
 
         return res_isobars, res_isopleths
 
+    def _calculate_isobar(self, _sample, temperature, pressure, X_vals, adaptive=False,
+                          tolerance=0.01, points=21, warm_start=False, print_status=False):
+        """
+        Calculates the dissolved H2O and CO2 along one isobar, for calculate_isobars_and_isopleths.
+        Every point is started from the dissolved H2O and CO2 predicted from the neighbouring
+        points already calculated, so that most points need only a few equilibrations to match
+        the fluid composition.
+
+        Parameters
+        ----------
+        _sample:     Sample class
+            Magma major element composition, already preprocessed.
+
+        temperature: float
+            Temperature in degrees C.
+
+        pressure: float
+            Pressure in bars.
+
+        X_vals: list
+            Sorted values of XH2Ofluid to calculate, or, if adaptive is True, to start from.
+
+        adaptive, tolerance, points, warm_start, print_status:
+            As in calculate_isobars_and_isopleths.
+
+        Returns
+        -------
+        list
+            (XH2Ofluid, H2O_liq, CO2_liq) tuples for every point calculated, sorted by
+            XH2Ofluid.
+        """
+        if print_status:
+            print("Calculating isobar at " + str(pressure) + " bars")
+        evaluated = {}
+
+        def isobar_func(X_vals):
+            dissolved = np.zeros([2, len(X_vals)])
+            # Starting from the lowest XH2Ofluid, each point calculated is the one farthest from
+            # those already calculated, so that most are predicted by interpolating between
+            # neighbours on both sides
+            remaining = list(range(len(X_vals)))
+            while len(remaining) > 0:
+                if len(evaluated) == 0:
+                    j = remaining[0]
+                else:
+                    j = max(remaining, key=lambda j: min(abs(X_vals[j] - X_done)
+                                                         for X_done in evaluated))
+                remaining.remove(j)
+                X = X_vals[j]
+                if print_status:
+                    sys.stdout.write("\r Calculating isobar point at XH2Ofluid = "
+                                     + str(round(X, 4)) + "               ")
+                saturated_vols = self.calculate_dissolved_volatiles(
+                    sample=_sample,
+                    temperature=temperature,
+                    pressure=pressure,
+                    X_fluid=float(X),
+                    warm_start=warm_start,
+                    dissolved_guess=_predict_dissolved(evaluated, X),
+                )
+                evaluated[X] = (saturated_vols["H2O_liq"], saturated_vols["CO2_liq"])
+                dissolved[:, j] = evaluated[X]
+            return dissolved
+
+        if adaptive:
+            X_sampled, dissolved = model_classes.adaptive_curve_sampling(
+                isobar_func, X_vals, tolerance=tolerance,
+                max_points=max(points, len(X_vals)), min_interval=0.01)
+        else:
+            X_sampled, dissolved = X_vals, isobar_func(X_vals)
+        if print_status:
+            sys.stdout.write("\r done.                                               "
+                             "                                                       "
+                             "                     \n")
+
+        return [(X, H2O_liq, CO2_liq)
+                for X, H2O_liq, CO2_liq in zip(X_sampled, dissolved[0], dissolved[1])]
+
     def calculate_degassing_path(self, sample, temperature, pressure="saturation",
-                                 fractionate_vapor=0.0, init_vapor=0.0, steps=50, **kwargs):
+                                 fractionate_vapor=0.0, init_vapor=0.0, steps=50,
+                                 warm_start=False, **kwargs):
         """
         Calculates degassing path for one sample
 
@@ -943,6 +2221,13 @@ class MagmaSat(model_classes.Model):
             OPTIONAL. Default value is 50. Specifies the number of steps in pressure space at
             which dissolved volatile concentrations are calculated.
 
+        warm_start: bool
+            OPTIONAL. Default value is False. If set to True, each pressure step is started from
+            the equilibrium state of the previous step wherever the bulk composition is
+            unchanged, as it is in closed-system degassing, falling back on a cold start if that
+            fails. Also used for the saturation pressure search. Path statistics are returned by
+            get_path_stats.
+
         Returns
         -------
         pandas DataFrame object
@@ -957,23 +2242,31 @@ class MagmaSat(model_classes.Model):
         _sample_dict = _sample.get_composition()
 
         # ------ RESET MELTS ------ #
-        # MELTS needs to be reloaded here. If an unfeasible composition gets set inside of MELTS,
-        # which can happen when running open-system degassing path calcs, the following calls to
-        # MELTS will fail. This prevents that from happening.
-        melts = equilibrate.MELTSmodel("1.2.0")
-
-        # Suppress phases not required in the melts simulation
-        phases = melts.get_phase_names()
-        for phase in phases:
-            melts.set_phase_inclusion_status({phase: False})
-        melts.set_phase_inclusion_status({"Fluid": True, "Liquid": True})
-
-        melts.set_bulk_composition(_sample_dict)
+        # The path is calculated with a MELTS instance of its own. If an unfeasible composition
+        # gets set inside of MELTS, which can happen when running open-system degassing path
+        # calcs, the following calls to MELTS will fail. The instance is taken from the engine
+        # pool, and only replaced by a new one if that happens.
+        melts = engine_pool.acquire()
+        healthy = False
+        try:
+            melts.set_bulk_composition(_sample_dict)
+            open_degassing_df, healthy = self._calculate_degassing_path(
+                melts, _sample, _sample_dict, temperature, pressure, fractionate_vapor,
+                init_vapor, steps, warm_start)
+        finally:
+            engine_pool.release(melts, healthy)
         # ------------------------- #
 
+        return open_degassing_df
+
+    def _calculate_degassing_path(self, melts, _sample, _sample_dict, temperature, pressure,
+                                  fractionate_vapor, init_vapor, steps, warm_start):
+        """Calculates the degassing path of calculate_degassing_path with the MELTS instance
+        melts. Returns the path, and whether melts is still healthy."""
         # Get saturation pressure
         data = self.calculate_saturation_pressure(sample=_sample, temperature=temperature,
-                                                  verbose=True)
+                                                  verbose=True, warm_start=warm_start)
+        path = self._new_path("calculate_degassing_path", warm_start, engine=melts)
 
         if pressure == "saturation" or pressure >= data["SaturationP_bars"]:
             SatP_MPa = data["SaturationP_bars"] / 10.0
@@ -993,12 +2286,11 @@ class MagmaSat(model_classes.Model):
         fl_wtper = data["FluidProportion_wt"]
 
         while fl_wtper <= init_vapor:
-            with redirect_stdout(_f):
-                output = melts.equilibrate_tp(temperature, SatP_MPa, initialize=True)
-            (status, temperature, p, xmlout) = output[0]
-            fl_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
-            liq_mass = melts.get_mass_of_phase(xmlout, phase_name="Liquid")
-            fl_comp = melts.get_composition_of_phase(xmlout, phase_name="Fluid")
+            (status, temperature, p, xmlout) = path.equilibrate(temperature, SatP_MPa,
+                                                                _sample_dict)
+            fl_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
+            liq_mass = path.get_mass_of_phase(xmlout, phase_name="Liquid")
+            fl_comp = path.get_composition_of_phase(xmlout, phase_name="Fluid")
             fl_wtper = 100 * fl_mass / (fl_mass + liq_mass)
             try:
                 _sample_dict["H2O"] += fl_comp["H2O"] * 0.0005
@@ -1027,14 +2319,11 @@ class MagmaSat(model_classes.Model):
             batchfile.status_bar.status_bar(percent, btext="Calculating degassing path...")
 
             fl_mass = 0.0
-            melts.set_bulk_composition(_sample_dict)
-            with redirect_stdout(_f):
-                output = melts.equilibrate_tp(temperature, i, initialize=True)
-            (status, temperature, p, xmlout) = output[0]
-            liq_comp = melts.get_composition_of_phase(xmlout, phase_name="Liquid")
-            fl_comp = melts.get_composition_of_phase(xmlout, phase_name="Fluid", mode="component")
-            liq_mass = melts.get_mass_of_phase(xmlout, phase_name="Liquid")
-            fl_mass = melts.get_mass_of_phase(xmlout, phase_name="Fluid")
+            (status, temperature, p, xmlout) = path.equilibrate(temperature, i, _sample_dict)
+            liq_comp = path.get_composition_of_phase(xmlout, phase_name="Liquid")
+            fl_comp = path.get_composition_of_phase(xmlout, phase_name="Fluid", mode="component")
+            liq_mass = path.get_mass_of_phase(xmlout, phase_name="Liquid")
+            fl_mass = path.get_mass_of_phase(xmlout, phase_name="Fluid")
             fl_wtper = 100 * fl_mass / (fl_mass + liq_mass)
 
             if fl_mass > 0:
@@ -1073,6 +2362,8 @@ class MagmaSat(model_classes.Model):
             _sample_dict = _sample.get_composition(normalization="standard", units="wtpt_oxides")
 
         melts.set_bulk_composition(self.bulk_comp_orig)  # this needs to be reset always!
+        path.engine = None  # release the local MELTS instance
+        healthy = path.failures == 0
         open_degassing_df = pd.DataFrame(list(zip(pressure, H2Oliq, CO2liq, H2Ofl, CO2fl,
                                                   fluid_wtper)),
                                          columns=["Pressure_bars",
@@ -1085,4 +2376,4 @@ class MagmaSat(model_classes.Model):
         open_degassing_df = open_degassing_df[open_degassing_df.CO2_liq >= 0.0]
         open_degassing_df = open_degassing_df[open_degassing_df.H2O_liq >= 0.0]
 
-        return open_degassing_df
+        return open_degassing_df, healthy
@@ -0,0 +1,554 @@
+"""
+MagmaSatFast: a fast approximation of MagmaSat saturation pressures, for screening large
+numbers of samples, e.g., melt inclusions.
+
+Saturation pressures are predicted by a surrogate model trained offline on MagmaSat results
+(see train) and stored in a compact .npz file. Each prediction comes with an estimate of its
+relative error, and is only used if the sample lies inside the domain the surrogate was trained
+on and the estimated error is within the tolerance asked for. Otherwise the saturation pressure
+is calculated with the full MagmaSat model, as it is for every other calculation.
+"""
+
+from VESIcal import core
+from VESIcal import sample_class
+from VESIcal import batchfile  # needed for status_bar functions
+from VESIcal.models import magmasat
+
+import concurrent.futures
+import itertools
+import os
+import warnings as w
+
+import numpy as np
+import pandas as pd
+
+# The inputs of the surrogate: the anhydrous oxides normalized to 100 wt%, temperature in
+# degC, and the logarithms of H2O and CO2 in wt%. The offsets keep the logarithms finite for
+# samples without H2O or CO2.
+surrogate_oxides = [oxide for oxide in core.magmasat_oxides if oxide not in ("H2O", "CO2")]
+input_names = surrogate_oxides + ["Temperature", "lnH2O", "lnCO2"]
+_H2O_offset = 0.01
+_CO2_offset = 0.001
+
+
+def default_model_path():
+    """
+    Returns the path of the surrogate model file used when none is given: the
+    VESICAL_MAGMASATFAST_MODEL environment variable if it is set, otherwise MagmaSatFast.npz in
+    the VESIcal cache directory (the VESICAL_CACHE_DIR environment variable, or ~/.cache/VESIcal).
+    """
+    if "VESICAL_MAGMASATFAST_MODEL" in os.environ:
+        return os.environ["VESICAL_MAGMASATFAST_MODEL"]
+    cache_dir = os.environ.get('VESICAL_CACHE_DIR',
+                               os.path.join(os.path.expanduser('~'), '.cache', 'VESIcal'))
+    return os.path.join(cache_dir, "MagmaSatFast.npz")
+
+
+def surrogate_inputs(compositions, temperature):
+    """
+    Returns the inputs of the surrogate for a set of samples.
+
+    Parameters
+    ----------
+    compositions: pandas DataFrame
+        Compositions of the samples in wt% oxides, one row per sample, as passed to MELTS by
+        MagmaSat, i.e., with the fixedvolatiles normalization. Missing oxides are taken as 0.
+
+    temperature: float or array
+        Temperature in degrees C, for all samples or one per sample.
+
+    Returns
+    -------
+    numpy array
+        One row per sample, with the inputs in the order of input_names.
+    """
+    compositions = pd.DataFrame(compositions).reindex(columns=core.magmasat_oxides)
+    compositions = compositions.fillna(0.0).astype(float)
+    anhydrous = compositions[surrogate_oxides].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        anhydrous = 100 * anhydrous / anhydrous.sum(axis=1, keepdims=True)
+    temperature = np.broadcast_to(np.asarray(temperature, dtype=float), (len(compositions),))
+    H2O = np.clip(compositions["H2O"].to_numpy(), 0.0, None)
+    CO2 = np.clip(compositions["CO2"].to_numpy(), 0.0, None)
+    return np.column_stack([anhydrous, temperature, np.log(H2O + _H2O_offset),
+                            np.log(CO2 + _CO2_offset)])
+
+
+def _monomial_exponents(active, degree, volatile_degree):
+    """
+    Returns the exponents of the monomials of the polynomial basis, one row per monomial: every
+    monomial of the active inputs up to degree, and every monomial of the last three inputs
+    (temperature, lnH2O and lnCO2), on which the saturation pressure depends most strongly, up
+    to volatile_degree.
+    """
+    n_inputs = len(active)
+    active_inputs = [i for i in range(n_inputs) if active[i]]
+    volatile_inputs = [i for i in range(n_inputs - 3, n_inputs) if active[i]]
+    exponents = set()
+    for inputs, max_degree in [(active_inputs, degree), (volatile_inputs, volatile_degree)]:
+        for d in range(max_degree + 1):
+            for combination in itertools.combinations_with_replacement(inputs, d):
+                exponent = [0] * n_inputs
+                for i in combination:
+                    exponent[i] += 1
+                exponents.add(tuple(exponent))
+    return np.array(sorted(exponents, key=lambda exponent: (sum(exponent), exponent)),
+                    dtype=int)
+
+
+def _basis(z, exponents):
+    """Returns the polynomial basis with the given exponents evaluated at the scaled inputs z."""
+    basis = np.ones((len(z), len(exponents)))
+    for i in range(z.shape[1]):
+        for power in np.unique(exponents[:, i]):
+            if power > 0:
+                basis[:, exponents[:, i] == power] *= (z[:, i] ** power)[:, None]
+    return basis
+
+
+class SurrogateModel(object):
+    """
+    A surrogate of the MagmaSat saturation pressure: an ensemble of polynomials in the scaled
+    inputs (see surrogate_inputs) fitted by least squares to ln(saturation pressure) on
+    bootstrap resamples of the training data.
+
+    The relative error of a prediction is estimated from the spread of the ensemble, which grows
+    away from the training data, combined with the expected error of the fit itself, as twice
+    their root sum of squares (about a 95% bound). The expected error of the fit varies across
+    the domain, e.g., it is larger at low pressures, where MagmaSat only resolves the saturation
+    pressure to 10 bars, and is modelled by a second polynomial, fitted to the logarithm of the
+    squared out-of-bag errors of the training samples.
+
+    A sample is inside the domain of the surrogate if every input lies within the range of the
+    training data and the Mahalanobis distance of its inputs from the training data is no
+    greater than that of any training point.
+    """
+
+    _file_version = 1
+
+    def __init__(self, center, scale, exponents, coefficients, error_exponents,
+                 error_coefficients, lower, upper, inverse_covariance, max_distance,
+                 engine_version, n_training):
+        self.center = np.asarray(center, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.exponents = np.asarray(exponents, dtype=int)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.error_exponents = np.asarray(error_exponents, dtype=int)
+        self.error_coefficients = np.asarray(error_coefficients, dtype=float)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.inverse_covariance = np.asarray(inverse_covariance, dtype=float)
+        self.max_distance = float(max_distance)
+        self.engine_version = str(engine_version)
+        self.n_training = int(n_training)
+
+    def _distance(self, z):
+        """Returns the Mahalanobis distance of the scaled inputs z from the training data."""
+        return np.sqrt(np.einsum("ij,jk,ik->i", z, self.inverse_covariance, z))
+
+    def predict(self, inputs):
+        """
+        Predicts the saturation pressure of samples.
+
+        Parameters
+        ----------
+        inputs: numpy array
+            Inputs of the samples, as returned by surrogate_inputs.
+
+        Returns
+        -------
+        tuple
+            Numpy arrays of the saturation pressures in bars, their estimated relative errors,
+            and whether each sample is inside the domain of the surrogate. Pressures and errors
+            are nan for samples outside of the domain.
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=float))
+        margin = 1e-9 * np.maximum(np.abs(self.lower), np.abs(self.upper)) + 1e-12
+        in_domain = (np.all(np.isfinite(inputs), axis=1) &
+                     np.all(inputs >= self.lower - margin, axis=1) &
+                     np.all(inputs <= self.upper + margin, axis=1))
+        z = (np.where(np.isfinite(inputs), inputs, self.center) - self.center) / self.scale
+        in_domain &= self._distance(z) <= self.max_distance * (1 + 1e-9)
+
+        predictions = _basis(z, self.exponents) @ self.coefficients.T
+        lnP = predictions.mean(axis=1)
+        spread = predictions.std(axis=1)
+        # The mean of the logarithm of a squared normal error is ln(variance) - 1.27
+        variance = np.exp(_basis(z, self.error_exponents) @ self.error_coefficients + 1.27)
+        relative_error = np.expm1(2 * np.sqrt(spread**2 + variance))
+        pressure = np.where(in_domain, np.exp(lnP), np.nan)
+        relative_error = np.where(in_domain, relative_error, np.nan)
+        return pressure, relative_error, in_domain
+
+    def save(self, path):
+        """Saves the surrogate to path, an .npz file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, file_version=self._file_version, center=self.center,
+                                scale=self.scale, exponents=self.exponents,
+                                coefficients=self.coefficients,
+                                error_exponents=self.error_exponents,
+                                error_coefficients=self.error_coefficients, lower=self.lower,
+                                upper=self.upper, inverse_covariance=self.inverse_covariance,
+                                max_distance=self.max_distance,
+                                engine_version=self.engine_version,
+                                n_training=self.n_training, input_names=input_names)
+
+    @classmethod
+    def load(cls, path):
+        """Returns the surrogate saved in path."""
+        with np.load(path) as saved:
+            if int(saved["file_version"]) != cls._file_version or \
+                    list(saved["input_names"]) != input_names:
+                raise core.InputError("The MagmaSatFast model in " + path + " was made by a "
+                                      "different version of VESIcal. Train it again.")
+            return cls(saved["center"], saved["scale"], saved["exponents"],
+                       saved["coefficients"], saved["error_exponents"],
+                       saved["error_coefficients"], saved["lower"], saved["upper"],
+                       saved["inverse_covariance"], saved["max_distance"],
+                       saved["engine_version"], saved["n_training"])
+
+
+def _training_point(args):
+    """
+    Returns the MagmaSat saturation pressure of a training sample in bars, or nan if the
+    calculation fails. A module function, so that it can be run in worker processes.
+
+    Parameters
+    ----------
+    args: tuple
+        Composition of the sample as a dict of wt% oxides, and temperature in degrees C.
+    """
+    composition, temperature = args
+    with w.catch_warnings():
+        w.simplefilter("ignore")
+        try:
+            return float(magmasat.MagmaSat().calculate_saturation_pressure(
+                sample_class.Sample(composition), temperature))
+        except Exception:
+            return np.nan
+
+
+def _as_compositions(compositions):
+    """Returns compositions, given as a BatchFile, a DataFrame, or a list of Samples, as a
+    DataFrame of wt% oxides."""
+    if isinstance(compositions, batchfile.BatchFile):
+        compositions = compositions.get_data()
+    elif isinstance(compositions, sample_class.Sample):
+        compositions = [compositions]
+    if isinstance(compositions, list):
+        compositions = pd.DataFrame([sample.get_composition(units="wtpt_oxides")
+                                     for sample in compositions])
+    return pd.DataFrame(compositions).reindex(columns=core.magmasat_oxides).fillna(0.0)
+
+
+def train(compositions, temperature_range=(800.0, 1400.0), H2O_range=(0.0, 8.0),
+          CO2_range=(0.0, 1.5), n_points=3000, degree=2, volatile_degree=4, ensemble=16,
+          seed=0, workers=None, print_status=False, path=None):
+    """
+    Trains a MagmaSatFast surrogate on MagmaSat saturation pressures. This takes one full
+    MagmaSat calculation per training point, and is meant to be run once, offline.
+
+    The training samples are made by drawing a composition at random from compositions, and
+    giving it a temperature, H2O and CO2 drawn uniformly from the ranges given. The surrogate is
+    only used for samples that resemble these, so the compositions should cover those the
+    surrogate will be used on.
+
+    Parameters
+    ----------
+    compositions: BatchFile, pandas DataFrame, or list of Sample
+        Major element compositions the training samples are drawn from, in wt% oxides. Their
+        H2O and CO2 are replaced.
+
+    temperature_range, H2O_range, CO2_range: tuple
+        OPTIONAL: Lowest and highest temperature in degrees C, and H2O and CO2 in wt%. Defaults
+        are (800, 1400), (0, 8) and (0, 1.5).
+
+    n_points: int
+        OPTIONAL: Number of training samples. Default is 3000.
+
+    degree, volatile_degree: int
+        OPTIONAL: Degree of the polynomials in all inputs, and in temperature, H2O and CO2.
+        Defaults are 2 and 4.
+
+    ensemble: int
+        OPTIONAL: Number of polynomials in the ensemble. Default is 16.
+
+    seed: int
+        OPTIONAL: Seed of the random number generator. Default is 0.
+
+    workers: int
+        OPTIONAL: Number of worker processes the MagmaSat calculations are shared between.
+        Default is None, in which case they are made in this process. Pass -1 to use one
+        process per CPU.
+
+    print_status: bool
+        OPTIONAL: If True, the progress of the MagmaSat calculations is printed. Default is
+        False.
+
+    path: str
+        OPTIONAL: If given, the surrogate is saved to this file, e.g., default_model_path().
+
+    Returns
+    -------
+    SurrogateModel
+    """
+    if workers == -1:
+        workers = os.cpu_count()
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise core.InputError("workers must be None, -1, or a positive integer.")
+
+    rng = np.random.default_rng(seed)
+    base = _as_compositions(compositions)
+    training = base.iloc[rng.integers(len(base), size=n_points)].reset_index(drop=True)
+    training["H2O"] = rng.uniform(H2O_range[0], H2O_range[1], n_points)
+    training["CO2"] = rng.uniform(CO2_range[0], CO2_range[1], n_points)
+    temperature = rng.uniform(temperature_range[0], temperature_range[1], n_points)
+
+    args = [({oxide: value for oxide, value in row.items() if value > 0}, T)
+            for (index, row), T in zip(training.iterrows(), temperature)]
+    if workers is None or workers == 1:
+        pressure = []
+        for i, arg in enumerate(args):
+            if print_status:
+                batchfile.status_bar.status_bar((i+1)/n_points, "training sample " + str(i))
+            pressure.append(_training_point(arg))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=magmasat._initialize_worker,
+                initargs=magmasat._worker_initargs()) as executor:
+            pressure = list(executor.map(_training_point, args, chunksize=16))
+    pressure = np.array(pressure, dtype=float)
+
+    inputs = surrogate_inputs(training, temperature)
+    valid = np.isfinite(pressure) & (pressure > 0) & np.all(np.isfinite(inputs), axis=1)
+    return fit(inputs[valid], pressure[valid], degree=degree, volatile_degree=volatile_degree,
+               ensemble=ensemble, seed=seed, path=path)
+
+
+def fit(inputs, pressure, degree=2, volatile_degree=4, ensemble=16, seed=0, path=None):
+    """
+    Fits a surrogate to saturation pressures that have already been calculated with MagmaSat.
+    Used by train.
+
+    Parameters
+    ----------
+    inputs: numpy array
+        Inputs of the training samples, as returned by surrogate_inputs.
+
+    pressure: numpy array
+        MagmaSat saturation pressures of the training samples in bars. Must be positive.
+
+    degree, volatile_degree, ensemble, seed, path:
+        OPTIONAL: As for train.
+
+    Returns
+    -------
+    SurrogateModel
+    """
+    inputs = np.asarray(inputs, dtype=float)
+    lnP = np.log(np.asarray(pressure, dtype=float))
+    center = inputs.mean(axis=0)
+    scale = inputs.std(axis=0)
+    # Inputs that are the same in every training sample, up to rounding error, are not used
+    active = scale > 1e-8 * (np.abs(center) + 1)
+    scale[~active] = 1.0
+    z = (inputs - center) / scale
+
+    exponents = _monomial_exponents(active, degree, volatile_degree)
+    basis = _basis(z, exponents)
+    n = len(lnP)
+    if n < 2 * len(exponents):
+        raise core.InputError("At least " + str(2 * len(exponents)) + " training samples are "
+                              "needed for this surrogate, but only " + str(n) + " were "
+                              "successfully calculated.")
+
+    rng = np.random.default_rng(seed)
+    coefficients = []
+    out_of_bag = np.zeros(n)
+    out_of_bag_count = np.zeros(n)
+    for i in range(ensemble):
+        sample = rng.integers(n, size=n)
+        coefficient = np.linalg.lstsq(basis[sample], lnP[sample], rcond=None)[0]
+        coefficients.append(coefficient)
+        unused = np.ones(n, dtype=bool)
+        unused[sample] = False
+        out_of_bag[unused] += basis[unused] @ coefficient
+        out_of_bag_count[unused] += 1
+    used = out_of_bag_count > 0
+    residual = out_of_bag[used] / out_of_bag_count[used] - lnP[used]
+    error_exponents = _monomial_exponents(active, 1, 2)
+    error_coefficients = np.linalg.lstsq(_basis(z[used], error_exponents),
+                                         np.log(residual**2 + 1e-12), rcond=None)[0]
+
+    inverse_covariance = np.zeros((len(active), len(active)))
+    inverse_covariance[np.ix_(active, active)] = np.linalg.pinv(np.cov(z[:, active].T))
+    surrogate = SurrogateModel(center, scale, exponents, np.array(coefficients),
+                               error_exponents, error_coefficients, inputs.min(axis=0),
+                               inputs.max(axis=0), inverse_covariance, 0.0,
+                               magmasat.engine_version(), n)
+    surrogate.max_distance = np.max(surrogate._distance(z))
+    if path is not None:
+        surrogate.save(path)
+    return surrogate
+
+
+# Surrogates loaded in this process, keyed by the path and modification time of their file, so
+# that a file is only read once however many MagmaSatFast objects use it
+_surrogates = {}
+
+
+def _load(path):
+    """Returns the surrogate saved in path, reading the file only if it has not been read
+    since it was last modified."""
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _surrogates:
+        _surrogates[key] = SurrogateModel.load(path)
+    return _surrogates[key]
+
+
+class MagmaSatFast(magmasat.MagmaSat):
+    """
+    MagmaSat, with saturation pressures predicted by a surrogate model where it is accurate
+    enough. Every other calculation is made with the full MagmaSat model.
+    """
+
+    def __init__(self, model_file=None, tolerance=0.1):
+        """
+        Parameters
+        ----------
+        model_file: str or SurrogateModel
+            OPTIONAL: The surrogate, or the file it was saved in. Default is the file given by
+            default_model_path. If there is no surrogate, every saturation pressure is
+            calculated with MagmaSat.
+
+        tolerance: float
+            OPTIONAL: The largest estimated relative error of a saturation pressure predicted
+            by the surrogate. Samples whose predictions are less certain are calculated with
+            MagmaSat. Default is 0.1.
+        """
+        super().__init__()
+        self.model_type = "MagmaSatFast"
+        self.model_file = model_file
+        self.tolerance = tolerance
+        self._surrogate = None
+        self._loaded = False
+
+    def get_surrogate(self):
+        """Returns the surrogate, loading it the first time it is needed, or None if there is
+        none for the MagmaSat backend in use."""
+        if not self._loaded:
+            self._loaded = True
+            if isinstance(self.model_file, SurrogateModel):
+                surrogate = self.model_file
+            else:
+                path = self.model_file if self.model_file is not None else default_model_path()
+                if not os.path.isfile(path):
+                    w.warn("No MagmaSatFast model was found in " + path + ", so saturation "
+                           "pressures are calculated with MagmaSat. Use "
+                           "VESIcal.models.magmasatfast.train to make one.", RuntimeWarning)
+                    return None
+                surrogate = _load(path)
+            if surrogate.engine_version != magmasat.engine_version():
+                w.warn("The MagmaSatFast model was trained on MagmaSat " +
+                       surrogate.engine_version + ", not " + magmasat.engine_version() +
+                       ", so saturation pressures are calculated with MagmaSat.",
+                       RuntimeWarning)
+                return None
+            self._surrogate = surrogate
+        return self._surrogate
+
+    def predict_saturation_pressure(self, compositions, temperature, tolerance=None):
+        """
+        Predicts the saturation pressures of many samples at once with the surrogate.
+
+        Parameters
+        ----------
+        compositions: pandas DataFrame
+            Compositions of the samples in wt% oxides, one row per sample, with the
+            fixedvolatiles normalization used by MagmaSat.
+
+        temperature: float or array
+            Temperature in degrees C, for all samples or one per sample.
+
+        tolerance: float
+            OPTIONAL: The largest estimated relative error accepted. Default is the tolerance
+            of the model.
+
+        Returns
+        -------
+        pandas DataFrame
+            With the index of compositions, the predicted saturation pressure in bars
+            (SaturationP_bars), its estimated relative error (RelativeError), whether the
+            sample is inside the domain of the surrogate (InDomain), and whether the prediction
+            is within tolerance and so can be used (Surrogate).
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        compositions = pd.DataFrame(compositions)
+        surrogate = self.get_surrogate()
+        if surrogate is None:
+            nan = np.full(len(compositions), np.nan)
+            return pd.DataFrame({"SaturationP_bars": nan, "RelativeError": nan,
+                                 "InDomain": False, "Surrogate": False},
+                                index=compositions.index)
+        pressure, relative_error, in_domain = surrogate.predict(
+            surrogate_inputs(compositions, temperature))
+        return pd.DataFrame({"SaturationP_bars": pressure, "RelativeError": relative_error,
+                             "InDomain": in_domain,
+                             "Surrogate": in_domain & (relative_error <= tolerance)},
+                            index=compositions.index)
+
+    def calculate_saturation_pressure(self, sample, temperature, verbose=False, tolerance=None,
+                                      **kwargs):
+        """
+        Calculates the saturation pressure of a sample composition, with the surrogate if the
+        sample is inside its domain and the estimated error is within tolerance, otherwise with
+        MagmaSat.
+
+        Parameters
+        ----------
+        sample:     Sample class
+            Magma major element composition.
+
+        temperature: float or int
+            Temperature of the sample in degrees C.
+
+        verbose: bool
+            OPTIONAL: Default is False. If set to True, a dict is returned, with the keys of
+            the verbose MagmaSat result, whether the surrogate was used (Surrogate), and the
+            estimated relative error of the saturation pressure (RelativeError). Fluid
+            properties are nan, and Equilibrations 0, where the surrogate was used, and
+            RelativeError is nan where MagmaSat was used.
+
+        tolerance: float
+            OPTIONAL: The largest estimated relative error accepted. Default is the tolerance
+            of the model.
+
+        Other keyword arguments are passed to MagmaSat.calculate_saturation_pressure.
+
+        Returns
+        -------
+        float or dict
+            If verbose is set to False: Saturation pressure in bars.
+            If verbose is set to True: dict of all calculated values.
+        """
+        _sample = self.preprocess_sample(sample)
+        bulk_comp = _sample.get_composition(units="wtpt_oxides", normalization="fixedvolatiles")
+        prediction = self.predict_saturation_pressure(pd.DataFrame([bulk_comp]), temperature,
+                                                      tolerance).iloc[0]
+        if prediction["Surrogate"]:
+            satP = float(prediction["SaturationP_bars"])
+            if verbose is False:
+                return satP
+            return {"SaturationP_bars": satP, "FluidMass_grams": np.nan,
+                    "FluidProportion_wt": np.nan, "XH2O_fl": np.nan, "XCO2_fl": np.nan,
+                    "Equilibrations": 0, "Surrogate": True,
+                    "RelativeError": float(prediction["RelativeError"])}
+
+        result = super().calculate_saturation_pressure(sample, temperature, verbose=verbose,
+                                                       **kwargs)
+        if verbose is False:
+            return result
+        return dict(result, Surrogate=False, RelativeError=np.nan)
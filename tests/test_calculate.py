@@ -1,6 +1,33 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
 import unittest
+from unittest import mock
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
 import VESIcal as v
 
+# The composition of the samples used by the MagmaSat tests
+MAJORS_WTPT = {'SiO2':    47.95,
+               'TiO2':    1.67,
+               'Al2O3':   17.32,
+               'FeO':     10.24,
+               'Fe2O3':   0.1,
+               'MgO':     5.76,
+               'CaO':     10.93,
+               'Na2O':    3.45,
+               'K2O':     1.99,
+               'P2O5':    0.51,
+               'MnO':     0.1,
+               'H2O':     2.0,
+               'CO2':     0.1}
+
 class TestDissolvedVolatiles(unittest.TestCase):
     def setUp(self):
         # Sample with units as wtpt_oxides
@@ -661,5 +688,658 @@ class TestLiquidDensity(unittest.TestCase):
         known_result = self.densityx
         self.assertAlmostEqual(calcd_result, known_result, places=4)
 
+
+class TestIsobarsAndIsopleths(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        self.model = v.models.default_models['ShishkinaIdealMixing']
+
+    def test_adaptive_matches_fixed(self):
+        isobars = self.model.calculate_isobars_and_isopleths(
+                        sample=self.sample, temperature=1200,
+                        pressure_list=[2000], isopleth_list=None, points=51)
+        adaptive = self.model.calculate_isobars_and_isopleths(
+                        sample=self.sample, temperature=1200,
+                        pressure_list=[2000], isopleth_list=None, points=51,
+                        adaptive=True)
+        self.assertLess(len(adaptive), len(isobars))
+        adaptive = adaptive.sort_values('H2O_liq')
+        CO2_interp = np.interp(isobars['H2O_liq'], adaptive['H2O_liq'],
+                               adaptive['CO2_liq'])
+        misfit = np.max(np.abs(CO2_interp - isobars['CO2_liq']))
+        self.assertLess(misfit / np.ptp(isobars['CO2_liq']), 0.01)
+
+    def test_dissolved_volatiles_grid(self):
+        pressure = np.array([1000.0, 2000.0, 1000.0, 3000.0, 2000.0])
+        X_fluid = np.array([0.2, 0.5, 0.2, 0.8, 0.6])
+        known_result = np.array([
+            self.model.calculate_dissolved_volatiles(
+                sample=self.sample, temperature=1200, pressure=P,
+                X_fluid=(X, 1-X))
+            for P, X in zip(pressure, X_fluid)]).T
+        with mock.patch.object(
+                self.model, 'calculate_dissolved_volatiles',
+                wraps=self.model.calculate_dissolved_volatiles) as calculate:
+            calcd_result = self.model.calculate_dissolved_volatiles_grid(
+                pressure, X_fluid, sample=self.sample, temperature=1200)
+        self.assertEqual(calcd_result.shape, (2, 5))
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+        # The repeated (1000, 0.2) pair is calculated once
+        self.assertEqual(calculate.call_count, 4)
+
+    def test_sampler_refines_curvature(self):
+        x, y = v.model_classes.adaptive_curve_sampling(
+                    lambda x: np.array([x, x**8]), [0, 0.5, 1],
+                    tolerance=0.01, max_points=51)
+        self.assertEqual(x[0], 0)
+        self.assertEqual(x[-1], 1)
+        self.assertGreater(np.sum(x > 0.5), np.sum(x < 0.5))
+
+
+class TestBatchWorkers(unittest.TestCase):
+    def setUp(self):
+        try:
+            batch = v.BatchFile('BatchTest.xlsx', units='wtpt_oxides')
+        except Exception:
+            batch = v.BatchFile('tests/BatchTest.xlsx', units='wtpt_oxides')
+        data = batch.get_data().iloc[[0, 0, 0, 0]].copy()
+        data.index = ['samp1', 'samp2', 'samp3', 'samp4']
+        data['H2O'] = [1.0, 2.0, 3.0, 4.0]
+        data['Temp'] = [1000.0, 1100.0, -1.0, 1200.0]
+        self.batch = v.BatchFile_from_DataFrame(data, units='wtpt_oxides')
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+
+    def tearDown(self):
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_saturation_pressure_workers_match_serial(self):
+        serial = self.batch.calculate_saturation_pressure(
+                    temperature='Temp', print_status=False)
+        parallel = self.batch.calculate_saturation_pressure(
+                    temperature='Temp', print_status=False, workers=2)
+        self.assertEqual(list(parallel.index), list(serial.index))
+        np.testing.assert_allclose(parallel['SaturationP_bars_VESIcal'],
+                                   serial['SaturationP_bars_VESIcal'])
+        self.assertEqual(list(parallel['Warnings']), list(serial['Warnings']))
+
+    def test_dissolved_volatiles_equilibrations(self):
+        dissolved = self.batch.calculate_dissolved_volatiles(
+                    temperature='Temp', pressure=2000, X_fluid=0.5,
+                    print_status=False)
+        equilibrations = dissolved['Equilibrations_VESIcal']
+        self.assertTrue(np.isnan(equilibrations['samp3']))
+        self.assertTrue(np.all(equilibrations.drop('samp3') > 0))
+
+        diagnostics = self.batch.get_magmasat_diagnostics()
+        self.assertEqual(list(diagnostics.index), ['samp1', 'samp2', 'samp4'])
+        self.assertEqual(list(diagnostics['Equilibrations']),
+                         list(equilibrations.drop('samp3')))
+        self.assertTrue(np.all(diagnostics['Calculations'] == 1))
+
+    def test_duplicates_calculated_once(self):
+        data = self.batch.get_data().copy()
+        data['H2O'] = [1.0, 1.0, 2.0, 1.0 + 1e-14]
+        data['Temp'] = 1100.0
+        batch = v.BatchFile_from_DataFrame(data, units='wtpt_oxides')
+        dissolved = batch.calculate_dissolved_volatiles(
+                    temperature='Temp', pressure=2000, X_fluid=0.5,
+                    print_status=False)
+        for column in ['H2O_liq_VESIcal', 'CO2_liq_VESIcal',
+                       'Equilibrations_VESIcal']:
+            self.assertEqual(dissolved[column]['samp2'],
+                             dissolved[column]['samp1'])
+            self.assertEqual(dissolved[column]['samp4'],
+                             dissolved[column]['samp1'])
+
+        diagnostics = batch.get_magmasat_diagnostics()
+        self.assertEqual(list(diagnostics['DuplicateOf'].fillna('')),
+                         ['', 'samp1', '', 'samp1'])
+        self.assertEqual(list(diagnostics['Equilibrations'][['samp2',
+                                                             'samp4']]),
+                         [0, 0])
+
+
+class TestMagmaSatSaturationSearch(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+        self.model = v.models.magmasat.MagmaSat()
+
+    def tearDown(self):
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_bracket_matches_step(self):
+        step = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True,
+                    method='step')
+        bracket = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True)
+        self.assertEqual(bracket['SaturationP_bars'], step['SaturationP_bars'])
+        self.assertAlmostEqual(bracket['XH2O_fl'], step['XH2O_fl'], places=6)
+        self.assertLess(bracket['Equilibrations'], step['Equilibrations'])
+
+    def test_dissolved_volatiles_matches_X_fluid(self):
+        for X_fluid in [0.05, 0.5, 0.95]:
+            result = self.model.calculate_dissolved_volatiles(
+                        sample=self.sample, temperature=1200, pressure=2000,
+                        X_fluid=X_fluid, verbose=True)
+            self.assertLess(abs(result['XH2O_fl'] - X_fluid), 0.0001)
+            self.assertLessEqual(result['Equilibrations'], 100)
+
+    def test_dissolved_guess_matches_X_fluid(self):
+        for X_fluid in [0.25, 0.75]:
+            neighbour = self.model.calculate_dissolved_volatiles(
+                        sample=self.sample, temperature=1200, pressure=2000,
+                        X_fluid=X_fluid - 0.05)
+            result = self.model.calculate_dissolved_volatiles(
+                        sample=self.sample, temperature=1200, pressure=2000,
+                        X_fluid=X_fluid, verbose=True,
+                        dissolved_guess=(neighbour['H2O_liq'],
+                                         neighbour['CO2_liq']))
+            self.assertLess(abs(result['XH2O_fl'] - X_fluid), 0.0001)
+            self.assertLessEqual(result['Equilibrations'], 100)
+
+    def test_isobar_workers_match_serial(self):
+        serial = self.model.calculate_isobars_and_isopleths(
+                    sample=self.sample, temperature=1200,
+                    pressure_list=[1000, 2000], isopleth_list=[0.5],
+                    print_status=False, smooth_isobars=False,
+                    smooth_isopleths=False)
+        parallel = self.model.calculate_isobars_and_isopleths(
+                    sample=self.sample, temperature=1200,
+                    pressure_list=[1000, 2000], isopleth_list=[0.5],
+                    print_status=False, smooth_isobars=False,
+                    smooth_isopleths=False, workers=2)
+        for serial_df, parallel_df in zip(serial, parallel):
+            np.testing.assert_allclose(parallel_df.values, serial_df.values)
+
+    def test_warm_start_matches_cold_start(self):
+        cold = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True)
+        warm = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True,
+                    warm_start=True)
+        self.assertEqual(warm['SaturationP_bars'], cold['SaturationP_bars'])
+        self.assertAlmostEqual(warm['XH2O_fl'], cold['XH2O_fl'], places=6)
+
+        stats = self.model.get_path_stats(clear=True)
+        self.assertEqual(list(stats['WarmStart']), [False, True])
+        self.assertEqual(list(stats['Equilibrations']),
+                         [cold['Equilibrations'], warm['Equilibrations']])
+        self.assertEqual(stats['WarmStarts'].iloc[0], 0)
+        self.assertGreater(stats['WarmStarts'].iloc[1], 0)
+        self.assertEqual(len(self.model.get_path_stats()), 0)
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        data = pd.DataFrame([self.sample.get_composition()] * 5,
+                            index=['a', 'b', 'c', 'd', 'e'])
+        data['H2O'] = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.batch = v.BatchFile_from_DataFrame(data, units='wtpt_oxides')
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+
+    def tearDown(self):
+        v.aio.configure()
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_sample(self):
+        calc = asyncio.run(v.aio.calculate_saturation_pressure(
+                    self.sample, temperature=1200))
+        self.assertEqual(calc.result, v.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200).result)
+
+    def test_batch(self):
+        v.aio.configure(max_workers=2, max_concurrency=2)
+        result = asyncio.run(v.aio.calculate_dissolved_volatiles(
+                    self.batch, temperature=1200, pressure=2000, X_fluid=0.5,
+                    model='ShishkinaIdealMixing', chunksize=2))
+        expected = self.batch.calculate_dissolved_volatiles(
+                    temperature=1200, pressure=2000, X_fluid=0.5,
+                    model='ShishkinaIdealMixing', print_status=False)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_batch_diagnostics(self):
+        result = asyncio.run(v.aio.calculate_dissolved_volatiles(
+                    self.batch, temperature=1200, pressure=2000, X_fluid=0.5,
+                    chunksize=2))
+        diagnostics = self.batch.get_magmasat_diagnostics()
+        self.assertEqual(list(diagnostics.index), list(result.index))
+        self.assertEqual(list(diagnostics['Equilibrations']),
+                         list(result['Equilibrations_VESIcal']))
+
+    def test_cancellation(self):
+        v.aio.configure(max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def block():
+            started.set()
+            release.wait(10)
+
+        async def cancel():
+            first = asyncio.ensure_future(v.aio.run(block))
+            second = asyncio.ensure_future(v.aio.run(calls.append, 1))
+            await asyncio.get_running_loop().run_in_executor(
+                        None, started.wait, 10)
+            second.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await second
+            release.set()
+            await first
+
+        asyncio.run(cancel())
+        v.aio.shutdown()
+        self.assertEqual(calls, [])
+
+    def test_job_lock(self):
+        lock = v.aio._JobLock()
+        acquired = threading.Event()
+
+        def exclusive():
+            with lock.exclusive():
+                acquired.set()
+
+        with lock.shared(), lock.shared():
+            thread = threading.Thread(target=exclusive)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+        self.assertTrue(acquired.wait(10))
+        thread.join()
+
+    def test_configure(self):
+        with self.assertRaises(v.core.InputError):
+            v.aio.configure('fibers')
+        with self.assertRaises(v.core.InputError):
+            v.aio.configure(max_concurrency=0)
+
+
+class TestMeltsStats(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+
+    def tearDown(self):
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_records_calculations(self):
+        with v.models.magmasat.MeltsStats() as stats:
+            result = v.calculate_saturation_pressure(
+                        sample=self.sample, temperature=1200,
+                        model='MagmaSat', verbose=True).result
+        v.calculate_saturation_pressure(sample=self.sample, temperature=1200,
+                                        model='MagmaSat').result
+
+        paths = stats.get_stats()
+        self.assertEqual(list(paths['Path']),
+                         ['calculate_saturation_pressure'])
+        self.assertEqual(paths['Equilibrations'].iloc[0],
+                         result['Equilibrations'])
+        self.assertGreater(paths['Queries'].iloc[0], 0)
+        summary = stats.summary()
+        self.assertEqual(summary['Calculations'], 1)
+        self.assertEqual(summary['Failures'], 0)
+        self.assertLessEqual(summary['MeltsTime_s'], summary['WallTime_s'])
+
+    def test_failed_statuses(self):
+        class FailingEngine(object):
+            def set_bulk_composition(self, bulk_comp):
+                pass
+
+            def equilibrate_tp(self, temperature, pressureMPa,
+                               initialize=True):
+                return [('failure', temperature, pressureMPa, None)]
+
+        path = v.models.magmasat.MeltsPath('test', engine=FailingEngine())
+        path.equilibrate(1200, 100, {'SiO2': 50.0})
+        path.equilibrate(1200, 200, {'SiO2': 50.0})
+        stats = path.get_stats()
+        self.assertEqual(stats['Failures'], 2)
+        self.assertEqual(stats['FailedStatuses'], 'failure')
+
+
+class XmlEngine(object):
+    """Returns MELTS-like xml output, and answers phase queries on it as
+    thermoengine does, counting them."""
+    def __init__(self, mass_tag='Mass'):
+        self.mass_tag = mass_tag
+        self.queries = 0
+
+    def set_bulk_composition(self, bulk_comp):
+        self.bulk_comp = bulk_comp
+
+    def equilibrate_tp(self, temperature, pressureMPa, initialize=True):
+        root = ET.fromstring(
+            '<MELTSoutput><System><Mass>100.0</Mass>'
+            '<Oxide Type="SiO2">50.0</Oxide><Oxide Type="H2O">2.0</Oxide>'
+            '</System><Potential Species="SiO2">-1.0</Potential>'
+            '<Phase Type="Liquid"><{0}>99.5</{0}>'
+            '<Oxide Type="SiO2">50.2</Oxide><Oxide Type="H2O">1.5</Oxide>'
+            '<Component Name="Water">0.05</Component></Phase>'
+            '<Phase Type="Fluid"><{0}>0.5</{0}><Formula>H2O0.9CO20.1'
+            '</Formula><Oxide Type="H2O">90.0</Oxide>'
+            '<Oxide Type="CO2">10.0</Oxide>'
+            '<Component Name="Water">{1}</Component>'
+            '<Component Name="Carbon Dioxide">0.2</Component></Phase>'
+            '</MELTSoutput>'.format(self.mass_tag, pressureMPa/1000))
+        return [('success, Optimal residual norm.', temperature, pressureMPa,
+                 root)]
+
+    def get_mass_of_phase(self, root, phase_name='System'):
+        self.queries += 1
+        if phase_name == 'System':
+            return float(root.find(".//System/Mass").text)
+        mass = root.find(".//Phase[@Type='" + phase_name + "']/Mass")
+        return 0.0 if mass is None else float(mass.text)
+
+    def get_composition_of_phase(self, root, phase_name='System',
+                                 mode='oxide_wt'):
+        self.queries += 1
+        phase = root.find(".//Phase[@Type='" + phase_name + "']")
+        if phase is None:
+            return {}
+        tag, key = ('Oxide', 'Type') if mode == 'oxide_wt' else ('Component',
+                                                                  'Name')
+        return {element.attrib[key]: float(element.text)
+                for element in phase.findall(tag)}
+
+
+class TestMeltsRecords(unittest.TestCase):
+    def test_parsed_once(self):
+        engine = XmlEngine()
+        path = v.models.magmasat.MeltsPath('test', engine=engine)
+        first = path.equilibrate(1200, 100, {'SiO2': 50.0})[3]
+        # The first output is queried, to check the parser against
+        self.assertEqual(engine.queries, 6)
+        second = path.equilibrate(1200, 200, {'SiO2': 50.0})[3]
+        self.assertEqual(engine.queries, 6)
+        self.assertIsInstance(second, v.models.magmasat.MeltsRecord)
+        self.assertEqual(path.get_mass_of_phase(second, 'Fluid'), 0.5)
+        self.assertEqual(path.get_composition_of_phase(second, 'Fluid',
+                                                       'component'),
+                         {'Water': 0.2, 'Carbon Dioxide': 0.2})
+        self.assertEqual(path.get_composition_of_phase(first, 'Liquid'),
+                         {'SiO2': 50.2, 'H2O': 1.5})
+        self.assertEqual(path.get_stats()['Queries'], 3)
+
+    def test_unexpected_xml(self):
+        engine = XmlEngine(mass_tag='PhaseMass')
+        engine.get_mass_of_phase = lambda root, phase_name='System': (
+            100.0 if phase_name == 'System' else
+            float(root.find(".//Phase[@Type='" + phase_name +
+                            "']/PhaseMass").text))
+        path = v.models.magmasat.MeltsPath('test', engine=engine)
+        with self.assertWarns(RuntimeWarning):
+            path.equilibrate(1200, 100, {'SiO2': 50.0})
+        record = path.equilibrate(1200, 200, {'SiO2': 50.0})[3]
+        self.assertEqual(path.get_mass_of_phase(record, 'Liquid'), 99.5)
+
+
+class TestMagmaSatCache(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+        self.model = v.models.magmasat.MagmaSat()
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        v.models.magmasat.disable_cache()
+        v.models.magmasat.set_backend(self.backend)
+        self.cache_dir.cleanup()
+
+    def test_cache(self):
+        magmasat = v.models.magmasat
+        self.assertIsNone(magmasat.cache_info())
+        uncached = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True)
+
+        magmasat.enable_cache(cache_dir=self.cache_dir.name)
+        first = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True)
+        second = self.model.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, verbose=True)
+        self.assertEqual(first, uncached)
+        self.assertEqual(second, uncached)
+        info = magmasat.cache_info()
+        self.assertEqual(info['misses'], first['Equilibrations'])
+        self.assertEqual(info['hits'], second['Equilibrations'])
+        self.assertEqual(info['currsize'], first['Equilibrations'])
+        self.assertEqual(self.model.get_path_stats()['CacheHits'].iloc[-1],
+                         second['Equilibrations'])
+
+        # Results persist when the cache is enabled again, up to maxsize
+        magmasat.enable_cache(cache_dir=self.cache_dir.name, maxsize=3)
+        self.model.calculate_saturation_pressure(sample=self.sample, temperature=1100)
+        info = magmasat.cache_info()
+        self.assertEqual(info['currsize'], 3)
+        self.assertGreater(info['evictions'], 0)
+
+        magmasat.clear_cache()
+        self.assertEqual(magmasat.cache_info()['currsize'], 0)
+
+    def test_spawned_worker_cache(self):
+        magmasat = v.models.magmasat
+        magmasat.enable_cache(cache_dir=self.cache_dir.name, maxsize=10)
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context,
+                initializer=magmasat._initialize_worker,
+                initargs=magmasat._worker_initargs()) as executor:
+            info = executor.submit(magmasat.cache_info).result()
+        self.assertEqual(info['path'], magmasat.cache_info()['path'])
+        self.assertEqual(info['maxsize'], 10)
+
+
+class TestLazyMelts(unittest.TestCase):
+    def setUp(self):
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+
+    def tearDown(self):
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_import_does_not_create_melts(self):
+        code = ("import sys, VESIcal; "
+                "print('thermoengine' in sys.modules, "
+                "VESIcal.models.magmasat.melts is None)")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                text=True, check=True).stdout.split()
+        self.assertEqual(output[-2:], ['False', 'True'])
+
+    def test_engine_created_on_first_use(self):
+        engine = v.models.magmasat.get_engine()
+        self.assertIs(v.models.magmasat.get_engine(), engine)
+        self.assertIsNot(v.models.magmasat.new_engine(), engine)
+
+
+class TestAnalyticBackend(unittest.TestCase):
+    def setUp(self):
+        self.sample = v.Sample(MAJORS_WTPT)
+        self.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+        self.model = v.models.magmasat.MagmaSat()
+
+    def tearDown(self):
+        v.models.magmasat.set_backend(self.backend)
+
+    def test_saturation_pressure(self):
+        engine = v.models.magmasat.get_engine()
+        self.assertIsInstance(engine, v.models.magmasat.AnalyticBackend)
+        bulk_comp = dict(self.sample.get_composition(
+                            units='wtpt_oxides', normalization='fixedvolatiles'))
+        expected = engine.saturation_pressure(bulk_comp)
+        for method in ['bracket', 'step']:
+            satP = self.model.calculate_saturation_pressure(
+                        sample=self.sample, temperature=1200, method=method)
+            self.assertAlmostEqual(satP, expected, delta=10)
+
+    def test_dissolved_volatiles(self):
+        result = self.model.calculate_dissolved_volatiles(
+                    sample=self.sample, temperature=1200, pressure=1000,
+                    X_fluid=0.4, verbose=True)
+        self.assertAlmostEqual(result['XH2O_fl'], 0.4, places=2)
+        self.assertGreater(result['H2O_liq'], 0)
+        self.assertGreater(result['CO2_liq'], 0)
+
+    def test_engine_pool(self):
+        pool = v.models.magmasat.engine_pool
+        pool.clear()
+        first = self.model.calculate_degassing_path(
+                    sample=self.sample, temperature=1200, steps=5)
+        second = self.model.calculate_degassing_path(
+                    sample=self.sample, temperature=1200, steps=5)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(pool.info(), {'created': 1, 'reused': 1,
+                                       'recycled': 0, 'idle': 1})
+
+        engine = pool.acquire()
+        pool.release(engine, healthy=False)
+        self.assertEqual(pool.info()['idle'], 0)
+        self.assertIsNot(pool.acquire(), engine)
+
+    def test_no_thermoengine(self):
+        code = ("import sys, VESIcal as v; "
+                "s = v.Sample({'SiO2': 50.0, 'Al2O3': 15.0, 'MgO': 10.0, "
+                "'H2O': 2.0, 'CO2': 0.1}); "
+                "print(v.calculate_saturation_pressure(sample=s, "
+                "temperature=1200, model='MagmaSat').result > 0, "
+                "'thermoengine' in sys.modules)")
+        env = dict(os.environ, VESICAL_MAGMASAT_BACKEND='analytic')
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                text=True, check=True, env=env).stdout.split()
+        self.assertEqual(output[-2:], ['True', 'False'])
+
+    def test_spawned_worker_backend(self):
+        magmasat = v.models.magmasat
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context,
+                initializer=magmasat._initialize_worker,
+                initargs=magmasat._worker_initargs()) as executor:
+            version = executor.submit(magmasat.engine_version).result()
+        self.assertEqual(version, magmasat.engine_version())
+
+    def test_benchmark(self):
+        from VESIcal.benchmarks import magmasat as magmasat_benchmark
+        calculations = magmasat_benchmark.default_calculations
+        results = magmasat_benchmark.run_benchmark(
+                    {'saturation_pressure': calculations['saturation_pressure']},
+                    backend='analytic', repeat=1)
+        self.assertEqual(results['paths'][0], 1)
+        self.assertGreater(results['equilibrations'][0], 0)
+        self.assertLessEqual(results['melts_s'][0], results['total_s'][0])
+        self.assertEqual(v.models.magmasat.backend, 'analytic')
+
+    def test_backend_interface(self):
+        with self.assertRaises(TypeError):
+            v.models.magmasat.EquilibriumBackend()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(v.core.InputError):
+            v.models.magmasat.set_backend('not_a_backend')
+        self.assertEqual(v.models.magmasat.backend, 'analytic')
+
+
+class TestMagmaSatFast(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = v.Sample(MAJORS_WTPT)
+        cls.backend = v.models.magmasat.backend
+        v.models.magmasat.set_backend('analytic')
+        cls.model_dir = tempfile.TemporaryDirectory()
+        cls.model_file = os.path.join(cls.model_dir.name, 'MagmaSatFast.npz')
+        cls.surrogate = v.models.magmasatfast.train(
+                            [cls.sample], n_points=300, H2O_range=(1.0, 5.0),
+                            CO2_range=(0.05, 0.5), path=cls.model_file)
+        cls.environ = os.environ.get('VESICAL_MAGMASATFAST_MODEL')
+        os.environ['VESICAL_MAGMASATFAST_MODEL'] = cls.model_file
+
+    @classmethod
+    def tearDownClass(cls):
+        v.models.magmasat.set_backend(cls.backend)
+        if cls.environ is None:
+            del os.environ['VESICAL_MAGMASATFAST_MODEL']
+        else:
+            os.environ['VESICAL_MAGMASATFAST_MODEL'] = cls.environ
+        cls.model_dir.cleanup()
+
+    def test_surrogate(self):
+        fast = v.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, model='MagmaSatFast',
+                    verbose=True).result
+        satP = v.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200,
+                    model='MagmaSat').result
+        self.assertTrue(fast['Surrogate'])
+        self.assertEqual(fast['Equilibrations'], 0)
+        self.assertLess(fast['RelativeError'], 0.1)
+        self.assertLess(abs(fast['SaturationP_bars']/satP - 1),
+                        fast['RelativeError'])
+
+        loaded = v.models.magmasatfast.SurrogateModel.load(self.model_file)
+        inputs = v.models.magmasatfast.surrogate_inputs(
+                    [dict(self.sample.get_composition())], 1200)
+        np.testing.assert_array_equal(loaded.predict(inputs),
+                                      self.surrogate.predict(inputs))
+
+    def test_fallback(self):
+        result = v.calculate_saturation_pressure(
+                    sample=self.sample, temperature=1200, model='MagmaSatFast',
+                    tolerance=1e-6, verbose=True).result
+        self.assertFalse(result['Surrogate'])
+        self.assertGreater(result['Equilibrations'], 0)
+
+        # Outside of the compositions the surrogate was trained on
+        sample = v.Sample({'SiO2': 70.0, 'Al2O3': 15.0, 'MgO': 1.0,
+                           'Na2O': 4.0, 'H2O': 3.0, 'CO2': 0.1})
+        model = v.models.magmasatfast.MagmaSatFast()
+        result = model.calculate_saturation_pressure(
+                    sample=sample, temperature=1200, verbose=True)
+        self.assertFalse(result['Surrogate'])
+        self.assertEqual(result['SaturationP_bars'],
+                         v.models.magmasat.MagmaSat(
+                         ).calculate_saturation_pressure(sample=sample,
+                                                         temperature=1200))
+
+    def test_batch(self):
+        data = v.BatchFile_from_DataFrame(pd.DataFrame(
+                    [dict(self.sample.get_composition()),
+                     dict(self.sample.get_composition(), H2O=4.0),
+                     dict(self.sample.get_composition(), SiO2=70.0)],
+                    index=['a', 'b', 'c']))
+        result = data.calculate_saturation_pressure(
+                    temperature=1200, model='MagmaSatFast', print_status=False)
+        self.assertEqual(list(result['Surrogate_VESIcal']),
+                         [True, True, False])
+        self.assertEqual(list(result['Equilibrations_VESIcal'] > 0),
+                         [False, False, True])
+        self.assertEqual(list(data.get_magmasat_diagnostics().index), ['c'])
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_does_not_load_heavy_modules(self):
+        from VESIcal.benchmarks import imports as imports_benchmark
+        results = imports_benchmark.run_benchmark({'import': 'import VESIcal'}, repeat=1)
+        self.assertEqual(len(results), 1)
+        self.assertTrue(np.isfinite(results['median_s'][0]))
+        loaded = results['heavy_modules'][0].split(', ')
+        for module in ['matplotlib.pyplot', 'sympy', 'thermoengine']:
+            self.assertNotIn(module, loaded)
+
+    def test_lazy_submodules(self):
+        self.assertTrue(callable(v.vplot.smooth_isobars_and_isopleths))
+        self.assertIn('vplot', dir(v))
+        self.assertIsNotNone(v.calibrations)
+        with self.assertRaises(AttributeError):
+            v.not_a_submodule
+
+
 if __name__ == '__main__':
     unittest.main()
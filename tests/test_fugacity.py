@@ -0,0 +1,213 @@
+import unittest
+import numpy as np
+import VESIcal as v
+from VESIcal.benchmarks import fugacity as fugacity_benchmark
+
+
+class TestKJ81Arrays(unittest.TestCase):
+    def setUp(self):
+        self.pressure = np.array([100.0, 1000.0, 5000.0, 20000.0, 3000.0, 2000.0])
+        self.temperature = np.array([1000.0, 900.0, 1200.0, 700.0, 1100.0, 600.0])
+        self.X_fluid = np.array([0.5, 1.0, 0.2, 0.9, 0.0, 0.7])
+
+    def test_co2_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_KJ81_co2()
+        known_result = [eos.fugacity(P, T, X) for P, T, X in
+                        zip(self.pressure, self.temperature, self.X_fluid)]
+        calcd_result = eos.fugacity_array(self.pressure, self.temperature, self.X_fluid)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-8)
+
+    def test_h2o_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_KJ81_h2o()
+        known_result = [eos.fugacity(P, T, X) for P, T, X in
+                        zip(self.pressure, self.temperature, self.X_fluid)]
+        calcd_result = eos.fugacity_array(self.pressure, self.temperature, self.X_fluid)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-8)
+
+
+class TestTabulatedFugacity(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pressure = np.exp(rng.uniform(0, np.log(20000), 50))
+        self.temperature = rng.uniform(500, 1500, 50)
+        self.X_fluid = rng.uniform(0, 1, 50)
+
+    def check_model(self, eos):
+        tabulated = v.fugacity_models.fugacity_tabulated(eos, pressure_points=41,
+                                                         temperature_points=31,
+                                                         X_fluid_points=11, tolerance=1e-3,
+                                                         use_cache=False)
+        known_result = [eos.fugacity(pressure=P, temperature=T, X_fluid=X) for P, T, X in
+                        zip(self.pressure, self.temperature, self.X_fluid)]
+        calcd_result = tabulated.fugacity(self.pressure, self.temperature, self.X_fluid)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-3)
+        self.assertLessEqual(tabulated.max_relative_error, 1e-3)
+        for P, T, X in zip(self.pressure[:5], self.temperature[:5], self.X_fluid[:5]):
+            self.assertAlmostEqual(tabulated.fugacity(P, T, X) / eos.fugacity(P, T, X), 1.0,
+                                   places=3)
+
+        # Outside of the table the exact EOS is used
+        self.assertEqual(tabulated.fugacity(30000.0, 1000.0, 0.5),
+                         eos.fugacity(pressure=30000.0, temperature=1000.0, X_fluid=0.5))
+
+    def test_KJ81(self):
+        self.check_model(v.fugacity_models.fugacity_KJ81_h2o())
+
+    def test_MRK(self):
+        self.check_model(v.fugacity_models.fugacity_MRK_co2())
+
+    def test_cache_path_follows_version(self):
+        tabulated = v.fugacity_models.fugacity_tabulated(
+            v.fugacity_models.fugacity_MRK_co2(), use_cache=False)
+        known_result = tabulated._cache_path()
+        self.assertEqual(tabulated._cache_path(), known_result)
+        version = v.__version__
+        try:
+            v.__version__ = version + '.dev'
+            self.assertNotEqual(tabulated._cache_path(), known_result)
+        finally:
+            v.__version__ = version
+
+
+class TestFugacityCache(unittest.TestCase):
+    def test_cache(self):
+        eos = v.fugacity_models.fugacity_MRK_h2o()
+        self.assertIsNone(eos.cache_info())
+        known_result = eos.fugacity(pressure=1000.0, temperature=1000.0, X_fluid=0.5)
+
+        eos.enable_cache(maxsize=2)
+        for i in range(3):
+            calcd_result = eos.fugacity(pressure=1000.0, temperature=1000.0, X_fluid=0.5)
+            self.assertEqual(calcd_result, known_result)
+        # Positional and keyword arguments give the same key
+        eos.fugacity(1000.0, 1000.0, 0.5)
+        self.assertEqual(eos.cache_info()['hits'], 3)
+        self.assertEqual(eos.cache_info()['misses'], 1)
+
+        eos.fugacity(pressure=2000.0, temperature=1000.0, X_fluid=0.5)
+        eos.fugacity(pressure=3000.0, temperature=1000.0, X_fluid=0.5)
+        self.assertEqual(eos.cache_info()['currsize'], 2)
+        self.assertEqual(eos.cache_info()['evictions'], 1)
+
+        eos.disable_cache()
+        self.assertIsNone(eos.cache_info())
+
+
+class TestZD09Arrays(unittest.TestCase):
+    def test_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_ZD09_co2()
+        pressure = np.array([1.0, 500.0, 2000.0, 10000.0, 50000.0])
+        temperature = np.array([1200.0, 300.0, 1000.0, 800.0, 2000.0])
+        known_result = [eos.fugacity(P, T) for P, T in zip(pressure, temperature)]
+        calcd_result = eos.fugacity_array(pressure, temperature)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-8)
+
+    def test_fallback_converges(self):
+        # The secant iteration for Vm does not converge at 200 degC and 30 kbar
+        eos = v.fugacity_models.fugacity_ZD09_co2()
+        calcd_result = eos.fugacity_array([20000.0, 30000.0], 200.0)
+        self.assertTrue(np.all(np.isfinite(calcd_result)))
+        self.assertGreater(calcd_result[1], calcd_result[0])
+
+
+class TestMRKArrays(unittest.TestCase):
+    def setUp(self):
+        self.pressure = np.array([1.0, 500.0, 2000.0, 10000.0, 30000.0])
+        self.temperature = np.array([1200.0, 800.0, 1000.0, 1100.0, 1500.0])
+        self.X_fluid = np.array([1.0, 0.3, 0.5, 0.9, 1.0])
+
+    def test_co2_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_MRK_co2()
+        known_result = [eos.fugacity(P, T, X) for P, T, X in
+                        zip(self.pressure, self.temperature, self.X_fluid)]
+        calcd_result = eos.fugacity_array(self.pressure, self.temperature, self.X_fluid)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+
+    def test_h2o_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_MRK_h2o()
+        known_result = [eos.fugacity(P, T, X) for P, T, X in
+                        zip(self.pressure, self.temperature, self.X_fluid)]
+        calcd_result = eos.fugacity_array(self.pressure, self.temperature, self.X_fluid)
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+
+    def test_slow_convergence_matches_scalar(self):
+        # Low temperature states where the volume iteration takes thousands of steps
+        eos = v.fugacity_models.fugacity_MRK_h2o()
+        pressure = np.array([25.97, 79.2])
+        temperature = np.array([403.14, 408.3])
+        known_result = [eos.fugacity(P, T) for P, T in zip(pressure, temperature)]
+        calcd_result = eos.fugacity_array(pressure, temperature)
+        self.assertTrue(np.all(np.isfinite(calcd_result)))
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+        np.testing.assert_allclose(calcd_result, [25.20, 178.56], rtol=1e-3)
+
+
+class TestHollowayBlankArrays(unittest.TestCase):
+    def test_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_HollowayBlank()
+        # Covers both the MRK (< 4000 bar) and Saxena (> 4000 bar, CO2 only) branches, and
+        # both the one and three real root cases of the cubic.
+        pressure = np.array([1.0, 500.0, 3000.0, 4000.0, 8000.0, 50000.0, 2000.0])
+        temperature = np.array([1200.0, 800.0, 1000.0, 1100.0, 1200.0, 1000.0, 100.0])
+        for species in ['CO2', 'H2O']:
+            known_result = [eos.fugacity(P, T, species) for P, T in zip(pressure, temperature)]
+            calcd_result = eos.fugacity_array(pressure, temperature, species)
+            np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+
+
+class TestRedlichKwongArrays(unittest.TestCase):
+    def test_matches_scalar(self):
+        eos = v.fugacity_models.fugacity_RedlichKwong()
+        # Low temperatures give three real roots of the cubic, high temperatures one.
+        pressure = np.array([1.0, 100.0, 1000.0, 5000.0, 20000.0, 50.0])
+        temperature = np.array([1200.0, 25.0, 900.0, 1000.0, 700.0, -20.0])
+        X_fluid = np.array([1.0, 0.5, 0.3, 0.9, 0.0, 1.0])
+        for species in ['CO2', 'H2O']:
+            known_result = [eos.fugacity(P, T, X, species) for P, T, X in
+                            zip(pressure, temperature, X_fluid)]
+            calcd_result = eos.fugacity(pressure, temperature, X_fluid, species)
+            np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+
+        calcd_result = v.fugacity_models.fugacity_RK_h2o().fugacity_array(pressure, temperature)
+        known_result = eos.fugacity(pressure, temperature, 1.0, 'H2O')
+        np.testing.assert_allclose(calcd_result, known_result, rtol=1e-12)
+
+    def test_scalar_gamma(self):
+        # Values of the original scalar implementation, with three real roots and with one
+        eos = v.fugacity_models.fugacity_RedlichKwong()
+        calcd_result = eos.gamma(100.0, 25.0, 'CO2')
+        self.assertIsInstance(calcd_result, float)
+        self.assertAlmostEqual(calcd_result, 0.49609684969057416, places=12)
+        self.assertAlmostEqual(eos.gamma(1000.0, 900.0, 'H2O'), 0.8559976895203345, places=12)
+
+
+class TestFugacityBenchmark(unittest.TestCase):
+    def test_run_benchmark(self):
+        models = {'MRK_h2o': v.fugacity_models.fugacity_MRK_h2o,
+                  'idealgas': v.fugacity_models.fugacity_idealgas}
+        results = fugacity_benchmark.run_benchmark(models=models, pressure_points=5,
+                                                   temperature_points=4, X_fluid_points=2,
+                                                   repeat=1, use_table_cache=False)
+        self.assertEqual(list(results['variant']), ['scalar', 'array', 'tabulated', 'scalar'])
+        self.assertTrue((results['evaluations'] == 40).all())
+        self.assertTrue((results['max_rel_deviation'] < 1e-4).all())
+
+    def test_standard_grid_spans_calibration_range(self):
+        P, T, X = fugacity_benchmark.standard_grid(v.fugacity_models.fugacity_KJ81_co2())
+        self.assertTrue(20000.0**(11/12) < P.max() <= 20000.0)
+        self.assertTrue(1050.0 - 55.0 < T.max() <= 1050.0)
+
+    def test_standard_grid_misses_table_nodes(self):
+        eos = v.fugacity_models.fugacity_MRK_co2()
+        P, T, X = fugacity_benchmark.standard_grid(eos)
+        P_range, T_range, X_range = fugacity_benchmark.grid_bounds(eos)
+        tabulated = v.fugacity_models.fugacity_tabulated(eos, pressure_range=P_range,
+                                                         temperature_range=T_range,
+                                                         use_cache=False)
+        lnP_axis, T_axis = tabulated.axes
+        self.assertGreater(np.min(np.abs(np.log(P)[:, None] - lnP_axis)), 1e-6)
+        self.assertGreater(np.min(np.abs(T[:, None] - T_axis)), 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()